@@ -0,0 +1,49 @@
+-- Script SQL para adicionar as colunas do scraper e os índices de leitura do catálogo
+-- Este script deve ser executado no SQL Editor do Supabase
+
+-- Garantir que as colunas preenchidas pelo scraper do Fandom existam
+ALTER TABLE miniatures_master ADD COLUMN IF NOT EXISTS product_code TEXT;
+ALTER TABLE miniatures_master ADD COLUMN IF NOT EXISTS collector_number TEXT;
+ALTER TABLE miniatures_master ADD COLUMN IF NOT EXISTS variants TEXT;
+ALTER TABLE miniatures_master ADD COLUMN IF NOT EXISTS image_url TEXT;
+ALTER TABLE miniatures_master ADD COLUMN IF NOT EXISTS is_treasure_hunt BOOLEAN DEFAULT FALSE;
+ALTER TABLE miniatures_master ADD COLUMN IF NOT EXISTS is_super_treasure_hunt BOOLEAN DEFAULT FALSE;
+
+-- Paginação keyset do GET /miniatures: ORDER BY created_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_miniatures_master_created_at_id
+  ON miniatures_master (created_at DESC, id DESC);
+
+-- Filtros da listagem combinados com a ordem da paginação
+CREATE INDEX IF NOT EXISTS idx_miniatures_master_brand_created_at
+  ON miniatures_master (brand, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_miniatures_master_series_created_at
+  ON miniatures_master (series, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_miniatures_master_launch_year_created_at
+  ON miniatures_master (launch_year, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_miniatures_master_collection_number
+  ON miniatures_master (collection_number);
+
+-- Treasure Hunts são poucas linhas: índices parciais
+CREATE INDEX IF NOT EXISTS idx_miniatures_master_treasure_hunt
+  ON miniatures_master (created_at DESC, id DESC) WHERE is_treasure_hunt = TRUE;
+CREATE INDEX IF NOT EXISTS idx_miniatures_master_super_treasure_hunt
+  ON miniatures_master (created_at DESC, id DESC) WHERE is_super_treasure_hunt = TRUE;
+
+-- Chave natural canônica (mesmo cálculo de scripts/natural_key.py): espaços
+-- colapsados, sem espaços nas pontas, minúsculas e NULL tratado como valor.
+-- Usada pela API, pelo scraper e pelos scripts de importação para o "já existe?"
+-- e para o upsert (on_conflict=natural_key).
+ALTER TABLE miniatures_master ADD COLUMN IF NOT EXISTS natural_key TEXT GENERATED ALWAYS AS (
+  md5(
+    coalesce(lower(btrim(regexp_replace(model_name, '[ \t\n\r\f\v]+', ' ', 'g'), ' ')), '') || chr(31) ||
+    coalesce(lower(btrim(regexp_replace(brand, '[ \t\n\r\f\v]+', ' ', 'g'), ' ')), '') || chr(31) ||
+    coalesce(launch_year::text, '') || chr(31) ||
+    coalesce(lower(btrim(regexp_replace(series, '[ \t\n\r\f\v]+', ' ', 'g'), ' ')), '')
+  )
+) STORED;
+
+-- Se o índice falhar por duplicatas que só diferem em caixa/espaços, liste-as com:
+--   SELECT natural_key, array_agg(id) FROM miniatures_master
+--   GROUP BY natural_key HAVING count(*) > 1;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_miniatures_master_natural_key
+  ON miniatures_master (natural_key);
@@ -0,0 +1,42 @@
+-- Script SQL para criar a função de estatísticas do catálogo (usada por check_miniatures.py)
+-- Este script deve ser executado no SQL Editor do Supabase
+
+-- Agregações feitas no banco: o cliente recebe só os totais, qualquer que seja
+-- o tamanho da tabela (sem select('*') e sem o limite de linhas do PostgREST)
+CREATE OR REPLACE FUNCTION public.catalog_stats(top_n INTEGER DEFAULT 20)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+  SELECT jsonb_build_object(
+    'total', (SELECT count(*) FROM public.miniatures_master),
+    'treasure_hunts', (SELECT count(*) FROM public.miniatures_master WHERE is_treasure_hunt),
+    'super_treasure_hunts', (SELECT count(*) FROM public.miniatures_master WHERE is_super_treasure_hunt),
+    'distinct_brands', (SELECT count(DISTINCT brand) FROM public.miniatures_master),
+    'distinct_series', (SELECT count(DISTINCT series) FROM public.miniatures_master),
+    'by_brand', (
+      SELECT coalesce(jsonb_agg(jsonb_build_object('value', brand, 'count', n) ORDER BY n DESC, brand), '[]'::jsonb)
+      FROM (
+        SELECT brand, count(*) AS n FROM public.miniatures_master
+        GROUP BY brand ORDER BY n DESC, brand LIMIT top_n
+      ) s
+    ),
+    'by_series', (
+      SELECT coalesce(jsonb_agg(jsonb_build_object('value', series, 'count', n) ORDER BY n DESC, series), '[]'::jsonb)
+      FROM (
+        SELECT series, count(*) AS n FROM public.miniatures_master
+        GROUP BY series ORDER BY n DESC, series LIMIT top_n
+      ) s
+    ),
+    'by_launch_year', (
+      SELECT coalesce(jsonb_agg(jsonb_build_object('value', launch_year, 'count', n) ORDER BY launch_year DESC NULLS LAST), '[]'::jsonb)
+      FROM (
+        SELECT launch_year, count(*) AS n FROM public.miniatures_master
+        GROUP BY launch_year
+      ) s
+    )
+  );
+$$;
+
+-- SECURITY INVOKER (padrão): as políticas RLS de miniatures_master continuam valendo
+GRANT EXECUTE ON FUNCTION public.catalog_stats(INTEGER) TO anon, authenticated;
@@ -0,0 +1,277 @@
+"""Métricas da api_server no formato texto do Prometheus e cabeçalho Server-Timing.
+
+Sem dependências: contadores, gauges e histogramas com rótulos, guardados em
+memória do processo (com vários workers do uvicorn, cada um expõe os seus).
+
+O tempo de cada requisição é dividido em fases com `phase('dedup')` /
+`mark('validation')`; o middleware devolve as fases em `Server-Timing`
+(visível na aba Network do navegador e em `curl -i`) e as acumula em
+`api_phase_duration_seconds`.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, '')) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}' for k, v in items]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values: Dict[Tuple[str, ...], List[float]] = {}  # contagens por bucket + [soma]
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+                    break
+            data[-1] += value
+
+    def count(self, **labels: str) -> int:
+        data = self._values.get(self._key(labels))
+        return sum(data[:-1]) if data else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = []
+        for key, data in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, data):
+                cumulative += n
+                le = (('le', '+Inf' if bound == float('inf') else repr(float(bound))),)
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {repr(float(data[-1]))}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+REGISTRY = Registry()
+REQUEST_SECONDS = REGISTRY.histogram(
+    'api_request_duration_seconds', 'Latência das requisições por rota', ('method', 'route', 'status'))
+REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    'api_requests_in_flight', 'Requisições em andamento por rota', ('method', 'route'))
+PHASE_SECONDS = REGISTRY.histogram(
+    'api_phase_duration_seconds', 'Tempo por fase da requisição (o mesmo do Server-Timing)', ('route', 'phase'))
+BATCH_SIZE = REGISTRY.histogram(
+    'api_batch_size', 'Itens por requisição em lote', ('route',), buckets=SIZE_BUCKETS)
+DB_REQUESTS = REGISTRY.counter(
+    'supabase_requests_total', 'Idas ao PostgREST do Supabase', ('method', 'table', 'outcome'))
+DB_SECONDS = REGISTRY.histogram(
+    'supabase_request_duration_seconds', 'Duração das idas ao PostgREST', ('method', 'table'))
+DB_POOL_WAIT_SECONDS = REGISTRY.histogram(
+    'supabase_pool_wait_seconds', 'Espera por uma vaga no pool de conexões', (),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+
+
+# ---------- Server-Timing ----------
+class RequestTiming:
+    def __init__(self, route: str):
+        self.route = route
+        self.started = time.perf_counter()
+        self._last_mark = self.started
+        self.phases: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def header(self, total: Optional[float] = None) -> str:
+        parts = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in self.phases.items()]
+        if total is not None:
+            parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+_current: contextvars.ContextVar[Optional[RequestTiming]] = contextvars.ContextVar('request_timing', default=None)
+
+
+def current_timing() -> Optional[RequestTiming]:
+    return _current.get()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Mede um trecho da requisição atual (somado se a fase se repetir)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing = _current.get()
+        if timing is not None:
+            timing.add(name, time.perf_counter() - started)
+            timing._last_mark = time.perf_counter()
+
+
+def mark(name: str) -> None:
+    """Registra como `name` o tempo desde o início da requisição (ou da última fase)."""
+    timing = _current.get()
+    if timing is not None:
+        now = time.perf_counter()
+        timing.add(name, now - timing._last_mark)
+        timing._last_mark = now
+
+
+def observe_db(method: str, table: str, seconds: float, ok: bool, wait: float = 0.0) -> None:
+    """Callback de CatalogDB para cada ida ao banco."""
+    DB_REQUESTS.inc(method=method, table=table, outcome='ok' if ok else 'error')
+    DB_SECONDS.observe(seconds, method=method, table=table)
+    DB_POOL_WAIT_SECONDS.observe(wait)
+    timing = _current.get()
+    if timing is not None:
+        timing.add('db', seconds)
+
+
+def route_template(app, scope) -> str:
+    """Caminho declarado da rota (ex.: /miniatures/batch); evita um rótulo por URL."""
+    from starlette.routing import Match
+
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, 'path', 'other')
+    return 'other'
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latência, requisições em voo e cabeçalho Server-Timing."""
+
+    def __init__(self, app, *, skip_paths: Sequence[str] = ('/metrics',)):
+        self.app = app
+        self.skip_paths = set(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        route = route_template(scope['app'], scope) if 'app' in scope else 'other'
+        method = scope['method']
+        timing = RequestTiming(route)
+        token = _current.set(timing)
+        status_code = 500
+        REQUESTS_IN_FLIGHT.inc(method=method, route=route)
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                header = timing.header(time.perf_counter() - timing.started)
+                message = {**message, 'headers': list(message.get('headers', [])) +
+                           [(b'server-timing', header.encode('latin-1'))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - timing.started
+            REQUESTS_IN_FLIGHT.dec(method=method, route=route)
+            REQUEST_SECONDS.observe(elapsed, method=method, route=route, status=str(status_code))
+            for name, seconds in timing.phases.items():
+                PHASE_SECONDS.observe(seconds, route=route, phase=name)
+            _current.reset(token)
@@ -0,0 +1,151 @@
+"""Profiler por amostragem para requisições da api_server (opt-in).
+
+Ligado por configuração (PROFILING_ENABLED=1); desligado, o middleware nem é
+instalado. Ligado, uma requisição é perfilada quando:
+
+- traz o cabeçalho `X-Profile: <PROFILING_TOKEN>`; ou
+- cai na amostragem aleatória (PROFILING_SAMPLE_RATE, ex.: 0.01 = 1%).
+
+Durante a requisição uma thread lê a pilha da thread do event loop a cada
+PROFILING_INTERVAL_MS (sys._current_frames) e conta as pilhas iguais. O
+resultado é gravado em PROFILING_DIR no formato "folded" (uma pilha por linha,
+`a;b;c N`), aceito por flamegraph.pl, speedscope e inferno:
+
+    20261018T142501123_POST_miniatures-batch_183422b_200.folded
+
+A pilha é a do event loop inteiro: com requisições concorrentes, outras
+corrotinas aparecem junto. Esperas por I/O aparecem como `select`/`poll`.
+Só um profile por vez; as requisições que chegarem nesse intervalo seguem sem
+profile.
+"""
+
+import os
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+PROFILE_HEADER = b'x-profile'
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """Amostra periodicamente a pilha de uma thread em outra thread."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='api-profiler', daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+
+def write_folded(path: str, samples: Counter) -> None:
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        for stack, count in samples.most_common():
+            f.write(f'{stack} {count}\n')
+    os.replace(tmp, path)
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI que perfila requisições pedidas por cabeçalho ou sorteadas."""
+
+    def __init__(
+        self,
+        app,
+        *,
+        token: Optional[str] = None,
+        sample_rate: float = 0.0,
+        interval_ms: float = 5.0,
+        output_dir: str = 'profiles',
+    ):
+        self.app = app
+        self.token = token
+        self.sample_rate = sample_rate
+        self.interval = interval_ms / 1000.0
+        self.output_dir = output_dir
+        self._busy = threading.Lock()
+
+    def _requested(self, scope) -> bool:
+        if self.token:
+            for name, value in scope.get('headers', ()):
+                if name == PROFILE_HEADER:
+                    return secrets.compare_digest(value.decode('latin-1'), self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self._requested(scope) or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        received = 0
+        status_code = 500
+        info: Dict[str, str] = {}
+
+        async def counting_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+            return message
+
+        async def send_with_profile(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                info['file'] = self._filename(scope, status_code, received)
+                message = {**message, 'headers': list(message.get('headers', [])) +
+                           [(b'x-profile-file', info['file'].encode('latin-1'))]}
+            await send(message)
+
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, counting_receive, send_with_profile)
+        finally:
+            samples = sampler.stop()
+            self._busy.release()
+            name = info.get('file') or self._filename(scope, status_code, received)
+            try:
+                os.makedirs(self.output_dir, exist_ok=True)
+                write_folded(os.path.join(self.output_dir, name), samples)
+                print(f"[profile] {scope['method']} {scope['path']}: {sum(samples.values())} amostras em "
+                      f"{time.perf_counter() - started:.2f}s -> {name}")
+            except OSError as e:
+                print(f"AVISO: Falha ao gravar profile {name}: {e}")
+
+    def _filename(self, scope, status_code: int, size: int) -> str:
+        route = scope.get('route')
+        path = getattr(route, 'path', None) or scope['path']
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', path).strip('-') or 'root'
+        now = time.time()
+        stamp = time.strftime('%Y%m%dT%H%M%S', time.localtime(now)) + f'{int(now * 1000) % 1000:03d}'
+        return f"{stamp}_{scope['method']}_{slug}_{size}b_{status_code}.folded"
@@ -1,14 +1,26 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
-from supabase import create_client, Client
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import AsyncIterator, List, Optional, Dict, Any, Set, Tuple
+import json
 import os
 from dotenv import load_dotenv
 import secrets
 import uvicorn
 
+from api_metrics import BATCH_SIZE, CONTENT_TYPE, REGISTRY, MetricsMiddleware, mark, observe_db, phase
+from api_profiler import ProfilingMiddleware
+from catalog_db import CatalogDB, encode_cursor, keyset_after, missing_default
+from catalog_lookup import LOOKUP_KINDS, CatalogLookupIndex
+from group_commit import GroupCommitter
+from ingest_jobs import JobRunner, JobStore
+from natural_key import NATURAL_KEY_COLUMN, natural_key_hash
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
@@ -24,11 +36,112 @@ if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
 API_USERNAME = os.getenv('API_USERNAME', 'admin')
 API_PASSWORD = os.getenv('API_PASSWORD', 'password')
 
-# Criar cliente Supabase com a chave de serviço
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+# Tamanho do pool de conexões HTTP com o Supabase (também limita as consultas em voo)
+DB_MAX_CONNECTIONS = int(os.getenv('DB_MAX_CONNECTIONS', '20'))
+DB_MAX_KEEPALIVE = int(os.getenv('DB_MAX_KEEPALIVE', '10'))
+
+# Índice de busca por UPC / base code / número de coleção. miniatures_master não
+# tem coluna upc: o índice de UPC só tem entradas de um arquivo de seed, que é
+# opcional (ex.: LOOKUP_SEED_FILE=../data/miniatures_db.json em desenvolvimento)
+# porque as entradas "seed:..." não são linhas do banco.
+LOOKUP_SEED_FILE = os.getenv('LOOKUP_SEED_FILE')
+LOOKUP_BATCH_MAX = int(os.getenv('LOOKUP_BATCH_MAX', '1000'))
+
+# Profiler por amostragem (desligado por padrão; ver api_profiler.py)
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN')
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_INTERVAL_MS = float(os.getenv('PROFILING_INTERVAL_MS', '5'))
+PROFILING_DIR = os.getenv('PROFILING_DIR', 'profiles')
+
+# Jobs de importação em segundo plano (POST /jobs/miniatures; ver ingest_jobs.py)
+JOBS_DB_PATH = os.getenv('JOBS_DB_PATH', 'ingest_jobs.sqlite3')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_MAX_ITEMS = int(os.getenv('JOB_MAX_ITEMS', '200000'))
+JOB_RETENTION_DAYS = float(os.getenv('JOB_RETENTION_DAYS', '7'))
+# Um job de um processo que morreu volta para a fila depois deste prazo
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '60'))
+
+# Group commit de POST /miniatures: inserções simultâneas dentro da janela viram
+# uma consulta de existência e um upsert em lote (0 ms desliga; ver group_commit.py)
+GROUP_COMMIT_MAX_DELAY_MS = float(os.getenv('GROUP_COMMIT_MAX_DELAY_MS', '2'))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv('GROUP_COMMIT_MAX_BATCH', '100'))
+
+# Espera entre tentativas de montar o índice de busca (dobra a cada falha, até o máximo)
+LOOKUP_RETRY_SECONDS = float(os.getenv('LOOKUP_RETRY_SECONDS', '2'))
+LOOKUP_RETRY_MAX_SECONDS = float(os.getenv('LOOKUP_RETRY_MAX_SECONDS', '300'))
+
+async def build_lookup_index(db: CatalogDB, lookup: CatalogLookupIndex):
+    """Monta o índice de busca a partir do catálogo (em segundo plano), tentando até conseguir.
+
+    Enquanto não monta, /lookup/batch responde 503. Recarregar é seguro: as
+    entradas são indexadas pelo id.
+    """
+    if LOOKUP_SEED_FILE and os.path.exists(LOOKUP_SEED_FILE):
+        try:
+            lookup.load_seed_file(LOOKUP_SEED_FILE)
+        except (OSError, ValueError) as e:
+            print(f"AVISO: Falha ao ler LOOKUP_SEED_FILE {LOOKUP_SEED_FILE}: {e}")
+    else:
+        print("AVISO: LOOKUP_SEED_FILE não definido: miniatures_master não tem coluna upc, "
+              "então buscas por UPC não vão encontrar nada")
+    delay = LOOKUP_RETRY_SECONDS
+    while True:
+        try:
+            total = await lookup.load_from_db(db)
+            lookup.ready = True
+            print(f"Índice de busca carregado: {total} miniaturas")
+            return
+        except Exception as e:
+            print(f"AVISO: Falha ao montar índice de busca ({e}); nova tentativa em {delay:.0f}s")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, LOOKUP_RETRY_MAX_SECONDS)
+
+# Abrir o pool de conexões com o Supabase (chave de serviço) na inicialização
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    db = CatalogDB(
+        SUPABASE_URL,
+        SUPABASE_SERVICE_KEY,
+        max_connections=DB_MAX_CONNECTIONS,
+        max_keepalive_connections=DB_MAX_KEEPALIVE,
+        on_query=observe_db,
+    )
+    await db.open()
+    app.state.db = db
+    app.state.lookup = CatalogLookupIndex()
+    lookup_task = asyncio.create_task(build_lookup_index(db, app.state.lookup))
+    # Jobs de importação: interrompidos num reinício voltam para a fila e continuam
+    # (vários workers do uvicorn podem compartilhar JOBS_DB_PATH; ver ingest_jobs.py)
+    app.state.jobs = JobStore(JOBS_DB_PATH, lease_seconds=JOB_LEASE_SECONDS)
+    app.state.jobs.purge(JOB_RETENTION_DAYS * 86400)
+    app.state.job_runner = JobRunner(
+        app.state.jobs,
+        lambda items, replayed: process_batch_chunk(db, app.state.lookup, items, replayed),
+        workers=JOB_WORKERS,
+        chunk_size=BATCH_CHUNK_SIZE,
+    )
+    app.state.job_runner.start()
+    app.state.insert_committer = None
+    if GROUP_COMMIT_MAX_DELAY_MS > 0:
+        app.state.insert_committer = GroupCommitter(
+            lambda rows: commit_single_inserts(db, app.state.lookup, rows),
+            max_batch=GROUP_COMMIT_MAX_BATCH,
+            max_delay_ms=GROUP_COMMIT_MAX_DELAY_MS,
+            on_commit=lambda size: BATCH_SIZE.observe(size, route="/miniatures"),
+        )
+    try:
+        yield
+    finally:
+        lookup_task.cancel()
+        if app.state.insert_committer is not None:
+            await app.state.insert_committer.close()
+        await app.state.job_runner.stop()
+        app.state.jobs.close()
+        await db.close()
 
 # Inicializar FastAPI
-app = FastAPI(title="Diecast BR Garage API")
+app = FastAPI(title="Diecast BR Garage API", lifespan=lifespan)
 
 # Configurar CORS
 app.add_middleware(
@@ -37,8 +150,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-File"],
 )
 
+# Latência por rota, requisições em voo e cabeçalho Server-Timing (ver /metrics)
+app.add_middleware(MetricsMiddleware)
+
+# Profile de requisições sob demanda (cabeçalho X-Profile: <PROFILING_TOKEN>) ou por amostragem
+if PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        token=PROFILING_TOKEN,
+        sample_rate=PROFILING_SAMPLE_RATE,
+        interval_ms=PROFILING_INTERVAL_MS,
+        output_dir=PROFILING_DIR,
+    )
+
 # Configurar autenticação básica
 security = HTTPBasic()
 
@@ -58,6 +185,21 @@ class Miniature(BaseModel):
     wheel_type: Optional[str] = None
     visibility: Optional[str] = Field(None, description="public, private ou null")
 
+# Colunas que podem ser pedidas em `fields=` na listagem do catálogo
+CATALOG_FIELDS = {
+    'id', 'model_name', 'brand', 'launch_year', 'series', 'collection_number',
+    'collector_number', 'product_code', 'base_color', 'variants', 'image_url',
+    'official_blister_photo_url', 'is_treasure_hunt', 'is_super_treasure_hunt',
+    'visibility', 'disponivel_para_negocio', 'preco_negociacao', 'created_at', 'updated_at',
+}
+DEFAULT_LIST_FIELDS = ('id', 'model_name', 'brand', 'launch_year', 'series', 'collection_number', 'created_at')
+LIST_MAX_LIMIT = 500
+
+# Modelo para busca em lote de códigos escaneados
+class LookupBatchRequest(BaseModel):
+    codes: List[str]
+    kind: Optional[str] = Field(None, description="upc, product_code, collection_number ou null (todos)")
+
 # Modelo para resposta de inserção
 class InsertResponse(BaseModel):
     success: bool
@@ -77,45 +219,474 @@ def verify_credentials(credentials: HTTPBasicCredentials = Depends(security)):
         )
     return credentials.username
 
+# Dependência que entrega o acesso ao banco criado no lifespan
+def get_db(request: Request) -> CatalogDB:
+    return request.app.state.db
+
+# Dependência que entrega o índice de busca criado no lifespan
+def get_lookup(request: Request) -> CatalogLookupIndex:
+    return request.app.state.lookup
+
+# Dependência que entrega o group commit de POST /miniatures (None se desligado)
+def get_insert_committer(request: Request) -> Optional[GroupCommitter]:
+    return request.app.state.insert_committer
+
+# Dependência que entrega o armazenamento de jobs criado no lifespan
+def get_jobs(request: Request) -> JobStore:
+    return request.app.state.jobs
+
+# Quantidade de itens resolvidos por consulta/upsert no processamento em lote
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', '200'))
+
+# Tamanho máximo de uma linha em POST /miniatures/stream (NDJSON)
+STREAM_MAX_LINE_BYTES = int(os.getenv('STREAM_MAX_LINE_BYTES', str(64 * 1024)))
+NDJSON_MEDIA_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-lines')
+
+# Limite de linhas por resposta do PostgREST (max-rows do Supabase)
+POSTGREST_PAGE_SIZE = 1000
+
+def miniature_key(data: Dict[str, Any]) -> str:
+    """Chave natural canônica (coluna natural_key) de uma miniatura."""
+    return natural_key_hash(data)
+
+def chunked(items: List[Any], size: int):
+    """Divide uma lista em blocos de no máximo `size` itens."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+async def fetch_existing_keys(db: CatalogDB, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Resolve com `natural_key IN (...)` (índice único) quais chaves do bloco já existem (chave -> id)."""
+    keys = sorted({miniature_key(row) for row in rows})
+    existing = {}
+    # Cada chave casa com no máximo uma linha: blocos do tamanho da página do PostgREST
+    for part in chunked(keys, POSTGREST_PAGE_SIZE):
+        result = await db.execute(
+            db.table('miniatures_master')
+            .select(f'{NATURAL_KEY_COLUMN},id')
+            .in_(NATURAL_KEY_COLUMN, part)
+        )
+        existing.update((row[NATURAL_KEY_COLUMN], row['id']) for row in result.data)
+    return existing
+
+async def bulk_insert_miniatures(
+    db: CatalogDB,
+    rows: List[Dict[str, Any]],
+    inserted: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Insere as linhas com um upsert em lote, ignorando conflitos em natural_key.
+
+    Linhas com campos opcionais diferentes vão na mesma requisição: `columns=` com
+    `missing=default` mantém o valor padrão do banco nos campos omitidos (ver
+    catalog_db.missing_default). Retorna as linhas inseridas indexadas pela
+    chave natural, também acumuladas em `inserted` se for passado.
+    """
+    inserted = {} if inserted is None else inserted
+    if not rows:
+        return inserted
+    result = await db.execute(missing_default(
+        db.table('miniatures_master').upsert(rows, on_conflict=NATURAL_KEY_COLUMN, ignore_duplicates=True),
+        rows,
+    ))
+    for row in result.data or []:
+        # Mesma chave usada na busca (miniature_key), calculada das colunas devolvidas
+        inserted[miniature_key(row)] = row
+    return inserted
+
+async def insert_isolating_errors(
+    db: CatalogDB,
+    rows: List[Dict[str, Any]],
+    inserted: Dict[str, Dict[str, Any]],
+) -> Dict[int, Exception]:
+    """Upsert em lote; se falhar, regrava as linhas uma a uma, como o write_buffer.UpsertBuffer.
+
+    Uma linha ruim (ex.: `\\u0000` no texto, que o Postgres rejeita) derruba o
+    upsert inteiro; assim só ela sai com erro. Preenche `inserted` e retorna o
+    erro de cada linha que falhou sozinha, pela posição em `rows`.
+    """
+    try:
+        await bulk_insert_miniatures(db, rows, inserted)
+        return {}
+    except Exception as e:
+        print(f"AVISO: Upsert de {len(rows)} miniaturas falhou ({e}); regravando uma a uma")
+    errors: Dict[int, Exception] = {}
+    for position, row in enumerate(rows):
+        if miniature_key(row) in inserted:
+            continue
+        try:
+            await bulk_insert_miniatures(db, [row], inserted)
+        except Exception as e:
+            errors[position] = e
+    return errors
+
+# Resultado do group commit para item que já existe (no banco ou antes no mesmo grupo)
+ALREADY_EXISTS = object()
+
+async def commit_single_inserts(db: CatalogDB, lookup: CatalogLookupIndex, rows: List[Dict[str, Any]]) -> List[Any]:
+    """Grava um grupo de POST /miniatures simultâneos: uma consulta de existência e um upsert.
+
+    Retorna, para cada item, a linha inserida, ALREADY_EXISTS ou a exceção da
+    linha que o banco rejeitou (só essa requisição falha). Com a mesma chave
+    repetida no grupo, a primeira requisição insere e as outras recebem
+    "já existe", como se tivessem chegado uma depois da outra.
+    """
+    keys = [miniature_key(row) for row in rows]
+    with phase("dedup"):
+        existing_keys = await fetch_existing_keys(db, rows)
+    first: Dict[str, int] = {}
+    for index, key in enumerate(keys):
+        if key not in existing_keys and key not in first:
+            first[key] = index
+    to_insert = list(first.values())
+    inserted: Dict[str, Dict[str, Any]] = {}
+    with phase("insert"):
+        errors = await insert_isolating_errors(db, [rows[index] for index in to_insert], inserted)
+    lookup.add_many(inserted.values())
+    failed = {to_insert[position]: error for position, error in errors.items()}
+    # Sem linha devolvida: o upsert ignorou o conflito (inserida por outra requisição)
+    return [
+        failed[index] if index in failed
+        else inserted.get(key, ALREADY_EXISTS) if first.get(key) == index
+        else ALREADY_EXISTS
+        for index, key in enumerate(keys)
+    ]
+
+def prepare_batch(miniatures: List[Miniature]) -> Tuple[List[Tuple[int, str, Dict[str, Any]]], Dict[int, Dict[str, Any]]]:
+    """Separa o lote em itens a gravar (índice, chave, dados) e duplicadas dentro do lote.
+
+    A primeira ocorrência de cada chave natural vence; as demais já saem com o
+    resultado "Duplicada dentro do lote".
+    """
+    pending = []
+    resolved = {}
+    seen_keys = set()
+    for index, miniature in enumerate(miniatures):
+        insert_data = {k: v for k, v in miniature.dict().items() if v is not None}
+        key = miniature_key(insert_data)
+        if key in seen_keys:
+            resolved[index] = {
+                "model_name": miniature.model_name,
+                "success": False,
+                "message": "Duplicada dentro do lote"
+            }
+            continue
+        seen_keys.add(key)
+        pending.append((index, key, insert_data))
+    return pending, resolved
+
+async def process_batch_chunk(
+    db: CatalogDB,
+    lookup: CatalogLookupIndex,
+    chunk: List[Tuple[int, str, Dict[str, Any]]],
+    replayed: Set[int] = frozenset(),
+) -> Dict[int, Dict[str, Any]]:
+    """Grava um bloco (uma consulta de existência e um upsert); retorna o resultado por índice.
+
+    Se o upsert do bloco falhar, só as linhas ruins saem com erro (ver
+    insert_isolating_errors). `replayed` são os índices de um bloco de job
+    interrompido que está sendo refeito: se já existem, foi ele quem os inseriu.
+    """
+    details: Dict[int, Dict[str, Any]] = {}
+    try:
+        with phase("dedup"):
+            existing_keys = await fetch_existing_keys(db, [data for _, _, data in chunk])
+    except Exception as e:
+        for index, _, insert_data in chunk:
+            details[index] = {
+                "model_name": insert_data['model_name'],
+                "success": False,
+                "message": f"Erro: {str(e)}"
+            }
+        return details
+
+    to_insert = []
+    for index, key, insert_data in chunk:
+        if key in existing_keys and index in replayed:
+            details[index] = {
+                "model_name": insert_data['model_name'],
+                "success": True,
+                "message": "Inserida com sucesso",
+                "id": existing_keys[key]
+            }
+        elif key in existing_keys:
+            details[index] = {
+                "model_name": insert_data['model_name'],
+                "success": False,
+                "message": "Já existe no banco de dados"
+            }
+        else:
+            to_insert.append((index, key, insert_data))
+
+    inserted: Dict[str, Dict[str, Any]] = {}
+    with phase("insert"):
+        errors = await insert_isolating_errors(db, [data for _, _, data in to_insert], inserted)
+    lookup.add_many(inserted.values())
+    for position, error in errors.items():
+        index, _, insert_data = to_insert[position]
+        details[index] = {
+            "model_name": insert_data['model_name'],
+            "success": False,
+            "message": f"Erro: {str(error)}"
+        }
+
+    for index, key, insert_data in to_insert:
+        if index in details:
+            continue
+        row = inserted.get(key)
+        if row:
+            details[index] = {
+                "model_name": insert_data['model_name'],
+                "success": True,
+                "message": "Inserida com sucesso",
+                "id": row["id"]
+            }
+        else:
+            # Ignorada pela restrição UNIQUE (inserida por outra requisição)
+            details[index] = {
+                "model_name": insert_data['model_name'],
+                "success": False,
+                "message": "Já existe no banco de dados"
+            }
+    return details
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """(número da linha, conteúdo) de um corpo NDJSON lido aos pedaços; linhas vazias são puladas.
+
+    Uma linha maior que `max_line_bytes` é descartada sem ser acumulada e sai como None.
+    """
+    buffer = b""
+    line_no = 0
+    oversized = False
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        lines = (buffer + chunk).split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            line_no += 1
+            if oversized:
+                # Resto de uma linha já descartada
+                oversized = False
+                yield line_no, None
+            elif len(line) > max_line_bytes:
+                yield line_no, None
+            elif line.strip():
+                yield line_no, line
+        if len(buffer) > max_line_bytes:
+            oversized = True
+            buffer = b""
+    if oversized or buffer.strip():
+        yield line_no + 1, None if oversized or len(buffer) > max_line_bytes else buffer
+
+def parse_miniature_line(line: bytes) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Valida uma linha NDJSON como Miniature: (dados sem None, None) ou (None, mensagem de erro)."""
+    try:
+        obj = json.loads(line)
+    except ValueError as e:
+        return None, f"JSON inválido: {e}"
+    if not isinstance(obj, dict):
+        return None, "Esperado um objeto JSON por linha"
+    try:
+        miniature = Miniature(**obj)
+    except ValidationError as e:
+        problems = "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+        return None, f"Dados inválidos: {problems}"
+    return {k: v for k, v in miniature.dict().items() if v is not None}, None
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """StreamingResponse que lê o corpo da requisição enquanto responde.
+
+    A do Starlette escuta `http.disconnect` em paralelo (servidores ASGI < 2.4,
+    como o uvicorn) e consumiria as mensagens com o corpo; aqui a desconexão
+    do cliente aparece como ClientDisconnect na leitura de `request.stream()`.
+    """
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+async def stream_ingest(request: Request, db: CatalogDB, lookup: CatalogLookupIndex) -> AsyncIterator[bytes]:
+    """Lê o NDJSON, grava em blocos de BATCH_CHUNK_SIZE e devolve o resultado de cada linha.
+
+    Um bloco é gravado enquanto o próximo é lido (no máximo dois em memória).
+    Duplicadas são resolvidas dentro do bloco; entre blocos, a segunda
+    ocorrência sai como "Já existe no banco de dados".
+    """
+    totals = {"total": 0, "successful": 0, "failed": 0}
+
+    def emit(line_no: int, detail: Dict[str, Any]) -> bytes:
+        totals["total"] += 1
+        totals["successful" if detail["success"] else "failed"] += 1
+        return (json.dumps({"line": line_no, **detail}, ensure_ascii=False) + "\n").encode("utf-8")
+
+    async def write_chunk(chunk):
+        return chunk, await process_batch_chunk(db, lookup, chunk)
+
+    chunk: List[Tuple[int, str, Dict[str, Any]]] = []
+    seen_keys = set()
+    in_flight: Optional[asyncio.Task] = None
+    try:
+        async for line_no, line in iter_ndjson_lines(request.stream(), STREAM_MAX_LINE_BYTES):
+            if line is None:
+                yield emit(line_no, {"success": False, "message": f"Linha maior que {STREAM_MAX_LINE_BYTES} bytes"})
+                continue
+            insert_data, error = parse_miniature_line(line)
+            if error:
+                yield emit(line_no, {"success": False, "message": error})
+                continue
+            key = miniature_key(insert_data)
+            if key in seen_keys:
+                yield emit(line_no, {
+                    "model_name": insert_data['model_name'],
+                    "success": False,
+                    "message": "Duplicada dentro do lote"
+                })
+                continue
+            seen_keys.add(key)
+            chunk.append((line_no, key, insert_data))
+            if len(chunk) >= BATCH_CHUNK_SIZE:
+                if in_flight is not None:
+                    done_chunk, details = await in_flight
+                    for done_line, _, _ in done_chunk:
+                        yield emit(done_line, details[done_line])
+                in_flight = asyncio.create_task(write_chunk(chunk))
+                chunk, seen_keys = [], set()
+
+        if in_flight is not None:
+            done_chunk, details = await in_flight
+            in_flight = None
+            for done_line, _, _ in done_chunk:
+                yield emit(done_line, details[done_line])
+        if chunk:
+            details = await process_batch_chunk(db, lookup, chunk)
+            for done_line, _, _ in chunk:
+                yield emit(done_line, details[done_line])
+    finally:
+        # Cliente desconectou no meio: não deixa a gravação do bloco órfã
+        if in_flight is not None and not in_flight.done():
+            in_flight.cancel()
+
+    BATCH_SIZE.observe(totals["total"], route="/miniatures/stream")
+    yield (json.dumps({"done": True, **totals}) + "\n").encode("utf-8")
+
 # Rota para verificar status da API
 @app.get("/", tags=["Status"])
 async def read_root():
     return {"status": "online", "message": "Diecast BR Garage API"}
 
+# Métricas no formato texto do Prometheus
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+# Rota para listar/buscar miniaturas do catálogo (paginação keyset por created_at, id)
+@app.get("/miniatures", response_model=Dict[str, Any], tags=["Miniatures"])
+async def list_miniatures(
+    brand: Optional[str] = None,
+    series: Optional[str] = None,
+    launch_year: Optional[int] = None,
+    collection_number: Optional[str] = None,
+    is_treasure_hunt: Optional[bool] = None,
+    is_super_treasure_hunt: Optional[bool] = None,
+    fields: Optional[str] = Query(None, description="Colunas separadas por vírgula"),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+    limit: int = Query(50, ge=1, le=LIST_MAX_LIMIT),
+    username: str = Depends(verify_credentials),
+    db: CatalogDB = Depends(get_db),
+):
+    columns = [c.strip() for c in fields.split(',') if c.strip()] if fields else list(DEFAULT_LIST_FIELDS)
+    unknown = sorted(set(columns) - CATALOG_FIELDS)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Campos desconhecidos: {', '.join(unknown)}"
+        )
+    # created_at e id são sempre necessários para montar o próximo cursor
+    for column in ('created_at', 'id'):
+        if column not in columns:
+            columns.append(column)
+
+    query = db.table('miniatures_master').select(','.join(columns))
+    filters = {
+        'brand': brand,
+        'series': series,
+        'launch_year': launch_year,
+        'collection_number': collection_number,
+        'is_treasure_hunt': is_treasure_hunt,
+        'is_super_treasure_hunt': is_super_treasure_hunt,
+    }
+    for column, value in filters.items():
+        if value is not None:
+            query = query.eq(column, str(value).lower() if isinstance(value, bool) else value)
+
+    try:
+        query = keyset_after(query, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    try:
+        # Uma linha extra indica se existe próxima página
+        result = await db.execute(query.limit(limit + 1))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao consultar miniaturas: {str(e)}"
+        )
+
+    rows = result.data[:limit]
+    has_more = len(result.data) > limit
+    return {
+        "data": rows,
+        "next_cursor": encode_cursor(rows[-1]) if has_more else None,
+    }
+
 # Rota para inserir uma miniatura
 @app.post("/miniatures", response_model=InsertResponse, tags=["Miniatures"])
-async def create_miniature(miniature: Miniature, username: str = Depends(verify_credentials)):
+async def create_miniature(
+    miniature: Miniature,
+    username: str = Depends(verify_credentials),
+    db: CatalogDB = Depends(get_db),
+    lookup: CatalogLookupIndex = Depends(get_lookup),
+    committer: Optional[GroupCommitter] = Depends(get_insert_committer),
+):
+    mark("validation")
     try:
         # Converter o modelo Pydantic para dicionário e remover valores None
         insert_data = {k: v for k, v in miniature.dict().items() if v is not None}
-        
-        # Verificar se a miniatura já existe
         model_name = insert_data['model_name']
-        launch_year = insert_data.get('launch_year')
-        series = insert_data.get('series', '')
-        
-        query = supabase.table('miniatures_master').select('id').eq('model_name', model_name)
-        if launch_year:
-            query = query.eq('launch_year', launch_year)
-        if series:
-            query = query.eq('series', series)
-            
-        existing = query.execute()
-        
-        if existing.data:
+
+        if committer is not None:
+            # Junto com as inserções simultâneas: existência e upsert em lote para o grupo
+            with phase("group_commit"):
+                row = await committer.submit(insert_data)
+            exists = row is ALREADY_EXISTS
+        else:
+            # Verificar se a miniatura já existe (igualdade no índice único de natural_key)
+            query = db.table('miniatures_master').select('id').eq(NATURAL_KEY_COLUMN, miniature_key(insert_data))
+            with phase("dedup"):
+                existing = await db.execute(query)
+            exists = bool(existing.data)
+            row = None
+            if not exists:
+                # Inserir nova miniatura usando a chave de serviço (ignora RLS)
+                with phase("insert"):
+                    result = await db.execute(db.table('miniatures_master').insert(insert_data))
+                row = result.data[0] if result.data else None
+                if row:
+                    lookup.add(row)
+
+        if exists:
             return InsertResponse(
                 success=False,
                 message=f"Miniatura '{model_name}' já existe no banco de dados"
             )
-        
-        # Inserir nova miniatura usando a chave de serviço (ignora RLS)
-        result = supabase.table('miniatures_master').insert(insert_data).execute()
-        
-        if result.data:
+
+        if row:
             return InsertResponse(
                 success=True,
                 message=f"Miniatura '{model_name}' inserida com sucesso",
-                data=result.data[0]
+                data=row
             )
         else:
             return InsertResponse(
@@ -130,69 +701,154 @@ async def create_miniature(miniature: Miniature, username: str = Depends(verify_
 
 # Rota para inserir múltiplas miniaturas
 @app.post("/miniatures/batch", response_model=Dict[str, Any], tags=["Miniatures"])
-async def create_miniatures_batch(miniatures: List[Miniature], username: str = Depends(verify_credentials)):
+async def create_miniatures_batch(
+    miniatures: List[Miniature],
+    username: str = Depends(verify_credentials),
+    db: CatalogDB = Depends(get_db),
+    lookup: CatalogLookupIndex = Depends(get_lookup),
+):
+    mark("validation")
+    BATCH_SIZE.observe(len(miniatures), route="/miniatures/batch")
     results = {
         "total": len(miniatures),
         "successful": 0,
         "failed": 0,
         "details": []
     }
-    
-    for miniature in miniatures:
-        try:
-            # Converter o modelo Pydantic para dicionário e remover valores None
-            insert_data = {k: v for k, v in miniature.dict().items() if v is not None}
-            
-            # Verificar se a miniatura já existe
-            model_name = insert_data['model_name']
-            launch_year = insert_data.get('launch_year')
-            series = insert_data.get('series', '')
-            
-            query = supabase.table('miniatures_master').select('id').eq('model_name', model_name)
-            if launch_year:
-                query = query.eq('launch_year', launch_year)
-            if series:
-                query = query.eq('series', series)
-                
-            existing = query.execute()
-            
-            if existing.data:
-                results["failed"] += 1
-                results["details"].append({
-                    "model_name": model_name,
-                    "success": False,
-                    "message": "Já existe no banco de dados"
-                })
-                continue
-            
-            # Inserir nova miniatura
-            result = supabase.table('miniatures_master').insert(insert_data).execute()
-            
-            if result.data:
-                results["successful"] += 1
-                results["details"].append({
-                    "model_name": model_name,
-                    "success": True,
-                    "message": "Inserida com sucesso",
-                    "id": result.data[0]["id"]
-                })
-            else:
-                results["failed"] += 1
-                results["details"].append({
-                    "model_name": model_name,
-                    "success": False,
-                    "message": "Erro ao inserir: Sem dados retornados"
-                })
-        except Exception as e:
-            results["failed"] += 1
-            results["details"].append({
-                "model_name": miniature.model_name,
-                "success": False,
-                "message": f"Erro: {str(e)}"
-            })
-    
+    pending, resolved = prepare_batch(miniatures)
+    details: List[Optional[Dict[str, Any]]] = [None] * len(miniatures)
+    for index, detail in resolved.items():
+        details[index] = detail
+
+    # Processar em blocos: uma consulta de existência e um upsert por bloco
+    for chunk in chunked(pending, BATCH_CHUNK_SIZE):
+        for index, detail in (await process_batch_chunk(db, lookup, chunk)).items():
+            details[index] = detail
+
+    results["details"] = details
+    results["successful"] = sum(1 for detail in details if detail["success"])
+    results["failed"] = len(details) - results["successful"]
     return results
 
+# Rota para importar NDJSON em streaming: uma miniatura por linha na entrada,
+# um resultado por linha na saída (à medida que cada bloco é gravado).
+# O cliente precisa ler a resposta enquanto envia (ex.: curl -sN -T catalogo.ndjson
+# -H 'Content-Type: application/x-ndjson'); quem só lê depois de enviar tudo
+# trava quando os buffers de rede enchem.
+@app.post(
+    "/miniatures/stream",
+    tags=["Miniatures"],
+    response_class=NDJSONStreamingResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/x-ndjson": {"schema": {"type": "string", "format": "binary"}}},
+        }
+    },
+)
+async def create_miniatures_stream(
+    request: Request,
+    username: str = Depends(verify_credentials),
+    db: CatalogDB = Depends(get_db),
+    lookup: CatalogLookupIndex = Depends(get_lookup),
+):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in NDJSON_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Envie o corpo como application/x-ndjson (uma miniatura por linha)"
+        )
+    mark("validation")
+    return NDJSONStreamingResponse(stream_ingest(request, db, lookup))
+
+# Rota para importar lotes grandes em segundo plano: responde na hora com o id do job
+@app.post("/jobs/miniatures", response_model=Dict[str, Any], status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"])
+async def create_import_job(
+    miniatures: List[Miniature],
+    request: Request,
+    username: str = Depends(verify_credentials),
+    jobs: JobStore = Depends(get_jobs),
+):
+    mark("validation")
+    BATCH_SIZE.observe(len(miniatures), route="/jobs/miniatures")
+    if not miniatures:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Lote vazio")
+    if len(miniatures) > JOB_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo de {JOB_MAX_ITEMS} miniaturas por job"
+        )
+
+    pending, resolved = prepare_batch(miniatures)
+    with phase("enqueue"):
+        job_id = await asyncio.to_thread(jobs.create, pending, resolved)
+    request.app.state.job_runner.notify()
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "total": len(miniatures),
+        "status_url": f"/jobs/{job_id}",
+    }
+
+# Rota para acompanhar um job: progresso e resultado por item (paginado por offset)
+@app.get("/jobs/{job_id}", response_model=Dict[str, Any], tags=["Jobs"])
+async def get_import_job(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=LIST_MAX_LIMIT),
+    only_failed: bool = Query(False, description="Só os itens que falharam"),
+    username: str = Depends(verify_credentials),
+    jobs: JobStore = Depends(get_jobs),
+):
+    job = await asyncio.to_thread(jobs.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job não encontrado")
+    details = await asyncio.to_thread(jobs.results, job_id, offset, limit, only_failed)
+    # Processo dono do job (hostname:pid) é detalhe interno
+    job.pop("owner", None)
+    for field in ("created_at", "started_at", "finished_at", "updated_at", "lease_until"):
+        if job[field] is not None:
+            job[field] = datetime.fromtimestamp(job[field], timezone.utc).isoformat()
+    return {
+        **job,
+        "progress": round(job["processed"] / job["total"], 4) if job["total"] else 1.0,
+        "details": details,
+        "next_offset": offset + len(details) if len(details) == limit else None,
+    }
+
+# Rota para resolver códigos escaneados (UPC, base code, número de coleção) em lote
+@app.post("/lookup/batch", response_model=Dict[str, Any], tags=["Lookup"])
+async def lookup_batch(
+    request: LookupBatchRequest,
+    username: str = Depends(verify_credentials),
+    lookup: CatalogLookupIndex = Depends(get_lookup),
+):
+    mark("validation")
+    BATCH_SIZE.observe(len(request.codes), route="/lookup/batch")
+    if request.kind is not None and request.kind not in LOOKUP_KINDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Tipo de código inválido: {request.kind}"
+        )
+    if len(request.codes) > LOOKUP_BATCH_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo de {LOOKUP_BATCH_MAX} códigos por requisição"
+        )
+    if not lookup.ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Índice de busca ainda está sendo carregado"
+        )
+
+    with phase("lookup"):
+        results = [lookup.lookup(code, request.kind) for code in request.codes]
+    return {
+        "total": len(results),
+        "found": sum(1 for result in results if result["matches"]),
+        "results": results,
+    }
+
 # Iniciar servidor se executado diretamente
 if __name__ == "__main__":
     # Verificar se as credenciais padrão estão sendo usadas
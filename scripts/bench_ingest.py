@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark de escala dos caminhos de carga do catálogo (10k, 100k, 1M linhas).
+
+Alimenta cada caminho com o catálogo sintético (synthetic_catalog.py) contra o
+PostgREST em memória (postgrest_stub.py), servido por HTTP local:
+
+- scraper:     estágio de gravação do scrape_hotwheels_updated (process_versions
+               + UpsertBuffer), página a página de ~25 versões;
+- fast_wheels: import_fast_wheels (stream_miniatures + FastWheelsLoader, com o
+               cache de chaves), sem o download da API;
+- api:         POST /miniatures/batch da api_server (no mesmo processo do
+               cliente), em lotes de --batch-size com --api-concurrency.
+
+Cada combinação roda num subprocesso próprio (pico de RSS isolado) contra a
+tabela vazia, e mede tempo total, idas ao banco e pico de RSS. Uma combinação
+que passa de --timeout é marcada como "timeout": é ali que o caminho parou de
+escalar.
+
+Uso:
+    python bench_ingest.py                                  # 10k,100k,1M x todos os caminhos
+    python bench_ingest.py --sizes 10k,100k --paths api,fast_wheels --json ingest.json
+    python bench_ingest.py --sizes 100k --latency-ms 5      # com latência de banco
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+PATHS = ("scraper", "fast_wheels", "api")
+DEFAULT_SIZES = "10k,100k,1M"
+# O cliente supabase-py exige uma chave no formato JWT
+STUB_KEY = "eyJhbGciOiJub25lIn0.eyJyb2xlIjoic2VydmljZV9yb2xlIn0.stub"
+VERSIONS_PER_PAGE = 25
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    try:
+        return int(float(value.rstrip("km")) * multiplier)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"tamanho inválido: {value!r}")
+
+
+def format_size(rows: int) -> str:
+    if rows >= 1_000_000 and rows % 1_000_000 == 0:
+        return f"{rows // 1_000_000}M"
+    if rows >= 1_000 and rows % 1_000 == 0:
+        return f"{rows // 1_000}k"
+    return str(rows)
+
+
+def peak_rss_mib() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB no Linux, bytes no macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# ---------- caminhos (rodam no subprocesso) ----------
+def run_scraper(rows, stub_url: str, args) -> None:
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        import scrape_hotwheels_updated as scraper
+    supabase = scraper.create_supabase_client(stub_url, STUB_KEY)
+    scraper.WRITE_BUFFER = scraper.create_write_buffer(supabase, args.batch_size, 2000)
+    page: List[Dict] = []
+    # process_versions imprime cada versão: o custo fica, a saída vai para o nada
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        for row in rows:
+            page.append(row)
+            if len(page) >= VERSIONS_PER_PAGE:
+                scraper.process_versions(supabase, page)
+                page = []
+        if page:
+            scraper.process_versions(supabase, page)
+        scraper.WRITE_BUFFER.close()
+
+
+def run_fast_wheels(rows, stub_url: str, args) -> None:
+    from supabase import create_client
+
+    import import_fast_wheels as fw
+    from existing_keys import ExistingKeyCache
+    from synthetic_catalog import to_fast_wheels_car
+
+    supabase = create_client(stub_url, STUB_KEY)
+    key_cache = ExistingKeyCache.open(supabase)
+    loader = fw.FastWheelsLoader(supabase, key_cache, batch_size=args.batch_size)
+    years_data = ((row["launch_year"], [to_fast_wheels_car(row)]) for row in rows)
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        try:
+            for miniatura in fw.stream_miniatures(years_data, None):
+                loader.add(miniatura)
+        finally:
+            loader.close()
+
+
+def run_api(rows, stub_url: str, args) -> None:
+    os.environ["SUPABASE_URL"] = stub_url
+    os.environ["SUPABASE_SERVICE_KEY"] = STUB_KEY
+    os.environ.setdefault("JOBS_DB_PATH", os.path.join(tempfile.gettempdir(), "bench_ingest_jobs.sqlite3"))
+    import httpx
+
+    import api_server
+
+    fields = set(api_server.Miniature.__fields__)
+
+    async def drive() -> None:
+        async with api_server.lifespan(api_server.app):
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=api_server.app),
+                base_url="http://api",
+                auth=(api_server.API_USERNAME, api_server.API_PASSWORD),
+                timeout=600,
+            ) as client:
+                lock = asyncio.Lock()
+                source = iter(rows)
+
+                async def worker() -> None:
+                    while True:
+                        async with lock:
+                            batch = [{k: v for k, v in row.items() if k in fields}
+                                     for _, row in zip(range(args.batch_size), source)]
+                        if not batch:
+                            return
+                        response = await client.post("/miniatures/batch", json=batch)
+                        response.raise_for_status()
+
+                await asyncio.gather(*(worker() for _ in range(args.api_concurrency)))
+
+    asyncio.run(drive())
+
+
+RUNNERS = {"scraper": run_scraper, "fast_wheels": run_fast_wheels, "api": run_api}
+
+
+def child_main(args) -> int:
+    from synthetic_catalog import generate_catalog
+
+    rows = generate_catalog(args.rows, args.seed)
+    started = time.perf_counter()
+    RUNNERS[args.child](rows, args.stub_url, args)
+    elapsed = time.perf_counter() - started
+    with open(args.result_file, "w", encoding="utf-8") as f:
+        json.dump({"seconds": elapsed, "peak_rss_mib": peak_rss_mib()}, f)
+    return 0
+
+
+# ---------- orquestração ----------
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(latency_ms: float, jitter_ms: float):
+    import uvicorn
+
+    from postgrest_stub import PostgRESTStub
+
+    stub = PostgRESTStub(latency_ms, jitter_ms)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(stub.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return stub, server, f"http://127.0.0.1:{port}"
+
+
+def run_one(path: str, rows: int, stub, stub_url: str, args) -> Dict:
+    stub.requests.clear()
+    stub.table = type(stub.table)()
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+        result_file = tmp.name
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", path, "--rows", str(rows),
+           "--seed", str(args.seed), "--stub-url", stub_url, "--result-file", result_file,
+           "--batch-size", str(args.batch_size), "--api-concurrency", str(args.api_concurrency)]
+    result = {"path": path, "rows": rows, "status": "ok"}
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=args.timeout,
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+        if proc.returncode != 0:
+            result["status"] = "erro"
+            print((proc.stdout + proc.stderr)[-2000:], file=sys.stderr)
+        else:
+            with open(result_file, encoding="utf-8") as f:
+                result.update(json.load(f))
+    except subprocess.TimeoutExpired:
+        result["status"] = "timeout"
+        result["seconds"] = args.timeout
+    finally:
+        os.unlink(result_file)
+    result["round_trips"] = stub.total_requests
+    result["by_kind"] = dict(stub.requests)
+    result["stored_rows"] = len(stub.table.rows)
+    return result
+
+
+def print_result(r: Dict) -> None:
+    seconds = r.get("seconds") or 0.0
+    rps = f"{r['rows'] / seconds:>10.0f}" if r["status"] == "ok" and seconds else f"{'-':>10}"
+    rss = f"{r['peak_rss_mib']:>9.0f}" if r.get("peak_rss_mib") is not None else f"{'-':>9}"
+    per_trip = r["stored_rows"] / r["round_trips"] if r["round_trips"] else 0.0
+    print(f"{r['path']:<12} {format_size(r['rows']):>6} {seconds:>9.1f} {rps} {r['round_trips']:>8} "
+          f"{per_trip:>10.1f} {r['stored_rows']:>9} {rss} {r['status']:>8}")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark de escala da carga do catálogo (scraper, fast_wheels, api)")
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help=f"Tamanhos, ex.: 10k,100k,1M (padrão: {DEFAULT_SIZES})")
+    ap.add_argument("--paths", default=",".join(PATHS), help=f"Caminhos: {','.join(PATHS)}")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--batch-size", type=int, default=500, help="Linhas por lote (buffer/loader/requisição)")
+    ap.add_argument("--api-concurrency", type=int, default=4, help="Requisições simultâneas no caminho api")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="Latência simulada do banco")
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    ap.add_argument("--timeout", type=float, default=1800, help="Segundos por combinação antes de desistir")
+    ap.add_argument("--json", help="Grava os resultados em JSON")
+    # uso interno: execução de uma combinação no subprocesso
+    ap.add_argument("--child", choices=PATHS, help=argparse.SUPPRESS)
+    ap.add_argument("--rows", type=int, help=argparse.SUPPRESS)
+    ap.add_argument("--stub-url", help=argparse.SUPPRESS)
+    ap.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        return child_main(args)
+
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    paths = [p for p in args.paths.split(",") if p]
+    unknown = [p for p in paths if p not in PATHS]
+    if unknown:
+        ap.error(f"caminho desconhecido: {', '.join(unknown)}")
+
+    stub, server, stub_url = start_stub(args.latency_ms, args.jitter_ms)
+    print(f"[INFO] PostgREST local em {stub_url} (latência {args.latency_ms:.0f} ms) | seed {args.seed}\n")
+    print(f"{'caminho':<12} {'linhas':>6} {'tempo s':>9} {'linhas/s':>10} {'idas':>8} "
+          f"{'linhas/ida':>10} {'no banco':>9} {'RSS MiB':>9} {'status':>8}")
+    results = []
+    try:
+        for rows in sizes:
+            for path in paths:
+                result = run_one(path, rows, stub, stub_url, args)
+                print_result(result)
+                results.append(result)
+    finally:
+        server.should_exit = True
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"\nResultados salvos em {args.json}")
+    return 0 if all(r["status"] == "ok" for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Micro-benchmark do parsing do scraper sobre o acervo de páginas gravadas.
+
+Mede, por backend (html.parser, lxml e o parser de wikitext do --source api):
+páginas/s, custo por linha extraída (versão ou link) e pico de memória
+(tracemalloc) — o trabalho que `scrape_hotwheels_model`,
+`get_model_urls_from_list_page` e a detecção de TH/STH (`build_versions`) fazem
+depois do download.
+
+Uso:
+    python bench_parsers.py                                  # fixtures/fandom + fixtures/mediawiki
+    python bench_parsers.py --save-baseline bench.json       # grava a referência desta máquina
+    python bench_parsers.py --baseline bench.json --threshold 0.15
+                                                             # falha (exit 1) se páginas/s cair >15%
+    python bench_parsers.py --make-large                     # regera as fixtures grandes (*.html.gz)
+
+As fixtures `*_large_*.html.gz` são páginas gravadas do Fandom com as linhas da
+tabela replicadas (centenas de versões / milhares de links), para exercitar o
+caso de páginas muito grandes. A referência depende da máquina: grave-a no
+mesmo ambiente em que o benchmark vai rodar.
+"""
+
+import argparse
+import gc
+import gzip
+import json
+import os
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+import fandom_parser
+from compare_parsers import FIXTURES_DIR, iter_fixture_pages
+
+WIKITEXT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "mediawiki")
+
+# (nome, tipo 'model'|'list'|'wikitext', conteúdo)
+Page = Tuple[str, str, str]
+
+
+# ---------- fixtures grandes ----------
+def _replicate_table_rows(html: str, count: int, rewrite: Callable[[str, int], str]) -> str:
+    start = html.index('class="wikitable')
+    end = html.index("</table>", start)
+    table = html[start:end]
+    parts = table.split("<tr>")
+    head, rows = parts[:2], parts[2:]
+    out = [rewrite(rows[i % len(rows)], i) for i in range(count)]
+    return html[:start] + "<tr>".join(head + out) + html[end:]
+
+
+def make_large_model(html: str, count: int) -> str:
+    series = ["Treasure Hunts", "Super Treasure Hunts", "HW Flames", "HW Dream Garage", "Mainline"]
+
+    def rewrite(row: str, i: int) -> str:
+        row = re.sub(r"\b\d{3}/\d{3}\b", f"{i + 1:03d}/{count}", row)
+        row = re.sub(r"<td>(19|20)\d\d\n", f"<td>{1995 + i % 30}\n", row, count=1)
+        # ~1 em 20 TH e ~1 em 60 STH, como nas páginas reais
+        if i % 20 == 0:
+            name = series[1] if i % 60 == 0 else series[0]
+            row = re.sub(r'title="[^"]*">[^<]*</a>', f'title="{name}">{name}</a>', row, count=1)
+        return row
+
+    return _replicate_table_rows(html, count, rewrite)
+
+
+def make_large_list(html: str, count: int) -> str:
+    def rewrite(row: str, i: int) -> str:
+        row = re.sub(r"\b\d{3}/\d{3}\b", f"{i + 1:04d}/{count}", row)
+        return re.sub(r'href="/wiki/([^"]+)"', lambda m: f'href="/wiki/{m.group(1)}_{i}"', row)
+
+    return _replicate_table_rows(html, count, rewrite)
+
+
+LARGE_FIXTURES = (
+    ("model_bone_shaker.html", "model_large_bone_shaker_600.html.gz", make_large_model, 600),
+    ("list_2020_hot_wheels.html", "list_large_2020_hot_wheels_3000.html.gz", make_large_list, 3000),
+)
+
+
+def write_large_fixtures(directory: str) -> None:
+    for source, target, make, count in LARGE_FIXTURES:
+        with open(os.path.join(directory, source), encoding="utf-8") as f:
+            html = make(f.read(), count)
+        path = os.path.join(directory, target)
+        # mtime=0: o .gz não muda entre execuções com o mesmo conteúdo
+        with open(path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+            f.write(html.encode("utf-8"))
+        print(f"[INFO] {target}: {len(html) / 1024:.0f} KiB")
+
+
+# ---------- medição ----------
+def load_pages(html_dir: str, wikitext_dir: str) -> List[Page]:
+    pages = list(iter_fixture_pages(html_dir))
+    if wikitext_dir and os.path.isdir(wikitext_dir):
+        for name in sorted(os.listdir(wikitext_dir)):
+            if name.endswith(".wikitext"):
+                with open(os.path.join(wikitext_dir, name), encoding="utf-8") as f:
+                    pages.append((name, "wikitext", f.read()))
+    return pages
+
+
+def parser_for(kind: str, backend: str) -> Callable[[str], list]:
+    if kind == "wikitext":
+        return lambda text: fandom_parser.parse_model_wikitext("Benchmark", text)
+    fn = fandom_parser.parse_list_page if kind == "list" else fandom_parser.parse_model_page
+    return lambda html: fn(html, backend=backend)
+
+
+def time_page(fn: Callable[[str], list], content: str, min_time: float, min_runs: int) -> Tuple[float, int]:
+    """(mediana em segundos por chamada, execuções) com pelo menos `min_time` de medição."""
+    samples: List[float] = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < min_runs or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        fn(content)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), len(samples)
+
+
+def peak_memory(fn: Callable[[str], list], content: str) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(content)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_backend(backend: str, pages: List[Page], min_time: float, min_runs: int) -> Dict:
+    total_time = total_rows = total_pages = 0
+    peak = 0
+    for name, kind, content in pages:
+        if (kind == "wikitext") != (backend == "wikitext"):
+            continue
+        fn = parser_for(kind, backend)
+        rows = len(fn(content))  # aquece caches/imports fora da medição
+        per_call, runs = time_page(fn, content, min_time, min_runs)
+        page_peak = peak_memory(fn, content)
+        peak = max(peak, page_peak)
+        total_time += per_call
+        total_rows += rows
+        total_pages += 1
+        per_row = per_call / rows * 1e6 if rows else 0.0
+        print(f"  {name[-44:]:<44} {kind:<8} {rows:>6} {per_call * 1000:>9.2f} {per_row:>9.1f} "
+              f"{page_peak / 1024:>9.0f} {runs:>6}")
+    return {
+        "pages": total_pages,
+        "rows": total_rows,
+        "seconds": total_time,
+        "pages_per_second": total_pages / total_time if total_time else 0.0,
+        "us_per_row": total_time / total_rows * 1e6 if total_rows else 0.0,
+        "peak_kib": peak / 1024,
+    }
+
+
+def bench_build_versions(pages: List[Page], min_time: float, min_runs: int) -> Dict:
+    """Só o mapeamento de colunas + detecção de TH/STH, sobre as tabelas já extraídas."""
+    tables = []
+    for _, kind, content in pages:
+        if kind == "model":
+            extracted = fandom_parser._extract_model_bs4(content)
+            if extracted:
+                tables.append(extracted)
+    rows = sum(len(t[3]) for t in tables)
+    per_call, _ = time_page(lambda _: [fandom_parser.build_versions(*t) for t in tables], "", min_time, min_runs)
+    return {"rows": rows, "seconds": per_call, "us_per_row": per_call / rows * 1e6 if rows else 0.0}
+
+
+def compare_with_baseline(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    regressions = []
+    for backend, current in results["backends"].items():
+        ref = baseline.get("backends", {}).get(backend)
+        if not ref or not ref.get("pages_per_second"):
+            continue
+        change = current["pages_per_second"] / ref["pages_per_second"] - 1
+        status = "REGRESSÃO" if change < -threshold else "ok"
+        print(f"  {backend:<12} {ref['pages_per_second']:>10.1f} -> {current['pages_per_second']:>10.1f} "
+              f"páginas/s ({change:+.1%}) {status}")
+        if change < -threshold:
+            regressions.append(backend)
+    return regressions
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark dos parsers do scraper sobre as fixtures gravadas")
+    ap.add_argument("--dir", default=FIXTURES_DIR, help="Pasta com páginas .html/.html.gz")
+    ap.add_argument("--wikitext-dir", default=WIKITEXT_DIR, help="Pasta com páginas .wikitext ('' desliga)")
+    ap.add_argument("--backend", action="append", choices=fandom_parser.PARSER_BACKENDS + ("wikitext",),
+                    help="Backend a medir (pode repetir; padrão: todos)")
+    ap.add_argument("--min-time", type=float, default=0.3, help="Segundos mínimos de medição por página")
+    ap.add_argument("--min-runs", type=int, default=5, help="Execuções mínimas por página")
+    ap.add_argument("--baseline", help="JSON de referência (--save-baseline) para detectar regressão")
+    ap.add_argument("--threshold", type=float, default=0.15, help="Queda máxima aceita em páginas/s (0.15 = 15%%)")
+    ap.add_argument("--save-baseline", help="Grava os resultados desta execução como referência")
+    ap.add_argument("--make-large", action="store_true", help="Regera as fixtures grandes e sai")
+    args = ap.parse_args()
+
+    if args.make_large:
+        write_large_fixtures(args.dir)
+        return 0
+
+    pages = load_pages(args.dir, args.wikitext_dir)
+    if not pages:
+        print("Nenhuma página encontrada.", file=sys.stderr)
+        return 2
+
+    backends = args.backend or list(fandom_parser.PARSER_BACKENDS) + ["wikitext"]
+    results: Dict = {"backends": {}}
+    for backend in backends:
+        print(f"\n[{backend}]")
+        print(f"  {'página':<44} {'tipo':<8} {'linhas':>6} {'ms/pág':>9} {'µs/linha':>9} {'pico KiB':>9} {'exec':>6}")
+        results["backends"][backend] = stats = bench_backend(backend, pages, args.min_time, args.min_runs)
+        print(f"  => {stats['pages']} páginas | {stats['pages_per_second']:.1f} páginas/s | "
+              f"{stats['us_per_row']:.1f} µs/linha | pico {stats['peak_kib']:.0f} KiB")
+
+    build = bench_build_versions(pages, args.min_time, args.min_runs)
+    results["build_versions"] = build
+    print(f"\n[build_versions + TH/STH] {build['rows']} linhas | {build['us_per_row']:.2f} µs/linha")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nReferência salva em {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nComparação com {args.baseline} (limite: -{args.threshold:.0%}):")
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n[ERRO] Queda de throughput acima do limite em: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""Camada de acesso assíncrona ao PostgREST do Supabase.
+
+Usa o cliente assíncrono do `postgrest` (o mesmo que o `supabase` usa por baixo)
+sobre um único pool de conexões keep-alive do httpx, para que as rotas da API
+não bloqueiem o event loop enquanto esperam o banco.
+"""
+
+import asyncio
+import base64
+import json
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Cursor opaco de paginação keyset a partir de (created_at, id) da última linha."""
+    raw = json.dumps([row['created_at'], row['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Inverso de `encode_cursor`; levanta ValueError para cursores inválidos."""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception as e:
+        raise ValueError(f"cursor inválido: {cursor}") from e
+    return str(created_at), str(row_id)
+
+
+def keyset_after(query, cursor: Optional[str]):
+    """Ordena por (created_at, id) decrescente e continua depois do cursor, sem OFFSET."""
+    # Um único parâmetro `order` com as duas colunas (order repetido não é combinado pelo PostgREST)
+    query = query.order('created_at.desc,id', desc=True)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # O `or` sozinho vira Filter: o Postgres percorre o índice desde o início
+        # e descarta as linhas já vistas. O `lte` é o limite que vira Index Cond.
+        query = query.lte('created_at', created_at).or_(
+            f'created_at.lt."{created_at}",'
+            f'and(created_at.eq."{created_at}",id.lt.{row_id})'
+        )
+    return query
+
+
+def missing_default(query, rows: List[Dict[str, Any]]):
+    """Permite um insert/upsert em lote com objetos de colunas diferentes numa só requisição.
+
+    `columns=` lista a união das chaves e `Prefer: missing=default` (PostgREST
+    v12+) faz a coluna ausente num objeto receber o DEFAULT do banco, e não NULL.
+    """
+    columns = sorted({column for row in rows for column in row})
+    query.params = query.params.set('columns', ','.join(columns))
+    query.headers['Prefer'] = f"{query.headers.get('Prefer', '')},missing=default".lstrip(',')
+    return query
+
+
+class _PooledPostgrestClient(AsyncPostgrestClient):
+    """Cliente PostgREST que cria a sessão httpx com limites de pool explícitos."""
+
+    def __init__(self, base_url: str, *, limits: httpx.Limits,
+                 transport: Optional[httpx.AsyncBaseTransport] = None, **kwargs):
+        self._limits = limits
+        self._transport = transport
+        super().__init__(base_url, **kwargs)
+
+    def create_session(self, base_url, headers, timeout, *args, **kwargs):
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            limits=self._limits,
+            transport=self._transport,
+        )
+
+
+class CatalogDB:
+    """Acesso assíncrono às tabelas do Supabase com pool de conexões compartilhado.
+
+    Deve ser aberto uma vez por processo (no lifespan do FastAPI) e fechado no
+    desligamento. `max_connections` também limita quantas requisições ao banco
+    ficam em voo ao mesmo tempo. `on_query(method, table, seconds, ok, wait)`,
+    opcional, é chamado a cada ida ao banco (métricas). `transport` troca o
+    transporte HTTP (ex.: `httpx.ASGITransport` do postgrest_stub em testes de carga).
+    """
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        *,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        timeout: float = 30.0,
+        on_query: Optional[Callable[[str, str, float, bool, float], None]] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.url = url.rstrip('/')
+        self.key = key
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.timeout = timeout
+        self.on_query = on_query
+        self.transport = transport
+        self._client: Optional[_PooledPostgrestClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def open(self) -> None:
+        headers = {
+            **DEFAULT_POSTGREST_CLIENT_HEADERS,
+            'apikey': self.key,
+            'Authorization': f'Bearer {self.key}',
+        }
+        self._client = _PooledPostgrestClient(
+            f'{self.url}/rest/v1',
+            headers=headers,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+            ),
+            transport=self.transport,
+        )
+        self._semaphore = asyncio.Semaphore(self.max_connections)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def table(self, name: str):
+        """Retorna o construtor de consultas assíncrono para a tabela."""
+        if self._client is None:
+            raise RuntimeError("CatalogDB não foi aberto (chame open() no lifespan)")
+        return self._client.table(name)
+
+    async def execute(self, query) -> Any:
+        """Executa uma consulta construída com `table()` respeitando o limite de concorrência."""
+        if self.on_query is None:
+            async with self._semaphore:
+                return await query.execute()
+
+        queued = time.perf_counter()
+        async with self._semaphore:
+            started = time.perf_counter()
+            ok = False
+            try:
+                result = await query.execute()
+                ok = True
+                return result
+            finally:
+                self.on_query(
+                    getattr(query, 'http_method', '?'),
+                    getattr(query, 'path', '').strip('/') or '?',
+                    time.perf_counter() - started,
+                    ok,
+                    started - queued,
+                )
+
+    async def iter_pages(
+        self,
+        table: str,
+        columns: str = '*',
+        page_size: int = 1000,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Percorre a tabela inteira em páginas keyset de (created_at, id)."""
+        if columns != '*':
+            for column in ('created_at', 'id'):
+                if column not in columns.split(','):
+                    columns = f'{columns},{column}'
+        cursor = None
+        while True:
+            query = keyset_after(self.table(table).select(columns), cursor).limit(page_size)
+            result = await self.execute(query)
+            if not result.data:
+                return
+            yield result.data
+            if len(result.data) < page_size:
+                return
+            cursor = encode_cursor(result.data[-1])
+
+    async def __aenter__(self) -> 'CatalogDB':
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
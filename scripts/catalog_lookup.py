@@ -0,0 +1,149 @@
+"""Índice em memória para buscas exatas no catálogo.
+
+Mantém tabelas hash por UPC normalizado, código de produto (base code) e número
+de coleção, para que um código escaneado seja resolvido em O(1) em vez de uma
+varredura linear do catálogo.
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterable, Optional, Set
+
+# Tipos de código aceitos, na ordem em que são tentados quando o tipo não é informado
+LOOKUP_KINDS = ('upc', 'product_code', 'collection_number')
+
+# Campos guardados em cada entrada do índice (o suficiente para autopreencher o formulário)
+ENTRY_FIELDS = (
+    'id', 'model_name', 'brand', 'launch_year', 'series', 'collection_number',
+    'collector_number', 'product_code', 'upc', 'image_url',
+)
+
+# Colunas lidas do banco para montar o índice (miniatures_master não tem upc)
+INDEX_COLUMNS = 'id,model_name,brand,launch_year,series,collection_number,collector_number,product_code,image_url'
+
+
+def normalize_upc(value: Any) -> Optional[str]:
+    """Somente dígitos, completado com zeros à esquerda até 14 (GTIN-14).
+
+    Assim UPC-A (12), EAN-13 e GTIN-14 do mesmo produto caem na mesma chave.
+    """
+    if value is None:
+        return None
+    digits = re.sub(r'\D', '', str(value))
+    if not 8 <= len(digits) <= 14:
+        return None
+    return digits.zfill(14)
+
+
+def normalize_product_code(value: Any) -> Optional[str]:
+    """Base code em maiúsculas, sem sufixos (ex.: 'gtb71 - 0910' -> 'GTB71')."""
+    if value is None:
+        return None
+    match = re.search(r'[A-Za-z0-9]+', str(value))
+    if not match:
+        return None
+    return match.group(0).upper()
+
+
+def normalize_collection_number(value: Any) -> Optional[str]:
+    """Números sem zeros à esquerda ('#01/250' -> '1/250', '007' -> '7')."""
+    if value is None:
+        return None
+    numbers = re.findall(r'\d+', str(value))
+    if not numbers:
+        return None
+    return '/'.join(str(int(n)) for n in numbers[:2])
+
+
+# Formato que o código precisa ter para ser tentado como aquele tipo quando o
+# tipo não é informado: sem isso 'GTB71' (base code desconhecido) cairia no
+# índice de número de coleção como '71' e traria um modelo qualquer.
+SHAPES = {
+    'upc': re.compile(r'[\d\s-]+'),
+    'product_code': re.compile(r'\s*[A-Za-z0-9]*[A-Za-z][A-Za-z0-9]*(\s*-\s*\d+)?\s*'),
+    'collection_number': re.compile(r'\s*#?\s*\d+(\s*/\s*\d+)?\s*'),
+}
+
+NORMALIZERS = {
+    'upc': normalize_upc,
+    'product_code': normalize_product_code,
+    'collection_number': normalize_collection_number,
+}
+
+
+class CatalogLookupIndex:
+    """Índices hash (chave normalizada -> ids das miniaturas).
+
+    Um mesmo código pode apontar para mais de uma miniatura (ex.: '1/10' se
+    repete a cada ano), por isso cada chave guarda um conjunto de ids.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.indexes: Dict[str, Dict[str, Set[str]]] = {kind: {} for kind in LOOKUP_KINDS}
+        self.ready = False
+
+    def add(self, row: Dict[str, Any]) -> None:
+        if row.get('id') is None:
+            return
+        entry_id = str(row['id'])
+        self.entries[entry_id] = {field: row.get(field) for field in ENTRY_FIELDS if row.get(field) is not None}
+        keys = [
+            ('upc', normalize_upc(row.get('upc'))),
+            ('product_code', normalize_product_code(row.get('product_code'))),
+            ('collection_number', normalize_collection_number(row.get('collection_number'))),
+            # collector_number ('5') também resolve pelo índice de número de coleção
+            ('collection_number', normalize_collection_number(row.get('collector_number'))),
+        ]
+        for kind, key in keys:
+            if key:
+                self.indexes[kind].setdefault(key, set()).add(entry_id)
+
+    def add_many(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.add(row)
+
+    def lookup(self, code: str, kind: Optional[str] = None) -> Dict[str, Any]:
+        """Resolve um código; sem `kind`, tenta UPC, base code e número de coleção (pelo formato)."""
+        for candidate in ([kind] if kind else LOOKUP_KINDS):
+            if not kind and not SHAPES[candidate].fullmatch(str(code)):
+                continue
+            key = NORMALIZERS[candidate](code)
+            if not key:
+                continue
+            ids = self.indexes[candidate].get(key)
+            if ids:
+                return {"code": code, "kind": candidate, "matches": [self.entries[i] for i in ids]}
+        return {"code": code, "kind": kind, "matches": []}
+
+    def load_seed_file(self, path: str) -> int:
+        """Carrega um JSON no formato de data/miniatures_db.json (name/year/upc)."""
+        with open(path, encoding='utf-8') as f:
+            items = json.load(f)
+        for item in items:
+            self.add({
+                'model_name': item.get('model_name') or item.get('name'),
+                'brand': item.get('brand'),
+                'launch_year': item.get('launch_year') or item.get('year'),
+                'series': item.get('series'),
+                'collection_number': item.get('collection_number'),
+                'product_code': item.get('product_code'),
+                'upc': item.get('upc'),
+                'id': item.get('id') or f"seed:{item.get('upc') or item.get('name')}",
+            })
+        return len(items)
+
+    async def load_from_db(self, db, page_size: int = 1000) -> int:
+        """Monta o índice percorrendo miniatures_master com paginação keyset."""
+        total = 0
+        async for page in db.iter_pages('miniatures_master', INDEX_COLUMNS, page_size=page_size):
+            self.add_many(page)
+            total += len(page)
+        return total
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "entries": len(self.entries),
+            "keys": {kind: len(index) for kind, index in self.indexes.items()},
+        }
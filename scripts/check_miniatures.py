@@ -1,7 +1,11 @@
 from supabase import create_client
 import os
+import argparse
+from collections import Counter
 from dotenv import load_dotenv
 
+from catalog_db import encode_cursor, keyset_after
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
@@ -9,16 +13,117 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+PAGE_SIZE = 1000
+
+
+def count_exact(supabase, table='miniatures_master'):
+    """Total de linhas via `count=exact` (Content-Range), sem trazer as linhas."""
+    result = supabase.table(table).select('id', count='exact').limit(1).execute()
+    return result.count or 0
+
+
+def stats_from_rpc(supabase, top_n):
+    """Agregações feitas no banco pela função catalog_stats (add_catalog_stats.sql)."""
+    result = supabase.rpc('catalog_stats', {'top_n': top_n}).execute()
+    return result.data
+
+
+def stats_from_scan(supabase, top_n):
+    """Sem a função no banco: lê só as colunas agregadas em páginas keyset.
+
+    A memória usada cresce com o número de marcas/séries/anos distintos, não com
+    o de linhas.
+    """
+    brands, series, years = Counter(), Counter(), Counter()
+    total = treasure_hunts = super_treasure_hunts = 0
+    cursor = None
+    while True:
+        query = supabase.table('miniatures_master').select(
+            'brand,series,launch_year,is_treasure_hunt,is_super_treasure_hunt,created_at,id'
+        )
+        rows = keyset_after(query, cursor).limit(PAGE_SIZE).execute().data or []
+        for row in rows:
+            brands[row.get('brand')] += 1
+            series[row.get('series')] += 1
+            years[row.get('launch_year')] += 1
+            treasure_hunts += bool(row.get('is_treasure_hunt'))
+            super_treasure_hunts += bool(row.get('is_super_treasure_hunt'))
+        total += len(rows)
+        if len(rows) < PAGE_SIZE:
+            break
+        cursor = encode_cursor(rows[-1])
+
+    def top(counter):
+        items = sorted(counter.items(), key=lambda kv: (-kv[1], str(kv[0])))[:top_n]
+        return [{'value': value, 'count': n} for value, n in items]
+
+    return {
+        'total': total,
+        'treasure_hunts': treasure_hunts,
+        'super_treasure_hunts': super_treasure_hunts,
+        'distinct_brands': len([b for b in brands if b is not None]),
+        'distinct_series': len([s for s in series if s is not None]),
+        'by_brand': top(brands),
+        'by_series': top(series),
+        'by_launch_year': [{'value': y, 'count': n}
+                           for y, n in sorted(years.items(), key=lambda kv: (kv[0] is None, -(kv[0] or 0)))],
+    }
+
+
+def recent_miniatures(supabase, limit):
+    result = (
+        supabase.table('miniatures_master')
+        .select('model_name,brand,launch_year,created_at')
+        .order('created_at', desc=True)
+        .limit(limit)
+        .execute()
+    )
+    return result.data or []
+
+
+def print_counts(title, items):
+    print(f'\n{title}:')
+    if not items:
+        print('- (nenhuma)')
+    for item in items:
+        print(f"- {item['value'] if item['value'] is not None else '(sem valor)'}: {item['count']}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Estatísticas do catálogo (miniatures_master)')
+    ap.add_argument('--top', type=int, default=10, help='Quantas marcas/séries mostrar')
+    ap.add_argument('--recent', type=int, default=5, help='Quantas miniaturas recentes mostrar')
+    ap.add_argument('--no-rpc', action='store_true', help='Não usa a função catalog_stats do banco')
+    args = ap.parse_args()
+
+    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+    print(f'Total de miniaturas no banco: {count_exact(supabase)}')
+
+    stats = None
+    if not args.no_rpc:
+        try:
+            stats = stats_from_rpc(supabase, args.top)
+        except Exception as e:
+            print(f'\nAviso: função catalog_stats indisponível ({e}); execute add_catalog_stats.sql. '
+                  'Agregando pelas colunas em páginas keyset...')
+    if stats is None:
+        stats = stats_from_scan(supabase, args.top)
+
+    print(f"Treasure Hunts: {stats['treasure_hunts']} | Super Treasure Hunts: {stats['super_treasure_hunts']}")
+    print(f"Marcas distintas: {stats['distinct_brands']} | Séries distintas: {stats['distinct_series']}")
+    print_counts(f'Top {args.top} marcas', stats['by_brand'])
+    print_counts(f'Top {args.top} séries', stats['by_series'])
+    print_counts('Por ano de lançamento', stats['by_launch_year'])
 
-# Consultar a tabela miniatures_master
-result = supabase.table('miniatures_master').select('*').execute()
+    recent = recent_miniatures(supabase, args.recent)
+    if recent:
+        print(f'\nÚltimas {len(recent)} miniaturas adicionadas:')
+        for item in recent:
+            print(f'- {item.get("model_name")} ({item.get("brand")}) - {item.get("launch_year")}')
+    else:
+        print('\nNenhuma miniatura encontrada no banco de dados.')
 
-print(f'Total de miniaturas no banco: {len(result.data)}')
 
-if result.data:
-    print('\nÚltimas 5 miniaturas adicionadas:')
-    for item in result.data[-5:]:
-        print(f'- {item.get("model_name")} ({item.get("brand")}) - {item.get("launch_year")}')
-else:
-    print('\nNenhuma miniatura encontrada no banco de dados.')
+if __name__ == '__main__':
+    main()
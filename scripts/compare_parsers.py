@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Confere que os backends de parsing geram a mesma saída e mede o ganho por página.
+
+Uso:
+    python compare_parsers.py                      # fixtures em scripts/fixtures/fandom
+    python compare_parsers.py --dir outra/pasta    # *.html / *.html.gz (list_* = página de lista)
+    python compare_parsers.py --store .fandom      # acervo gravado pelo scraper com --store
+"""
+
+import argparse
+import gzip
+import os
+import statistics
+import sys
+import time
+from typing import Callable, Iterator, List, Tuple
+
+import fandom_parser
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "fandom")
+
+# (nome, tipo 'model'|'list', html)
+Page = Tuple[str, str, str]
+
+
+def read_html(path: str) -> str:
+    if path.endswith(".gz"):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return f.read()
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def iter_fixture_pages(directory: str) -> Iterator[Page]:
+    for name in sorted(os.listdir(directory)):
+        if not (name.endswith(".html") or name.endswith(".html.gz")):
+            continue
+        kind = "list" if name.startswith("list_") else "model"
+        yield name, kind, read_html(os.path.join(directory, name))
+
+
+def iter_store_pages(root: str) -> Iterator[Page]:
+    from page_store import PageStore
+
+    store = PageStore(root)
+    try:
+        for kind in ("model", "list"):
+            for url, html in store.iter_pages(kind):
+                yield url, kind, html
+    finally:
+        store.close()
+
+
+def parser_for(kind: str, backend: str) -> Callable[[str], list]:
+    fn = fandom_parser.parse_list_page if kind == "list" else fandom_parser.parse_model_page
+    return lambda html: fn(html, backend=backend)
+
+
+def time_per_call(fn: Callable[[str], list], html: str, repeat: int) -> float:
+    """Mediana em segundos de `repeat` execuções."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(html)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Compara os backends de parsing do scraper (saída e tempo)")
+    ap.add_argument("--dir", default=FIXTURES_DIR, help="Pasta com páginas .html/.html.gz")
+    ap.add_argument("--store", help="Usar o acervo do scraper (page_store) em vez da pasta")
+    ap.add_argument("--baseline", default="html.parser", choices=fandom_parser.PARSER_BACKENDS)
+    ap.add_argument("--candidate", default="lxml", choices=fandom_parser.PARSER_BACKENDS)
+    ap.add_argument("--repeat", type=int, default=20, help="Execuções por página e backend")
+    args = ap.parse_args()
+
+    pages = iter_store_pages(args.store) if args.store else iter_fixture_pages(args.dir)
+
+    mismatches: List[str] = []
+    total_base, total_cand, count = 0.0, 0.0, 0
+    print(f"{'página':<48} {'linhas':>6} {args.baseline + ' ms':>14} {args.candidate + ' ms':>10} {'ganho':>7}")
+    for name, kind, html in pages:
+        base_fn = parser_for(kind, args.baseline)
+        cand_fn = parser_for(kind, args.candidate)
+        expected = base_fn(html)
+        got = cand_fn(html)
+        if got != expected:
+            mismatches.append(name)
+
+        base_t = time_per_call(base_fn, html, args.repeat)
+        cand_t = time_per_call(cand_fn, html, args.repeat)
+        total_base += base_t
+        total_cand += cand_t
+        count += 1
+        speedup = base_t / cand_t if cand_t else float("inf")
+        flag = "" if got == expected else "  <-- DIFERENTE"
+        print(f"{name[-48:]:<48} {len(expected):>6} {base_t * 1000:>14.2f} {cand_t * 1000:>10.2f} {speedup:>6.1f}x{flag}")
+
+    if not count:
+        print("Nenhuma página encontrada.", file=sys.stderr)
+        return 2
+
+    print(f"\nPáginas: {count} | média {args.baseline}: {total_base / count * 1000:.2f} ms"
+          f" | média {args.candidate}: {total_cand / count * 1000:.2f} ms"
+          f" | ganho total: {total_base / total_cand:.1f}x")
+    if mismatches:
+        print(f"\n[ERRO] Saída diferente em {len(mismatches)} página(s):", file=sys.stderr)
+        for name in mismatches:
+            print(f" - {name}", file=sys.stderr)
+        return 1
+    print("Saídas idênticas em todas as páginas.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,3 @@
+# test_api_client.py e test_supabase_connection.py são scripts manuais contra
+# a API/Supabase de verdade (rede e credenciais), não testes do pytest.
+collect_ignore = ["test_api_client.py", "test_supabase_connection.py"]
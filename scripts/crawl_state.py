@@ -0,0 +1,173 @@
+"""Estado persistente do crawl (SQLite) para retomar execuções interrompidas.
+
+Cada URL descoberta numa página de lista fica registrada com status, horário
+do último download, hash do conteúdo e quantas linhas foram gravadas:
+
+    pending  -> descoberta, ainda não processada
+    fetched  -> baixada, linhas ainda não gravadas
+    buffered -> linhas no buffer de upserts em lote, aguardando o flush
+    done     -> linhas gravadas no banco
+    failed   -> download ou gravação falhou (refeita no --resume)
+
+Com `--resume` o scraper reaproveita a lista já descoberta e processa só o
+que não está `done`, na ordem original da lista.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lists (
+    list_url TEXT PRIMARY KEY,
+    discovered_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    list_url TEXT,
+    position INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    fetched_at REAL,
+    content_sha256 TEXT,
+    rows_written INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS urls_list_position ON urls (list_url, position);
+"""
+
+STATUSES = ("pending", "fetched", "buffered", "done", "failed")
+
+
+class CrawlState:
+    def __init__(self, path: str):
+        self.path = path
+        # usado pelo event loop, pelas threads de gravação e pelo timer do buffer
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _execute(self, sql: str, params: tuple = ()) -> None:
+        with self._lock:
+            self._db.execute(sql, params)
+            self._db.commit()
+
+    # ---------- descoberta ----------
+    def list_urls(self, list_url: str) -> Optional[List[str]]:
+        """URLs já descobertas para a lista (na ordem original), ou None se nunca coletada."""
+        with self._lock:
+            known = self._db.execute("SELECT 1 FROM lists WHERE list_url = ?", (list_url,)).fetchone()
+            if not known:
+                return None
+            rows = self._db.execute(
+                "SELECT url FROM urls WHERE list_url = ? ORDER BY position", (list_url,)
+            ).fetchall()
+        return [row["url"] for row in rows]
+
+    def add_urls(self, urls: List[str], list_url: Optional[str] = None) -> None:
+        """Registra as URLs como pendentes (mantém hash e contagem de execuções anteriores)."""
+        now = time.time()
+        with self._lock:
+            if list_url:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO lists (list_url, discovered_at) VALUES (?, ?)",
+                    (list_url, now),
+                )
+            self._db.executemany(
+                """
+                INSERT INTO urls (url, list_url, position, status, updated_at)
+                VALUES (?, ?, ?, 'pending', ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    list_url = COALESCE(excluded.list_url, urls.list_url),
+                    position = excluded.position,
+                    status = 'pending',
+                    error = NULL,
+                    updated_at = excluded.updated_at
+                """,
+                [(u, list_url, i, now) for i, u in enumerate(urls)],
+            )
+            self._db.commit()
+
+    def frontier(self, urls: List[str]) -> List[str]:
+        """As URLs de `urls` que ainda não estão concluídas, na mesma ordem."""
+        with self._lock:
+            done = {
+                row["url"]
+                for row in self._db.execute("SELECT url FROM urls WHERE status = 'done'")
+            }
+        return [u for u in urls if u not in done]
+
+    # ---------- progresso ----------
+    def mark_fetched(self, url: str, html: str) -> None:
+        sha256 = hashlib.sha256(html.encode("utf-8")).hexdigest()
+        now = time.time()
+        self._execute(
+            """
+            INSERT INTO urls (url, status, fetched_at, content_sha256, updated_at)
+            VALUES (?, 'fetched', ?, ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                status = 'fetched', fetched_at = excluded.fetched_at,
+                content_sha256 = excluded.content_sha256, error = NULL,
+                updated_at = excluded.updated_at
+            """,
+            (url, now, sha256, now),
+        )
+
+    def mark_written(self, url: str, rows: int) -> None:
+        """Linhas gravadas; não sobrescreve um download que falhou."""
+        self._execute(
+            "UPDATE urls SET status = 'done', rows_written = ?, updated_at = ? "
+            "WHERE url = ? AND status != 'failed'",
+            (rows, time.time(), url),
+        )
+
+    def mark_buffered(self, url: str) -> None:
+        """Linhas entregues ao buffer; a contagem só vem no flush (settle_buffered)."""
+        self._execute(
+            "UPDATE urls SET status = 'buffered', updated_at = ? WHERE url = ? AND status != 'failed'",
+            (time.time(), url),
+        )
+
+    def mark_failed(self, url: str, error: str) -> None:
+        now = time.time()
+        self._execute(
+            """
+            INSERT INTO urls (url, status, error, updated_at) VALUES (?, 'failed', ?, ?)
+            ON CONFLICT(url) DO UPDATE SET
+                status = 'failed', error = excluded.error, updated_at = excluded.updated_at
+            """,
+            (url, error, now),
+        )
+
+    def settle_buffered(self, url: str, written: int, failed: int) -> None:
+        """Resultado do flush para as linhas de `url`: done, ou failed se alguma delas falhou."""
+        if failed:
+            self._execute(
+                "UPDATE urls SET status = 'failed', rows_written = ?, error = ?, updated_at = ? "
+                "WHERE url = ? AND status = 'buffered'",
+                (written, f"{failed} linha(s) falharam no upsert em lote", time.time(), url),
+            )
+        else:
+            self._execute(
+                "UPDATE urls SET status = 'done', rows_written = ?, updated_at = ? "
+                "WHERE url = ? AND status = 'buffered'",
+                (written, time.time(), url),
+            )
+
+    def counts(self, urls: Optional[List[str]] = None) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute("SELECT url, status FROM urls").fetchall()
+        wanted = set(urls) if urls is not None else None
+        out = {s: 0 for s in STATUSES}
+        for row in rows:
+            if wanted is None or row["url"] in wanted:
+                out[row["status"]] = out.get(row["status"], 0) + 1
+        return out
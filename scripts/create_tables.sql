@@ -41,6 +41,12 @@ CREATE TABLE IF NOT EXISTS public.miniatures_master (
   collection_number TEXT,
   base_color TEXT,
   official_blister_photo_url TEXT,
+  product_code TEXT,
+  collector_number TEXT,
+  variants TEXT,
+  image_url TEXT,
+  is_treasure_hunt BOOLEAN DEFAULT FALSE,
+  is_super_treasure_hunt BOOLEAN DEFAULT FALSE,
   user_id UUID REFERENCES auth.users(id),
   visibility TEXT DEFAULT 'public',
   disponivel_para_negocio BOOLEAN DEFAULT FALSE,
@@ -49,9 +55,38 @@ CREATE TABLE IF NOT EXISTS public.miniatures_master (
   observacoes_negociacao TEXT,
   created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
   updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+  -- Chave natural canônica (mesmo cálculo de scripts/natural_key.py)
+  natural_key TEXT GENERATED ALWAYS AS (
+  md5(
+    coalesce(lower(btrim(regexp_replace(model_name, '[ \t\n\r\f\v]+', ' ', 'g'), ' ')), '') || chr(31) ||
+    coalesce(lower(btrim(regexp_replace(brand, '[ \t\n\r\f\v]+', ' ', 'g'), ' ')), '') || chr(31) ||
+    coalesce(launch_year::text, '') || chr(31) ||
+    coalesce(lower(btrim(regexp_replace(series, '[ \t\n\r\f\v]+', ' ', 'g'), ' ')), '')
+  )
+  ) STORED,
   UNIQUE(model_name, brand, launch_year, series)
 );
 
+-- Dedup e upsert (on_conflict=natural_key) por igualdade indexada
+CREATE UNIQUE INDEX IF NOT EXISTS idx_miniatures_master_natural_key
+  ON public.miniatures_master (natural_key);
+
+-- Índices de leitura do catálogo (paginação keyset e filtros do GET /miniatures)
+CREATE INDEX IF NOT EXISTS idx_miniatures_master_created_at_id
+  ON public.miniatures_master (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_miniatures_master_brand_created_at
+  ON public.miniatures_master (brand, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_miniatures_master_series_created_at
+  ON public.miniatures_master (series, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_miniatures_master_launch_year_created_at
+  ON public.miniatures_master (launch_year, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_miniatures_master_collection_number
+  ON public.miniatures_master (collection_number);
+CREATE INDEX IF NOT EXISTS idx_miniatures_master_treasure_hunt
+  ON public.miniatures_master (created_at DESC, id DESC) WHERE is_treasure_hunt = TRUE;
+CREATE INDEX IF NOT EXISTS idx_miniatures_master_super_treasure_hunt
+  ON public.miniatures_master (created_at DESC, id DESC) WHERE is_super_treasure_hunt = TRUE;
+
 -- Habilitar RLS na tabela miniatures_master
 ALTER TABLE public.miniatures_master ENABLE ROW LEVEL SECURITY;
 
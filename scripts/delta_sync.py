@@ -0,0 +1,124 @@
+"""Sincronização por diferença: só grava linhas novas ou que realmente mudaram.
+
+Um snapshot local (SQLite) guarda, para cada chave natural, a impressão digital
+(SHA-256 do JSON canônico) da última versão gravada no banco. A cada execução as
+linhas recém-coletadas são comparadas com o snapshot:
+
+    new       -> chave nunca gravada             (insert)
+    changed   -> chave conhecida, conteúdo mudou (update)
+    unchanged -> idêntica à última gravação      (nenhuma escrita)
+
+O snapshot só é atualizado depois que a escrita deu certo (`record`), então uma
+execução interrompida não marca como gravado o que não foi. Usado por
+scrape_hotwheels_updated.py e import_fast_wheels.py (--delta).
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple
+
+from natural_key import natural_key_hash
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    natural_key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    written_at REAL NOT NULL
+)
+"""
+
+
+class DeltaPlan(NamedTuple):
+    new: List[Dict]
+    changed: List[Dict]
+    unchanged: List[Dict]
+    rewrite_all: bool = False
+
+    @property
+    def to_write(self) -> List[Dict]:
+        if self.rewrite_all:
+            return self.new + self.changed + self.unchanged
+        return self.new + self.changed
+
+
+def fingerprint(row: Dict) -> str:
+    data = json.dumps(row, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class DeltaSnapshot:
+    def __init__(self, path: str, rewrite_all: bool = False):
+        """`rewrite_all` (--full-sync): classifica e registra, mas manda gravar todas as linhas."""
+        self.path = path
+        self.rewrite_all = rewrite_all
+        self.new = 0
+        self.changed = 0
+        self.unchanged = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(SCHEMA)
+        self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def key(self, row: Dict) -> str:
+        # Mesma chave canônica da coluna natural_key: "Camaro " e "camaro" são a mesma linha
+        return natural_key_hash(row)
+
+    def diff(self, rows: Iterable[Dict]) -> DeltaPlan:
+        plan = DeltaPlan([], [], [], self.rewrite_all)
+        # Mesma chave repetida no lote (ex.: cores diferentes do mesmo ano/série) vira
+        # uma linha só, como no upsert: a última sobrescreve os campos das anteriores
+        merged: Dict[str, Dict] = {}
+        for row in rows:
+            k = self.key(row)
+            merged[k] = {**merged[k], **row} if k in merged else dict(row)
+        if not merged:
+            return plan
+        keys = list(merged)
+        rows = list(merged.values())
+        known: Dict[str, str] = {}
+        with self._lock:
+            # SQLite aceita no máximo 999 parâmetros por consulta em versões antigas
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for k, fp in self._db.execute(
+                    f"SELECT natural_key, fingerprint FROM fingerprints WHERE natural_key IN ({placeholders})",
+                    chunk,
+                ):
+                    known[k] = fp
+
+        for k, row in zip(keys, rows):
+            if k not in known:
+                plan.new.append(row)
+            elif known[k] != fingerprint(row):
+                plan.changed.append(row)
+            else:
+                plan.unchanged.append(row)
+        with self._lock:
+            self.new += len(plan.new)
+            self.changed += len(plan.changed)
+            self.unchanged += len(plan.unchanged)
+        return plan
+
+    def record(self, rows: Iterable[Dict]) -> None:
+        """Registra as linhas como gravadas no banco (chamar só depois da escrita)."""
+        now = time.time()
+        values = [(self.key(r), fingerprint(r), now) for r in rows]
+        if not values:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO fingerprints (natural_key, fingerprint, written_at) VALUES (?, ?, ?)",
+                values,
+            )
+            self._db.commit()
+
+    def summary(self) -> str:
+        return f"novas: {self.new} | alteradas: {self.changed} | sem alteração: {self.unchanged}"
@@ -0,0 +1,223 @@
+"""Cache local das chaves naturais já existentes em miniatures_master.
+
+Os scripts de importação faziam um `select('id').eq(...)` por linha candidata.
+Aqui as chaves naturais canônicas (coluna `natural_key`, ver natural_key.py)
+são lidas uma vez em páginas keyset — ou de um snapshot salvo em disco — e depois atualizadas só com
+as linhas criadas desde a última leitura (marca d'água de `created_at`). A
+verificação de existência vira uma consulta em memória, O(1).
+
+Dois formatos:
+- "set" (padrão): conjunto com os 64 bits iniciais de cada natural_key — exato
+  na prática (colisão ~1e-8 com 1 milhão de chaves) e ~10x menor que as strings;
+- "bloom": filtro de Bloom (~1,2 byte por chave com 0,1% de falso positivo).
+  Um "não existe" é definitivo; um "talvez exista" é confirmado no banco.
+
+Linhas apagadas no banco continuam no cache até um `refresh(full=True)`.
+"""
+
+import base64
+import gzip
+import json
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from catalog_db import encode_cursor, keyset_after
+from natural_key import NATURAL_KEY_COLUMN, natural_key_hash
+
+PAGE_SIZE = 1000
+# Releitura antes da marca d'água: cobre transações que gravaram created_at
+# antes de outra já lida (o relógio do INSERT não é a ordem de commit)
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+
+def natural_key(row: Dict[str, Any]) -> str:
+    """natural_key da linha: a lida do banco ou calculada pelas colunas."""
+    return row.get(NATURAL_KEY_COLUMN) or natural_key_hash(row)
+
+
+def key_hash(key: str) -> int:
+    return int(key[:16], 16)
+
+
+def match_natural_key(query, row: Dict[str, Any]):
+    """Filtra `query` pela chave natural de `row` (igualdade no índice único)."""
+    return query.eq(NATURAL_KEY_COLUMN, natural_key(row))
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.001, bits: Optional[bytearray] = None,
+                 num_hashes: Optional[int] = None):
+        capacity = max(capacity, 1000)
+        size = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.bits = bits if bits is not None else bytearray((size + 7) // 8)
+        self.size = len(self.bits) * 8
+        self.num_hashes = num_hashes or max(1, round(self.size / capacity * math.log(2)))
+
+    def _positions(self, h: int):
+        # double hashing (Kirsch–Mitzenmacher) a partir do hash de 64 bits
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, h: int) -> None:
+        for p in self._positions(h):
+            self.bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, h: int) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(h))
+
+
+class ExistingKeyCache:
+    def __init__(
+        self,
+        supabase,
+        *,
+        snapshot_path: Optional[str] = None,
+        kind: str = 'set',
+        capacity: int = 200_000,
+        table: str = 'miniatures_master',
+    ):
+        if kind not in ('set', 'bloom'):
+            raise ValueError(f"kind inválido: {kind}")
+        self.supabase = supabase
+        self.snapshot_path = snapshot_path
+        self.kind = kind
+        self.capacity = capacity
+        self.table = table
+        self.watermark: Optional[str] = None
+        self.count = 0
+        self.lookups = 0
+        self.confirmations = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self.watermark = None
+        self.count = 0
+        self._hashes = set() if self.kind == 'set' else BloomFilter(self.capacity)
+
+    # ---------- carga ----------
+    @classmethod
+    def open(cls, supabase, **kwargs) -> 'ExistingKeyCache':
+        """Carrega o snapshot (se houver) e busca no banco só o que é novo."""
+        cache = cls(supabase, **kwargs)
+        loaded = cache.snapshot_path and cache.load_snapshot()
+        started = time.perf_counter()
+        read = cache.refresh(full=not loaded)
+        print(f"[INFO] Cache de chaves: {cache.count} chaves ({read} lidas do banco em "
+              f"{time.perf_counter() - started:.1f}s{', snapshot ' + cache.snapshot_path if loaded else ''})")
+        return cache
+
+    def refresh(self, full: bool = False) -> int:
+        """Lê as chaves criadas desde a marca d'água (ou todas, com `full`); retorna quantas leu."""
+        if full:
+            self._reset()
+        since = self.watermark
+        if since:
+            try:
+                since = (datetime.fromisoformat(since) - WATERMARK_OVERLAP).isoformat()
+            except ValueError:
+                pass  # formato que o fromisoformat desta versão do Python não lê: sem margem
+
+        columns = f'{NATURAL_KEY_COLUMN},created_at,id'
+        read, cursor, newest = 0, None, self.watermark
+        while True:
+            query = self.supabase.table(self.table).select(columns)
+            if since:
+                query = query.gte('created_at', since)
+            result = keyset_after(query, cursor).limit(PAGE_SIZE).execute()
+            rows = result.data or []
+            for row in rows:
+                self.add(row)
+                if row.get('created_at') and (newest is None or row['created_at'] > newest):
+                    newest = row['created_at']
+            read += len(rows)
+            if len(rows) < PAGE_SIZE:
+                break
+            cursor = encode_cursor(rows[-1])
+        self.watermark = newest
+        return read
+
+    # ---------- consulta ----------
+    def add(self, row: Dict[str, Any]) -> None:
+        h = key_hash(natural_key(row))
+        if self.kind == 'set':
+            if h not in self._hashes:
+                self._hashes.add(h)
+                self.count += 1
+        else:
+            if h not in self._hashes:
+                self.count += 1
+            self._hashes.add(h)
+
+    def might_exist(self, row: Dict[str, Any]) -> bool:
+        self.lookups += 1
+        return key_hash(natural_key(row)) in self._hashes
+
+    def exists(self, row: Dict[str, Any], confirm: Optional[Callable[[Dict[str, Any]], bool]] = None) -> bool:
+        """Existência da chave de `row`. No modo bloom, um positivo é confirmado com `confirm`
+        (padrão: um SELECT pela chave natural)."""
+        if not self.might_exist(row):
+            return False
+        if self.kind == 'set':
+            return True
+        self.confirmations += 1
+        if confirm is None:
+            confirm = self._confirm_in_db
+        return confirm(row)
+
+    def _confirm_in_db(self, row: Dict[str, Any]) -> bool:
+        query = match_natural_key(self.supabase.table(self.table).select('id'), row)
+        return bool(query.limit(1).execute().data)
+
+    # ---------- snapshot ----------
+    def _source(self) -> str:
+        return str(getattr(self.supabase, 'supabase_url', '') or getattr(self.supabase, 'rest_url', ''))
+
+    def load_snapshot(self) -> bool:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with gzip.open(self.snapshot_path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('kind') != self.kind or data.get('source') != self._source():
+            return False  # snapshot de outro banco ou de outro formato: recarrega tudo
+
+        self.watermark = data.get('watermark')
+        self.count = data.get('count', 0)
+        raw = base64.b64decode(data['data'])
+        if self.kind == 'set':
+            self._hashes = {int.from_bytes(raw[i:i + 8], 'big') for i in range(0, len(raw), 8)}
+        else:
+            self._hashes = BloomFilter(self.capacity, bits=bytearray(raw), num_hashes=data['num_hashes'])
+        return True
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.snapshot_path
+        if not path:
+            return
+        if self.kind == 'set':
+            raw = b''.join(h.to_bytes(8, 'big') for h in self._hashes)
+            extra: Dict[str, Any] = {}
+        else:
+            raw = bytes(self._hashes.bits)
+            extra = {'num_hashes': self._hashes.num_hashes}
+        data = {
+            'kind': self.kind,
+            'source': self._source(),
+            'watermark': self.watermark,
+            'count': self.count,
+            'data': base64.b64encode(raw).decode('ascii'),
+            **extra,
+        }
+        tmp = f"{path}.tmp"
+        with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def __contains__(self, row: Dict[str, Any]) -> bool:
+        return self.exists(row)
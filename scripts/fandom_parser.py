@@ -0,0 +1,373 @@
+"""Parsers das páginas do Hot Wheels Wiki (Fandom).
+
+Dois backends com a mesma saída:
+- "html.parser": BeautifulSoup com o parser da biblioteca padrão (comportamento original);
+- "lxml": árvore do libxml2 + XPath, lendo só o título (h1.page-header__title),
+  a imagem (figure.pi-image-thumbnail) e a primeira table.wikitable.
+
+Os dois extraem os mesmos textos e passam pela mesma montagem de linhas
+(`build_versions`), então mapeamento de colunas e detecção de TH/STH são únicos.
+`parse_model_wikitext` faz o mesmo a partir do wikitext obtido pelo api.php.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+BASE_WIKI_URL = "https://hotwheels.fandom.com"
+
+PARSER_BACKENDS = ("html.parser", "lxml")
+DEFAULT_PARSER_BACKEND = "html.parser"
+
+HEADER_TO_COLUMN_MAP = {
+    "Collection Number": "collection_number",
+    "Year": "launch_year",
+    "Series": "series",
+    "Color": "base_color",
+    "Details": "variants",
+    "Base Code": "product_code",
+    # "Country": "country_of_manufacture",  # NÃO EXISTE NO SEU SCHEMA
+    "Collector Number": "collector_number",
+}
+
+# (model_name, image_url, cabeçalhos, textos das células de cada linha)
+ModelPage = Tuple[Optional[str], Optional[str], List[str], List[List[str]]]
+
+
+def build_versions(model_name: Optional[str], image_url: Optional[str],
+                   headers: List[str], rows: List[List[str]]) -> List[Dict]:
+    """Monta uma versão por linha da tabela a partir dos textos já extraídos."""
+    out: List[Dict] = []
+    for cols in rows:
+        current = {
+            "model_name": model_name,
+            "brand": "Hot Wheels",
+            "image_url": image_url,
+            "is_treasure_hunt": False,
+            "is_super_treasure_hunt": False,
+        }
+
+        for i, header in enumerate(headers):
+            key = HEADER_TO_COLUMN_MAP.get(header)
+            if not key or i >= len(cols):
+                continue
+            value = cols[i]
+            if key == "launch_year":
+                try:
+                    current[key] = int(value)
+                except Exception:
+                    current[key] = None
+            else:
+                current[key] = value or None
+
+        # Deduz collector_number de collection_number (x/y)
+        if current.get("collection_number") and not current.get("collector_number"):
+            m = re.search(r"(\d+)\s*/\s*\d+", str(current["collection_number"]))
+            if m:
+                current["collector_number"] = m.group(1)
+
+        # TH / STH
+        series_text = (current.get("series") or "").lower()
+        variants_text = (current.get("variants") or "").lower()
+        if "super treasure hunt" in series_text or "super treasure hunt" in variants_text:
+            current["is_super_treasure_hunt"] = True
+        elif "treasure hunt" in series_text or "treasure hunt" in variants_text:
+            current["is_treasure_hunt"] = True
+
+        out.append(current)
+
+    return out
+
+
+# ============== BACKEND html.parser (BeautifulSoup) ==============
+def _extract_model_bs4(html: str) -> Optional[ModelPage]:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Nome do modelo
+    model_name = None
+    h1 = soup.find("h1", class_="page-header__title")
+    if h1:
+        model_name = h1.text.strip()
+
+    # Imagem principal
+    image_url = None
+    fig = soup.find("figure", class_="pi-image-thumbnail")
+    if fig and fig.find("img"):
+        image_url = fig.find("img").get("src", None)
+
+    table = soup.find("table", class_="wikitable")
+    if not table:
+        return None
+
+    rows = table.find_all("tr")
+    if not rows:
+        return None
+
+    headers = [th.text.strip() for th in rows[0].find_all("th")]
+    cells = [[col.text.strip() for col in row.find_all(["td", "th"])] for row in rows[1:]]
+    return model_name, image_url, headers, cells
+
+
+def _list_links_bs4(html: str) -> List[Optional[str]]:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    table = soup.find("table", class_="wikitable")
+    if not table:
+        return []
+
+    hrefs: List[Optional[str]] = []
+    for row in table.find_all("tr")[1:]:
+        cols = row.find_all(["td", "th"])
+        if len(cols) > 2:
+            a = cols[2].find("a", href=True)
+            hrefs.append(a["href"] if a else None)
+    return hrefs
+
+
+# ============== BACKEND lxml (XPath) ==============
+def _has_class(name: str) -> str:
+    # Equivalente ao class_= do BeautifulSoup: casa qualquer uma das classes do elemento
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+_XPATH_TITLE = f"(//h1[{_has_class('page-header__title')}])[1]"
+_XPATH_FIGURE_IMG = f"(//figure[{_has_class('pi-image-thumbnail')}])[1]//img"
+_XPATH_TABLE = f"(//table[{_has_class('wikitable')}])[1]"
+
+
+def _lxml_root(html: str):
+    import lxml.html
+    from lxml import etree
+
+    if not html or not html.strip():
+        return None
+    parser = lxml.html.HTMLParser(encoding="utf-8")
+    try:
+        return lxml.html.document_fromstring(html.encode("utf-8"), parser=parser)
+    except (etree.ParserError, ValueError):
+        return None
+
+
+def _text(element) -> str:
+    return element.text_content().strip()
+
+
+def _extract_model_lxml(html: str) -> Optional[ModelPage]:
+    root = _lxml_root(html)
+    if root is None:
+        return None
+
+    title = root.xpath(_XPATH_TITLE)
+    model_name = _text(title[0]) if title else None
+
+    imgs = root.xpath(_XPATH_FIGURE_IMG)
+    image_url = imgs[0].get("src") if imgs else None
+
+    tables = root.xpath(_XPATH_TABLE)
+    if not tables:
+        return None
+
+    rows = tables[0].xpath(".//tr")
+    if not rows:
+        return None
+
+    headers = [_text(th) for th in rows[0].xpath(".//th")]
+    cells = [[_text(col) for col in row.xpath(".//td|.//th")] for row in rows[1:]]
+    return model_name, image_url, headers, cells
+
+
+def _list_links_lxml(html: str) -> List[Optional[str]]:
+    root = _lxml_root(html)
+    if root is None:
+        return []
+    tables = root.xpath(_XPATH_TABLE)
+    if not tables:
+        return []
+
+    hrefs: List[Optional[str]] = []
+    for row in tables[0].xpath(".//tr")[1:]:
+        cols = row.xpath(".//td|.//th")
+        if len(cols) > 2:
+            links = cols[2].xpath(".//a[@href]")
+            hrefs.append(links[0].get("href") if links else None)
+    return hrefs
+
+
+# ============== WIKITEXT (api.php) ==============
+# Wikitext vindo do MediaWiki API (mediawiki_api.py): a primeira tabela
+# {| class="wikitable" ... |} é convertida nos mesmos textos que o HTML
+# renderizado mostraria, e as linhas passam por `build_versions`.
+_RE_REF = re.compile(r"<ref(?:\s+name\s*=\s*\"?([^\"/>]+)\"?)?\s*(?:/>|>.*?</ref>)", re.S | re.I)
+_RE_COMMENT = re.compile(r"<!--.*?-->", re.S)
+_RE_TEMPLATE = re.compile(r"\{\{[^{}]*\}\}")
+_RE_FILE_LINK = re.compile(r"\[\[\s*(?:File|Image|Arquivo|Imagem|Category|Categoria)\s*:[^\[\]]*(?:\[\[[^\]]*\]\][^\[\]]*)*\]\]", re.I)
+_RE_LINK = re.compile(r"\[\[([^\[\]|]*)(?:\|([^\[\]]*))?\]\]")
+_RE_EXT_LINK = re.compile(r"\[(?:https?:)?//[^\s\]]+(?:\s+([^\]]*))?\]")
+_RE_TAG = re.compile(r"</?[a-zA-Z][^>]*>")
+_RE_TABLE_START = re.compile(r"^\s*\{\|(.*)$")
+
+
+def wikitext_to_text(value: str, refs: Optional[Dict[str, int]] = None) -> str:
+    """Texto visível de um trecho de wikitext (links, negrito, refs e tags resolvidos)."""
+    import html as html_lib
+
+    refs = refs if refs is not None else {}
+
+    def ref_number(m):
+        name = m.group(1)
+        if name and name in refs:
+            return f"[{refs[name]}]"
+        number = refs.setdefault(name or f"__anon{len(refs)}", len(refs) + 1)
+        return f"[{number}]"
+
+    value = _RE_COMMENT.sub("", value)
+    value = _RE_REF.sub(ref_number, value)
+    # templates aninhados: remove de dentro para fora
+    previous = None
+    while previous != value:
+        previous = value
+        value = _RE_TEMPLATE.sub("", value)
+    value = _RE_FILE_LINK.sub("", value)
+    value = _RE_LINK.sub(lambda m: m.group(2) if m.group(2) is not None else m.group(1), value)
+    value = _RE_EXT_LINK.sub(lambda m: m.group(1) or "", value)
+    value = value.replace("'''", "").replace("''", "")
+    value = _RE_TAG.sub("", value)
+    return html_lib.unescape(value).strip()
+
+
+def _split_cells(line: str, separator: str) -> List[str]:
+    """Divide `a || b` / `a !! b` ignorando separadores dentro de [[...]] e {{...}}."""
+    cells, depth, start, i = [], 0, 0, 0
+    while i < len(line):
+        pair = line[i:i + 2]
+        if pair in ("[[", "{{"):
+            depth += 1
+            i += 2
+            continue
+        if pair in ("]]", "}}"):
+            depth = max(depth - 1, 0)
+            i += 2
+            continue
+        if depth == 0 and pair == separator:
+            cells.append(line[start:i])
+            start = i + 2
+            i += 2
+            continue
+        i += 1
+    cells.append(line[start:])
+    return cells
+
+
+def _cell_content(cell: str) -> str:
+    """Remove atributos (`style="..." | texto`): tudo até o primeiro `|` fora de links/templates."""
+    depth, i = 0, 0
+    while i < len(cell):
+        pair = cell[i:i + 2]
+        if pair in ("[[", "{{"):
+            depth += 1
+            i += 2
+            continue
+        if pair in ("]]", "}}"):
+            depth = max(depth - 1, 0)
+            i += 2
+            continue
+        if depth == 0 and cell[i] == "|":
+            return cell[i + 1:]
+        i += 1
+    return cell
+
+
+def _extract_model_wikitext(wikitext: str) -> Optional[Tuple[List[str], List[List[str]]]]:
+    # cada linha da tabela: lista de (é cabeçalho, wikitext da célula)
+    table_rows: List[List[Tuple[bool, str]]] = []
+    current: List[Tuple[bool, str]] = []
+    before: List[str] = []
+    in_table, depth = False, 0
+
+    for line in (wikitext or "").splitlines():
+        stripped = line.strip()
+        if not in_table:
+            m = _RE_TABLE_START.match(line)
+            if m and "wikitable" in m.group(1):
+                in_table, depth = True, 1
+            else:
+                before.append(line)
+            continue
+        if stripped.startswith("{|"):
+            depth += 1  # tabela aninhada: ignorada
+            continue
+        if stripped.startswith("|}"):
+            depth -= 1
+            if depth == 0:
+                break
+            continue
+        if depth > 1 or stripped.startswith("|+"):
+            continue
+        if stripped.startswith("|-"):
+            if current:
+                table_rows.append(current)
+            current = []
+        elif stripped.startswith("!"):
+            cells = [c for cell in _split_cells(stripped[1:], "!!") for c in _split_cells(cell, "||")]
+            current.extend((True, _cell_content(c)) for c in cells)
+        elif stripped.startswith("|"):
+            current.extend((False, _cell_content(c)) for c in _split_cells(stripped[1:], "||"))
+        elif current:
+            # continuação de uma célula em várias linhas
+            is_header, text = current[-1]
+            current[-1] = (is_header, f"{text}\n{line}")
+    if current:
+        table_rows.append(current)
+    if not in_table or not table_rows:
+        return None
+
+    # as refs [n] são numeradas na página inteira, como no HTML renderizado
+    refs: Dict[str, int] = {}
+    wikitext_to_text("\n".join(before), refs)
+    headers = [wikitext_to_text(text, refs) for is_header, text in table_rows[0] if is_header]
+    rows = [[wikitext_to_text(text, refs) for _, text in row] for row in table_rows[1:]]
+    return headers, rows
+
+
+def parse_model_wikitext(title: str, wikitext: str, image_url: Optional[str] = None) -> List[Dict]:
+    """Versões de uma página de modelo a partir do wikitext (o título é o nome do modelo)."""
+    table = _extract_model_wikitext(wikitext)
+    if table is None:
+        return []
+    headers, rows = table
+    return build_versions(title, image_url, headers, rows)
+
+
+_MODEL_EXTRACTORS = {"html.parser": _extract_model_bs4, "lxml": _extract_model_lxml}
+_LIST_EXTRACTORS = {"html.parser": _list_links_bs4, "lxml": _list_links_lxml}
+
+
+def parse_model_page(html: str, backend: str = DEFAULT_PARSER_BACKEND) -> List[Dict]:
+    """Versões (linhas da wikitable) de uma página de modelo."""
+    page = _MODEL_EXTRACTORS[backend](html)
+    if page is None:
+        return []
+    return build_versions(*page)
+
+
+def title_from_url(url: str) -> str:
+    """'/wiki/%2767_Camaro' -> "'67 Camaro" (título usado pelo api.php)."""
+    path = url.split("/wiki/", 1)[-1].split("#", 1)[0].split("?", 1)[0]
+    return unquote(path).replace("_", " ")
+
+
+def url_for_title(title: str) -> str:
+    """Inverso de `title_from_url`, com o mesmo escape das URLs do MediaWiki."""
+    return f"{BASE_WIKI_URL}/wiki/{quote(title.replace(' ', '_'), safe=';@$!*(),/:')}"
+
+
+def parse_list_page(html: str, backend: str = DEFAULT_PARSER_BACKEND) -> List[str]:
+    """URLs dos modelos listados na terceira coluna da wikitable."""
+    return [
+        f"{BASE_WIKI_URL}{href}"
+        for href in _LIST_EXTRACTORS[backend](html)
+        if href and href.startswith("/wiki/")
+    ]
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Servidor local que imita a Fast Wheels API, para testar import_fast_wheels.py sem rede.
+
+Uso:
+    python fast_wheels_stub_server.py --per-year 300 --error-rate 0.2
+    FAST_WHEELS_API=http://127.0.0.1:8767/car/ python import_fast_wheels.py --years 2010-2020 --dry-run
+
+GET /car/<ano> devolve uma lista JSON de carros sintéticos (determinística por
+ano). Com --error-rate, parte das requisições responde 503 para exercitar as
+retentativas; --delay-ms simula a latência da API original.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+MANUFACTURERS = ["hot wheels", "matchbox", "majorette", "maisto", ""]
+SERIES = ["HW Flames", "Treasure Hunts", "HW Exotics", "Muscle Mania", "Nightburnerz", ""]
+COLORS = ["red", "blue", "black", "white", "yellow", "green"]
+
+
+def cars_for_year(year: int, count: int) -> List[Dict]:
+    rng = random.Random(year)
+    cars = []
+    for n in range(count):
+        cars.append({
+            "name": f" Model {n % (count - count // 10 or 1):04d} ",  # ~10% de nomes repetidos no ano
+            "manufacturer": rng.choice(MANUFACTURERS),
+            "color": rng.choice(COLORS),
+            "year": year,
+            "series": rng.choice(SERIES),
+            "number": f"{n + 1}/{count}",
+            "upc": f"{year}{n:06d}",
+        })
+    return cars
+
+
+def make_handler(per_year: int, error_rate: float, delay: float, verbose: bool, stats: Dict[str, int]):
+    lock = threading.Lock()
+    rng = random.Random(0)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                stats["requests"] += 1
+                fail = rng.random() < error_rate
+            parts = self.path.strip("/").split("/")
+            if len(parts) != 2 or parts[0] != "car" or not parts[1].isdigit():
+                self.send_error(404)
+                return
+            if delay:
+                time.sleep(delay)
+            if fail:
+                with lock:
+                    stats["errors"] += 1
+                self.send_error(503)
+                return
+            body = json.dumps(cars_for_year(int(parts[1]), per_year)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            if verbose:
+                print(f"[stub] {self.path} {args[1] if len(args) > 1 else ''}")
+
+    return Handler
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Fast Wheels API local para testar import_fast_wheels.py")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8767)
+    ap.add_argument("--per-year", type=int, default=200, help="Carros por ano")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="Fração de respostas 503")
+    ap.add_argument("--delay-ms", type=int, default=0, help="Latência artificial por requisição")
+    ap.add_argument("--verbose", action="store_true", help="Mostra cada requisição")
+    args = ap.parse_args()
+
+    stats = {"requests": 0, "errors": 0}
+    handler = make_handler(args.per_year, args.error_rate, args.delay_ms / 1000.0, args.verbose, stats)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"[INFO] Fast Wheels API local em http://{args.host}:{args.port}/car/<ano>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"[INFO] Requisições atendidas: {stats['requests']} (503: {stats['errors']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Group commit para escritas concorrentes da api_server.
+
+Requisições que chegam quase juntas (ex.: vários `POST /miniatures` do app)
+entram numa janela de `max_delay_ms`; ao fim da janela, ou ao juntar
+`max_batch` itens, o grupo inteiro é gravado com uma única chamada de
+`commit(items)` e cada requisição recebe o seu resultado; um resultado que é
+uma exceção é levantado só para aquela requisição. Sem nenhum commit em
+andamento o item é gravado na hora: com tráfego baixo não há espera.
+
+É a versão assíncrona do write_buffer.UpsertBuffer dos scripts, com uma
+diferença: quem envia espera pelo resultado do próprio item. Como no buffer,
+se o `commit` do grupo levantar exceção os itens são regravados um a um, e só
+as requisições cujo item falha sozinho recebem a exceção.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+
+class GroupCommitter:
+    def __init__(
+        self,
+        commit: Callable[[List[Any]], Awaitable[List[Any]]],
+        *,
+        max_batch: int = 100,
+        max_delay_ms: float = 2.0,
+        on_commit: Optional[Callable[[int], None]] = None,
+    ):
+        self.commit = commit
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000.0
+        self.on_commit = on_commit
+        self.groups = 0
+        self.items = 0
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._commits: Set[asyncio.Task] = set()
+
+    async def submit(self, item: Any) -> Any:
+        """Entra no próximo grupo e espera o resultado deste item."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch or not self._commits:
+            # Sem commit em andamento não há com quem agrupar: grava já, sem esperar a janela
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        group, self._pending = self._pending, []
+        task = asyncio.create_task(self._commit_group(group))
+        self._commits.add(task)
+        task.add_done_callback(self._commits.discard)
+
+    async def _commit_group(self, group: List[Tuple[Any, asyncio.Future]]) -> None:
+        self.groups += 1
+        self.items += len(group)
+        if self.on_commit is not None:
+            self.on_commit(len(group))
+        try:
+            results = await self.commit([item for item, _ in group])
+        except Exception as e:
+            if len(group) == 1:
+                self._resolve(group[0][1], error=e)
+                return
+            # Um item ruim não pode derrubar as requisições dos outros: um commit por item
+            for item, future in group:
+                try:
+                    result = (await self.commit([item]))[0]
+                except Exception as item_error:
+                    self._resolve(future, error=item_error)
+                else:
+                    self._resolve(future, result)
+            return
+        for (_, future), result in zip(group, results):
+            self._resolve(future, result)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any = None, error: Optional[Exception] = None) -> None:
+        # Requisição cancelada (cliente desconectou) já tem o future resolvido
+        if future.done():
+            return
+        if error is None and isinstance(result, Exception):
+            error = result
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    async def close(self) -> None:
+        """Grava o grupo em aberto e espera os commits em andamento."""
+        self._flush()
+        if self._commits:
+            await asyncio.gather(*self._commits, return_exceptions=True)
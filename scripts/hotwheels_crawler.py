@@ -0,0 +1,196 @@
+"""Crawler assíncrono para as páginas do Fandom.
+
+Baixa várias páginas ao mesmo tempo sobre um único cliente httpx (HTTP/2 e
+keep-alive), com um token bucket por host: a vazão fica limitada pelo orçamento
+de requisições por segundo configurado, e não pela latência serial mais um
+`sleep` fixo.
+"""
+
+import asyncio
+import sys
+import time
+from typing import AsyncIterator, Callable, Dict, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+# Fallback síncrono usado em 403 (ex.: fetch_with_cloudscraper): url -> (html, erro)
+Fallback = Callable[[str], Tuple[Optional[str], Optional[str]]]
+
+
+def http2_available() -> bool:
+    """HTTP/2 no httpx depende do pacote opcional `h2` (httpx[http2])."""
+    try:
+        import h2  # type: ignore  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class TokenBucket:
+    """Token bucket assíncrono: `rate` requisições/s com rajadas de até `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        # O lock mantém a ordem de chegada: quem espera primeiro recebe o próximo token
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HostRateLimiter:
+    """Um token bucket por host."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    async def acquire(self, url: str) -> None:
+        host = urlsplit(url).netloc
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+        await bucket.acquire()
+
+
+class AsyncCrawler:
+    """Busca páginas concorrentemente, com a mesma política de retry do `fetch_html`.
+
+    Até `retries` tentativas via httpx; um 403 vai direto para o fallback
+    (cloudscraper), que roda em thread para não bloquear o event loop.
+    """
+
+    def __init__(
+        self,
+        headers: Dict[str, str],
+        *,
+        concurrency: int = 4,
+        rate: float = 2.0,
+        burst: float = 2.0,
+        retries: int = 2,
+        backoff: float = 1.5,
+        timeout: float = 30.0,
+        fallback: Optional[Fallback] = None,
+        store=None,
+    ):
+        self.headers = headers
+        self.concurrency = concurrency
+        self.limiter = HostRateLimiter(rate, burst)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.fallback = fallback
+        # page_store.PageStore opcional: GET condicional e gravação das páginas
+        self.store = store
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def __aenter__(self) -> 'AsyncCrawler':
+        self._client = httpx.AsyncClient(
+            headers=self.headers,
+            http2=http2_available(),
+            follow_redirects=True,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+            ),
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def fetch(self, url: str) -> Tuple[Optional[str], bool]:
+        """Retorna (html, mudou); com `store`, um 304 devolve a cópia guardada.
+
+        Com `store`, mudou=False só se as linhas do conteúdo já foram gravadas
+        no banco (PageStore.is_written).
+        """
+        store = self.store
+        conditional = store.conditional_headers(url) if store else {}
+        last_err = None
+        async with self._semaphore:
+            for i in range(self.retries):
+                await self.limiter.acquire(url)
+                try:
+                    resp = await self._client.get(url, headers=conditional)
+                    if resp.status_code == 304 and store:
+                        store.mark_fresh(url)
+                        return store.read(url), not store.is_written(url)
+                    if resp.status_code == 200 and resp.text:
+                        changed = True
+                        if store:
+                            changed = store.write(
+                                url,
+                                resp.text,
+                                etag=resp.headers.get("ETag"),
+                                last_modified=resp.headers.get("Last-Modified"),
+                            )
+                        return resp.text, changed
+                    if resp.status_code == 403:
+                        last_err = f"403 (tentativa {i+1})"
+                        break  # 403 -> vai para fallback imediatamente
+                    last_err = f"HTTP {resp.status_code}"
+                except httpx.HTTPError as e:
+                    last_err = str(e) or type(e).__name__
+                await asyncio.sleep(self.backoff)
+
+            if self.fallback is not None:
+                await self.limiter.acquire(url)
+                html, err = await asyncio.to_thread(self.fallback, url)
+                if html:
+                    changed = store.write(url, html) if store else True
+                    return html, changed
+                last_err = err
+
+        print(f"\n[ERRO] Falha ao acessar {url}: {last_err}\n", file=sys.stderr)
+        return None, False
+
+    async def crawl(self, urls: Iterable[str]) -> AsyncIterator[Tuple[str, Optional[str], bool]]:
+        """Gera (url, html, mudou) na ordem em que os downloads terminam.
+
+        No máximo `concurrency` downloads ficam pendentes: se quem consome parar
+        de puxar resultados, novos downloads não começam (backpressure).
+        """
+
+        async def fetch_one(url: str) -> Tuple[str, Optional[str], bool]:
+            html, changed = await self.fetch(url)
+            return url, html, changed
+
+        remaining = iter(urls)
+        pending = set()
+
+        def fill():
+            while len(pending) < self.concurrency:
+                url = next(remaining, None)
+                if url is None:
+                    return
+                pending.add(asyncio.create_task(fetch_one(url)))
+
+        fill()
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.discard(task)
+                    yield task.result()
+                fill()
+        finally:
+            for task in pending:
+                task.cancel()
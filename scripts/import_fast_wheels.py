@@ -4,6 +4,14 @@ from supabase import create_client, Client
 import os
 from dotenv import load_dotenv
 import sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from existing_keys import ExistingKeyCache, match_natural_key
+from natural_key import NATURAL_KEY_COLUMN, natural_key_hash
+from write_buffer import UpsertBuffer
 
 # Carregar variáveis de ambiente do arquivo .env
 load_dotenv()
@@ -12,115 +20,293 @@ load_dotenv()
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY')
 
-# Verificar se as variáveis de ambiente estão definidas
-if not SUPABASE_URL or not SUPABASE_KEY:
-    print("Erro: Variáveis de ambiente do Supabase não encontradas")
-    exit(1)
+# API base (exemplo: https://fastwheelsapi.joedots1.repl.co/car/2018)
+# Para testes: python fast_wheels_stub_server.py e FAST_WHEELS_API=http://127.0.0.1:8767/car/
+API_BASE = os.getenv('FAST_WHEELS_API', "https://fastwheelsapi.joedots1.repl.co/car/")
 
-# Criar cliente Supabase
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Período de interesse (pode mudar com --years)
+DEFAULT_YEARS = "2010-2020"
+BACKUP_FILE = "fast_wheels_lookup.ndjson"
 
-# API base (exemplo: https://fastwheelsapi.joedots1.repl.co/car/2018)
-API_BASE = "https://fastwheelsapi.joedots1.repl.co/car/"
 
-# Período de interesse (pode mudar)
-anos = list(range(2010, 2021))
+def parse_years(value):
+    """'2010-2020', '2012,2015' ou '2018' -> lista de anos."""
+    anos = []
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            if '-' in part:
+                start, end = (int(p) for p in part.split('-', 1))
+                anos.extend(range(start, end + 1) if start <= end else range(start, end - 1, -1))
+            else:
+                anos.append(int(part))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"período inválido: {value!r} (use 2010-2020 ou 2012,2015)")
+    if not anos:
+        raise argparse.ArgumentTypeError("nenhum ano informado")
+    return list(dict.fromkeys(anos))
+
 
-# Lista para os resultados
-miniaturas = []
+def create_session(workers, retries=3):
+    """Session compartilhada pelas threads, com retentativas e pool do tamanho do paralelismo."""
+    session = requests.Session()
+    retry = Retry(
+        total=retries,
+        backoff_factor=1.0,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=workers, pool_maxsize=workers)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
 
-for ano in anos:
-    print(f"Baixando ano {ano}...")
-    url = f"{API_BASE}{ano}"
-    resp = requests.get(url)
+
+def fetch_year(session, api_base, ano, timeout=30):
+    url = f"{api_base}{ano}"
+    resp = session.get(url, timeout=timeout)
     if resp.status_code != 200:
-        print(f"Erro ao buscar {url}")
-        continue
-    carros = resp.json()
-    for car in carros:
-        mini = {
-            "model_name": car.get("name", "").strip().upper(),
-            "brand": car.get("manufacturer", "").strip().title(),
-            "base_color": car.get("color", "").strip().title(),
-            "year": car.get("year", ano),
-            "series": car.get("series", "").strip().title(),
-            "collection_number": car.get("number", "").strip(),
-            "upc": car.get("upc", "").strip()
-        }
-        # Remove modelos incompletos
-        if mini["model_name"]:
-            miniaturas.append(mini)
-
-# Remove duplicados (por model_name, brand e year)
-seen = set()
-unique_miniaturas = []
-for m in miniaturas:
-    key = (m["model_name"], m["brand"], m["year"])
-    if key not in seen:
-        seen.add(key)
-        unique_miniaturas.append(m)
-
-# Verificar se deve executar em modo de teste
-dry_run = '--dry-run' in sys.argv
-
-# Contador de inserções bem-sucedidas
-successful_inserts = 0
-
-# Inserir no Supabase
-print(f"\n=== INSERINDO {len(unique_miniaturas)} MINIATURAS NO SUPABASE ===\n")
-for miniatura in unique_miniaturas:
-    try:
-        # Mapear campos para o formato do Supabase
-        insert_data = {
-            "model_name": miniatura["model_name"],
-            "brand": miniatura["brand"] or "Fast Wheels",
-            "launch_year": miniatura["year"],
-            "series": miniatura["series"],
-            "collection_number": miniatura["collection_number"],
-            "base_color": miniatura["base_color"]
-        }
-        
-        # Remover campos None ou vazios
-        insert_data = {k: v for k, v in insert_data.items() if v}
-        
-        # Verificar se a miniatura já existe
-        model_name = insert_data['model_name']
-        launch_year = insert_data.get('launch_year')
-        series = insert_data.get('series', '')
-        
-        query = supabase.table('miniatures_master').select('id').eq('model_name', model_name)
-        if launch_year:
-            query = query.eq('launch_year', launch_year)
-        if series:
-            query = query.eq('series', series)
-            
-        existing = query.execute()
-        
-        if existing.data:
-            print(f"Miniatura '{model_name}' já existe no banco de dados")
-            continue
-        
-        # Inserir nova miniatura
-        if dry_run:
-            print(f"[MODO TESTE] Simulando inserção de '{model_name}'")
-            successful_inserts += 1
+        print(f"Erro ao buscar {url} (HTTP {resp.status_code})")
+        return []
+    return resp.json() or []
+
+
+def fetch_years(session, api_base, anos, workers):
+    """Gera (ano, carros) na ordem em que as respostas chegam."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(fetch_year, session, api_base, ano): ano for ano in anos}
+        for future in as_completed(futures):
+            ano = futures[future]
+            try:
+                carros = future.result()
+            except (requests.RequestException, ValueError) as e:
+                print(f"Erro ao buscar ano {ano}: {e}")
+                continue
+            print(f"Baixado ano {ano}: {len(carros)} modelos")
+            yield ano, carros
+
+
+def normalize_car(car, ano):
+    return {
+        "model_name": (car.get("name") or "").strip().upper(),
+        "brand": (car.get("manufacturer") or "").strip().title(),
+        "base_color": (car.get("color") or "").strip().title(),
+        "year": car.get("year", ano),
+        "series": (car.get("series") or "").strip().title(),
+        "collection_number": str(car.get("number") or "").strip(),
+        "upc": str(car.get("upc") or "").strip()
+    }
+
+
+def to_insert_data(miniatura):
+    # Mapear campos para o formato do Supabase
+    insert_data = {
+        "model_name": miniatura["model_name"],
+        "brand": miniatura["brand"] or "Fast Wheels",
+        "launch_year": miniatura["year"],
+        "series": miniatura["series"],
+        "collection_number": miniatura["collection_number"],
+        "base_color": miniatura["base_color"]
+    }
+    # Remover campos None ou vazios
+    return {k: v for k, v in insert_data.items() if v}
+
+
+def stream_miniatures(years_data, backup):
+    """Normaliza, remove duplicadas (por model_name, brand e year) e grava o backup NDJSON."""
+    seen = set()
+    for ano, carros in years_data:
+        for car in carros:
+            mini = normalize_car(car, ano)
+            # Remove modelos incompletos
+            if not mini["model_name"]:
+                continue
+            key = (mini["model_name"], mini["brand"], mini["year"])
+            if key in seen:
+                continue
+            seen.add(key)
+            if backup:
+                backup.write(json.dumps(mini, ensure_ascii=False) + "\n")
+            yield mini
+        if backup:
+            backup.flush()
+
+
+class FastWheelsLoader:
+    """Carrega as miniaturas em blocos: novas com upsert em lote, alteradas com update."""
+
+    def __init__(self, supabase, key_cache, delta=None, dry_run=False, batch_size=500):
+        self.supabase = supabase
+        self.key_cache = key_cache
+        self.delta = delta
+        self.dry_run = dry_run
+        self.batch_size = batch_size
+        self.processed = 0
+        self.simulated = 0
+        self.updates = 0
+        self.existing = 0
+        self._pending = []
+        self.buffer = None
+        if not dry_run:
+            self.buffer = UpsertBuffer(
+                self._write_batch,
+                self._write_one,
+                natural_key_hash,
+                max_rows=batch_size,
+                max_delay_ms=0,
+                on_written=self._written,
+            )
+
+    @property
+    def inserts(self):
+        return self.simulated if self.dry_run else self.buffer.ok
+
+    def _write_batch(self, rows):
+        self.supabase.table('miniatures_master').upsert(
+            rows, on_conflict=NATURAL_KEY_COLUMN, ignore_duplicates=True
+        ).execute()
+        print(f"✅ Lote de {len(rows)} miniaturas gravado")
+
+    def _write_one(self, row):
+        try:
+            self.supabase.table('miniatures_master').upsert(
+                row, on_conflict=NATURAL_KEY_COLUMN, ignore_duplicates=True
+            ).execute()
+            return True
+        except Exception as e:
+            print(f"❌ Erro ao inserir miniatura '{row.get('model_name')}': {e}")
+            return False
+
+    def _written(self, rows):
+        for row in rows:
+            self.key_cache.add(row)
+        if self.delta:
+            self.delta.record(rows)
+
+    def add(self, miniatura):
+        self.processed += 1
+        self._pending.append(to_insert_data(miniatura))
+        if len(self._pending) >= self.batch_size:
+            self._load(self._pending)
+            self._pending = []
+
+    def _load(self, rows):
+        if self.delta:
+            plan = self.delta.diff(rows)
+            rows = plan.to_write
+            # Atualiza as existentes que mudaram, as que o snapshot ainda não conhece
+            # (primeiro --delta) e, no --full-sync, todas: exatamente as de to_write
+            to_update = {natural_key_hash(r) for r in rows}
         else:
-            print(f"Inserindo '{model_name}' no banco de dados...")
-            result = supabase.table('miniatures_master').insert(insert_data).execute()
-            
-            if result.data:
-                print(f"✅ Miniatura '{model_name}' inserida com sucesso")
-                successful_inserts += 1
-            else:
-                print(f"❌ Erro ao inserir miniatura '{model_name}': Sem dados retornados")
-    except Exception as e:
-        print(f"❌ Erro ao processar miniatura '{miniatura.get('model_name')}': {e}")
-
-# Salvar também em JSON como backup
-with open("fast_wheels_lookup.json", "w", encoding="utf-8") as f:
-    json.dump(unique_miniaturas, f, ensure_ascii=False, indent=2)
-
-print(f"\n=== RESUMO DA OPERAÇÃO ===")
-print(f"Total de miniaturas processadas: {len(unique_miniaturas)}")
-print(f"Total de miniaturas {('simuladas' if dry_run else 'inseridas')}: {successful_inserts}/{len(unique_miniaturas)}")
-print(f"Backup salvo em: fast_wheels_lookup.json")
+            to_update = set()
+
+        new_rows = []
+        for insert_data in rows:
+            model_name = insert_data['model_name']
+            # Verificar se a miniatura já existe (em memória, sem ida ao banco)
+            if not self.key_cache.exists(insert_data):
+                new_rows.append(insert_data)
+                continue
+            self.existing += 1
+            if natural_key_hash(insert_data) in to_update and not self.dry_run:
+                try:
+                    match_natural_key(
+                        self.supabase.table('miniatures_master').update(insert_data), insert_data
+                    ).execute()
+                except Exception as e:
+                    print(f"❌ Erro ao atualizar miniatura '{model_name}': {e}")
+                    continue
+                print(f"🔄 Miniatura '{model_name}' atualizada")
+                self.updates += 1
+            if self.delta and not self.dry_run:
+                self.delta.record([insert_data])
+
+        if self.dry_run:
+            for insert_data in new_rows:
+                print(f"[MODO TESTE] Simulando inserção de '{insert_data['model_name']}'")
+            self.simulated += len(new_rows)
+        elif new_rows:
+            self.buffer.add_many(new_rows)
+
+    def close(self):
+        if self._pending:
+            self._load(self._pending)
+            self._pending = []
+        if self.buffer:
+            self.buffer.close()
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Importa o catálogo da Fast Wheels API para miniatures_master")
+    ap.add_argument("--years", type=parse_years, default=parse_years(DEFAULT_YEARS),
+                    help=f"Anos a importar: 2010-2020, 2012,2015 ou 2018 (padrão: {DEFAULT_YEARS})")
+    ap.add_argument("--api-base", default=API_BASE, help="URL base da API (ano é concatenado ao final)")
+    ap.add_argument("--workers", type=int, default=4, help="Anos baixados em paralelo")
+    ap.add_argument("--batch-size", type=int, default=500, help="Linhas por upsert em lote")
+    ap.add_argument("--backup", default=BACKUP_FILE, help="Backup NDJSON (uma miniatura por linha)")
+    ap.add_argument("--dry-run", action="store_true", help="Não grava no banco")
+    ap.add_argument("--delta", nargs="?", const="fast_wheels_delta.sqlite3", default=None,
+                    help="Sincronização por diferença: pula linhas idênticas à última gravação")
+    ap.add_argument("--full-sync", action="store_true", help="Com --delta, regrava todas as linhas")
+    ap.add_argument("--bloom", action="store_true", help="Cache de chaves em filtro de Bloom")
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Verificar se as variáveis de ambiente estão definidas
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        print("Erro: Variáveis de ambiente do Supabase não encontradas")
+        sys.exit(1)
+
+    # Criar cliente Supabase
+    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+    # Sincronização por diferença (--delta [arquivo]): pula linhas idênticas à última gravação
+    delta = None
+    if args.delta:
+        from delta_sync import DeltaSnapshot
+        delta = DeltaSnapshot(args.delta, rewrite_all=args.full_sync)
+
+    # Chaves já existentes carregadas uma vez (em vez de um SELECT por miniatura)
+    key_cache = ExistingKeyCache.open(
+        supabase,
+        snapshot_path=os.getenv('EXISTING_KEYS_SNAPSHOT', '.existing_keys.json.gz'),
+        kind='bloom' if args.bloom else 'set',
+    )
+
+    anos = args.years
+    workers = max(1, min(args.workers, len(anos)))
+    session = create_session(workers)
+    loader = FastWheelsLoader(supabase, key_cache, delta, dry_run=args.dry_run, batch_size=args.batch_size)
+
+    print(f"\n=== IMPORTANDO {len(anos)} ANOS ({anos[0]}..{anos[-1]}) NO SUPABASE ===\n")
+    try:
+        with open(args.backup, "w", encoding="utf-8") as backup:
+            years_data = fetch_years(session, args.api_base, anos, workers)
+            for miniatura in stream_miniatures(years_data, backup):
+                loader.add(miniatura)
+    finally:
+        loader.close()
+
+    if not args.dry_run:
+        key_cache.save()
+
+    processed = loader.processed
+    print(f"\n=== RESUMO DA OPERAÇÃO ===")
+    print(f"Total de miniaturas processadas: {processed}")
+    print(f"Total de miniaturas {('simuladas' if args.dry_run else 'inseridas')}: {loader.inserts}/{processed}")
+    if loader.buffer:
+        print(f"Upserts em lote: {loader.buffer.batches} | linhas com falha: {loader.buffer.failed}")
+    if delta:
+        print(f"Total de miniaturas atualizadas: {loader.updates}")
+        print(f"Delta ({delta.path}): {delta.summary()}")
+    print(f"Backup salvo em: {args.backup}")
+
+
+if __name__ == "__main__":
+    main()
@@ -81,6 +81,14 @@ sample_data = [
 # Verificar se deve executar em modo de teste
 dry_run = '--dry-run' in sys.argv
 
+# Chaves já existentes carregadas uma vez (em vez de um SELECT por miniatura)
+from existing_keys import ExistingKeyCache
+key_cache = ExistingKeyCache.open(
+    supabase,
+    snapshot_path=os.getenv('EXISTING_KEYS_SNAPSHOT', '.existing_keys.json.gz'),
+    kind='bloom' if '--bloom' in sys.argv else 'set',
+)
+
 # Contador de inserções bem-sucedidas
 successful_inserts = 0
 
@@ -101,20 +109,10 @@ for miniatura in sample_data:
         # Remover campos None ou vazios
         insert_data = {k: v for k, v in insert_data.items() if v}
         
-        # Verificar se a miniatura já existe
+        # Verificar se a miniatura já existe (em memória, sem ida ao banco)
         model_name = insert_data['model_name']
-        launch_year = insert_data.get('launch_year')
-        series = insert_data.get('series', '')
-        
-        query = supabase.table('miniatures_master').select('id').eq('model_name', model_name)
-        if launch_year:
-            query = query.eq('launch_year', launch_year)
-        if series:
-            query = query.eq('series', series)
-            
-        existing = query.execute()
         
-        if existing.data:
+        if key_cache.exists(insert_data):
             print(f"Miniatura '{model_name}' já existe no banco de dados")
             continue
         
@@ -129,6 +127,7 @@ for miniatura in sample_data:
             if result.data:
                 print(f"✅ Miniatura '{model_name}' inserida com sucesso")
                 successful_inserts += 1
+                key_cache.add(insert_data)
             else:
                 print(f"❌ Erro ao inserir miniatura '{model_name}': Sem dados retornados")
                 if hasattr(result, 'error'):
@@ -136,6 +135,9 @@ for miniatura in sample_data:
     except Exception as e:
         print(f"❌ Erro ao processar miniatura '{miniatura.get('model_name')}': {e}")
 
+if not dry_run:
+    key_cache.save()
+
 print(f"\n=== RESUMO DA OPERAÇÃO ===")
 print(f"Total de miniaturas processadas: {len(sample_data)}")
 print(f"Total de miniaturas {('simuladas' if dry_run else 'inseridas')}: {successful_inserts}/{len(sample_data)}")
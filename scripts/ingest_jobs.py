@@ -0,0 +1,379 @@
+"""Jobs de importação em lote da api_server, persistidos em SQLite.
+
+`POST /jobs/miniatures` grava os itens aqui e responde na hora com o id do
+job; um pool de workers (JobRunner) processa os itens em blocos e registra o
+resultado de cada um. Estados do job:
+
+    queued  -> aguardando um worker
+    running -> em processamento por um worker (`owner`), com lease renovado
+    done    -> todos os itens têm resultado (cada item pode ter falhado)
+    failed  -> erro inesperado fora dos itens (ver `error`)
+
+Vários processos (ex.: `uvicorn --workers 4`) podem compartilhar o mesmo
+arquivo, na mesma máquina: o job é reivindicado numa transação `BEGIN
+IMMEDIATE`, e cada processo renova o lease (`lease_until`) dos seus jobs
+enquanto vive. No desligamento normal os jobs voltam para a fila na hora; se o
+processo morrer, voltam quando o lease vencer. Um worker que perdeu o lease
+para de gravar resultados do job.
+
+Os resultados são gravados bloco a bloco: o job continua do primeiro item sem
+resultado. Antes de gravar um bloco seus itens são marcados (`attempted`); se o
+bloco é interrompido no meio e refeito, o processamento recebe essas posições
+e conta como inseridos os itens que ele mesmo já tinha gravado.
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'queued',
+    total INTEGER NOT NULL,
+    processed INTEGER NOT NULL DEFAULT 0,
+    successful INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    updated_at REAL NOT NULL,
+    owner TEXT,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    result TEXT,
+    success INTEGER,
+    attempted INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (job_id, position)
+);
+"""
+
+STATUSES = ('queued', 'running', 'done', 'failed')
+
+# Colunas acrescentadas depois da primeira versão do arquivo (migração no JobStore)
+ADDED_COLUMNS = {
+    'jobs': {'owner': 'TEXT', 'lease_until': 'REAL'},
+    'job_items': {'attempted': 'INTEGER NOT NULL DEFAULT 0'},
+}
+
+# (posição, chave natural, dados) — o mesmo formato dos blocos de /miniatures/batch
+Item = Tuple[int, str, Dict[str, Any]]
+
+
+class JobStore:
+    def __init__(self, path: str, lease_seconds: float = 60.0):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        # Identifica este processo como dono dos jobs que ele reivindica
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        # usado pelo event loop (via asyncio.to_thread) e pelas threads do pool
+        self._lock = threading.Lock()
+        # timeout: espera o lock de escrita de outro processo em vez de falhar
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(SCHEMA)
+        for table, added in ADDED_COLUMNS.items():
+            columns = {row['name'] for row in self._db.execute(f'PRAGMA table_info({table})')}
+            for column, kind in added.items():
+                if column not in columns:
+                    self._db.execute(f'ALTER TABLE {table} ADD COLUMN {column} {kind}')
+        self._db.commit()
+
+    @contextlib.contextmanager
+    def _write(self):
+        """Transação de escrita com o lock do arquivo já tomado (atômica entre processos)."""
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._db
+            except BaseException:
+                self._db.rollback()
+                raise
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def create(self, items: List[Item], results: Optional[Dict[int, Dict[str, Any]]] = None) -> str:
+        """Registra um job; `results` traz itens já resolvidos no envio (ex.: duplicados no lote)."""
+        results = results or {}
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        failed = sum(1 for r in results.values() if not r['success'])
+        with self._lock:
+            self._db.execute(
+                'INSERT INTO jobs (id, total, processed, successful, failed, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, len(items) + len(results), len(results), len(results) - failed, failed, now, now),
+            )
+            self._db.executemany(
+                'INSERT INTO job_items (job_id, position, key, payload) VALUES (?, ?, ?, ?)',
+                [(job_id, position, key, json.dumps(data, ensure_ascii=False)) for position, key, data in items],
+            )
+            self._db.executemany(
+                'INSERT INTO job_items (job_id, position, key, payload, result, success) VALUES (?, ?, ?, ?, ?, ?)',
+                [(job_id, position, '', '{}', json.dumps(r, ensure_ascii=False), int(r['success']))
+                 for position, r in results.items()],
+            )
+            self._db.commit()
+        return job_id
+
+    def release(self) -> int:
+        """No desligamento: os jobs deste processo voltam para a fila sem esperar o lease."""
+        with self._write() as db:
+            cur = db.execute(
+                "UPDATE jobs SET status = 'queued', owner = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE status = 'running' AND owner = ?",
+                (time.time(), self.owner),
+            )
+        return cur.rowcount
+
+    def renew_leases(self) -> int:
+        """Estende o lease dos jobs em andamento deste processo."""
+        now = time.time()
+        with self._write() as db:
+            cur = db.execute(
+                "UPDATE jobs SET lease_until = ? WHERE status = 'running' AND owner = ?",
+                (now + self.lease_seconds, self.owner),
+            )
+        return cur.rowcount
+
+    def purge(self, older_than_seconds: float) -> int:
+        """Apaga jobs concluídos há mais de `older_than_seconds`."""
+        cutoff = time.time() - older_than_seconds
+        with self._lock:
+            ids = [row['id'] for row in self._db.execute(
+                "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (cutoff,)
+            )]
+            self._db.executemany('DELETE FROM job_items WHERE job_id = ?', [(i,) for i in ids])
+            self._db.executemany('DELETE FROM jobs WHERE id = ?', [(i,) for i in ids])
+            self._db.commit()
+        return len(ids)
+
+    def claim_next(self) -> Optional[str]:
+        """Reivindica o job mais antigo da fila, ou um running com lease vencido (dono morreu).
+
+        A busca e a marcação são uma transação só: dois processos nunca pegam o mesmo job.
+        """
+        now = time.time()
+        with self._write() as db:
+            row = db.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' "
+                "OR (status = 'running' AND (lease_until IS NULL OR lease_until < ?)) "
+                'ORDER BY created_at LIMIT 1',
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'running', owner = ?, lease_until = ?, "
+                'started_at = COALESCE(started_at, ?), updated_at = ? WHERE id = ?',
+                (self.owner, now + self.lease_seconds, now, now, row['id']),
+            )
+        return row['id']
+
+    def pending_items(self, job_id: str, limit: int, after: int = -1) -> List[Item]:
+        """Próximos itens sem resultado depois da posição `after` (intervalo na chave primária)."""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT position, key, payload FROM job_items WHERE job_id = ? AND position > ? '
+                'AND result IS NULL ORDER BY position LIMIT ?',
+                (job_id, after, limit),
+            ).fetchall()
+        return [(row['position'], row['key'], json.loads(row['payload'])) for row in rows]
+
+    def attempted_positions(self, job_id: str, items: List[Item]) -> Set[int]:
+        """Posições de `items` que já foram a um bloco interrompido antes do resultado."""
+        if not items:
+            return set()
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT position FROM job_items WHERE job_id = ? AND position BETWEEN ? AND ? '
+                'AND attempted = 1 AND result IS NULL',
+                (job_id, items[0][0], items[-1][0]),
+            ).fetchall()
+        positions = {position for position, _, _ in items}
+        return {row['position'] for row in rows if row['position'] in positions}
+
+    def mark_attempted(self, job_id: str, items: List[Item]) -> bool:
+        """Marca os itens do bloco antes de gravá-los; False se o job não é mais deste processo."""
+        with self._write() as db:
+            if not self._owns(db, job_id):
+                return False
+            db.executemany(
+                'UPDATE job_items SET attempted = 1 WHERE job_id = ? AND position = ?',
+                [(job_id, position) for position, _, _ in items],
+            )
+        return True
+
+    def _owns(self, db: sqlite3.Connection, job_id: str) -> bool:
+        row = db.execute('SELECT status, owner FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return row is not None and row['status'] == 'running' and row['owner'] == self.owner
+
+    def record_results(self, job_id: str, results: Dict[int, Dict[str, Any]]) -> bool:
+        """Grava o resultado de um bloco e atualiza o progresso do job (uma transação).
+
+        Retorna False, sem gravar nada, se o job não é mais deste processo.
+        Itens que já tinham resultado não são contados de novo.
+        """
+        now = time.time()
+        with self._write() as db:
+            if not self._owns(db, job_id):
+                return False
+            counts = {}
+            for success in (True, False):
+                cur = db.executemany(
+                    'UPDATE job_items SET result = ?, success = ? '
+                    'WHERE job_id = ? AND position = ? AND result IS NULL',
+                    [(json.dumps(r, ensure_ascii=False), int(success), job_id, position)
+                     for position, r in results.items() if bool(r['success']) == success],
+                )
+                counts[success] = max(cur.rowcount, 0)
+            db.execute(
+                'UPDATE jobs SET processed = processed + ?, successful = successful + ?, '
+                'failed = failed + ?, lease_until = ?, updated_at = ? WHERE id = ?',
+                (counts[True] + counts[False], counts[True], counts[False],
+                 now + self.lease_seconds, now, job_id),
+            )
+        return True
+
+    def finish(self, job_id: str, error: Optional[str] = None) -> bool:
+        now = time.time()
+        with self._write() as db:
+            if not self._owns(db, job_id):
+                return False
+            db.execute(
+                'UPDATE jobs SET status = ?, error = ?, finished_at = ?, updated_at = ?, '
+                'owner = NULL, lease_until = NULL WHERE id = ?',
+                ('failed' if error else 'done', error, now, now, job_id),
+            )
+        return True
+
+    # ---------- consulta ----------
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def results(self, job_id: str, offset: int = 0, limit: int = 100, only_failed: bool = False) -> List[Dict[str, Any]]:
+        """Resultados por item (na ordem do envio), paginados; itens ainda não processados ficam de fora."""
+        sql = 'SELECT position, result FROM job_items WHERE job_id = ? AND result IS NOT NULL'
+        if only_failed:
+            sql += ' AND success = 0'
+        sql += ' ORDER BY position LIMIT ? OFFSET ?'
+        with self._lock:
+            rows = self._db.execute(sql, (job_id, limit, offset)).fetchall()
+        return [{'index': row['position'], **json.loads(row['result'])} for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._db.execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        out = {s: 0 for s in STATUSES}
+        out.update({row['status']: row['n'] for row in rows})
+        return out
+
+
+class JobRunner:
+    """Pool de workers asyncio: cada worker pega um job da fila e o processa bloco a bloco.
+
+    `process_chunk(items, replayed)` recebe até `chunk_size` itens e devolve o
+    resultado de cada um por posição (como `{'success': ..., 'message': ...}`);
+    `replayed` são as posições que um bloco interrompido já tentou gravar. Workers
+    ociosos procuram a fila a cada `poll_seconds` (jobs de outros processos ou
+    com lease vencido), além de quando `notify()` é chamado.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        process_chunk: Callable[[List[Item], Set[int]], Awaitable[Dict[int, Dict[str, Any]]]],
+        *,
+        workers: int = 2,
+        chunk_size: int = 200,
+        poll_seconds: float = 5.0,
+    ):
+        self.store = store
+        self.process_chunk = process_chunk
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.poll_seconds = poll_seconds
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    def notify(self) -> None:
+        """Acorda os workers ociosos (chamado ao enfileirar um job)."""
+        self._wake.set()
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        released = await asyncio.to_thread(self.store.release)
+        if released:
+            print(f"Jobs devolvidos para a fila no desligamento: {released}")
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.store.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(self.store.renew_leases)
+            except sqlite3.Error as e:
+                print(f"AVISO: Falha ao renovar o lease dos jobs: {e}")
+
+    async def _worker(self) -> None:
+        while True:
+            # Limpa antes de procurar: um notify() durante a busca não se perde
+            self._wake.clear()
+            job_id = await asyncio.to_thread(self.store.claim_next)
+            if job_id is None:
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+                continue
+            await self.run_job(job_id)
+
+    async def run_job(self, job_id: str) -> None:
+        # Marca d'água: sem ela cada bloco repassaria pelos itens já concluídos (job O(n²)).
+        # Ao retomar começa do início e salta os concluídos uma única vez.
+        after = -1
+        try:
+            while True:
+                items = await asyncio.to_thread(self.store.pending_items, job_id, self.chunk_size, after)
+                if not items:
+                    break
+                replayed = await asyncio.to_thread(self.store.attempted_positions, job_id, items)
+                if not await asyncio.to_thread(self.store.mark_attempted, job_id, items):
+                    print(f"AVISO: Job {job_id} foi reivindicado por outro processo (lease vencido)")
+                    return
+                results = await self.process_chunk(items, replayed)
+                if not await asyncio.to_thread(self.store.record_results, job_id, results):
+                    print(f"AVISO: Job {job_id} foi reivindicado por outro processo (lease vencido)")
+                    return
+                after = items[-1][0]
+        except asyncio.CancelledError:
+            raise  # desligamento: stop() devolve o job para a fila
+        except Exception as e:
+            print(f"AVISO: Job {job_id} falhou: {e}")
+            await asyncio.to_thread(self.store.finish, job_id, str(e))
+            return
+        await asyncio.to_thread(self.store.finish, job_id)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Teste de carga da api_server contra o PostgREST em memória (postgrest_stub.py).
+
+Sem Supabase e sem rede: por padrão a api_server e o stub rodam no mesmo
+processo (httpx.ASGITransport), com latência de banco configurável. Para cada
+combinação de cenário, concorrência e tamanho de lote, mede latência
+p50/p95/p99, requisições/s, linhas/s e idas ao banco por requisição.
+
+Uso:
+    python load_test_api.py
+    python load_test_api.py --scenario batch --concurrency 1,8,32 --batch-size 50,200 \
+        --requests 200 --latency-ms 15 --json resultado.json
+
+    # contra uma api_server rodando de verdade (uvicorn), apontada para o stub:
+    python postgrest_stub.py --port 54321 --latency-ms 15
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_SERVICE_KEY=stub uvicorn api_server:app --port 8000
+    python load_test_api.py --api-url http://127.0.0.1:8000 --stub-url http://127.0.0.1:54321
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from postgrest_stub import PostgRESTStub
+
+SCENARIOS = ("single", "batch")
+
+
+def parse_int_list(value: str) -> List[int]:
+    try:
+        return [int(v) for v in value.split(",") if v.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"lista de inteiros inválida: {value!r}")
+
+
+class RowFactory:
+    """Miniaturas sintéticas; `duplicate_ratio` reenvia chaves já enviadas (caminho 'já existe')."""
+
+    def __init__(self, run_id: str, duplicate_ratio: float = 0.0):
+        self.run_id = run_id
+        self.duplicate_ratio = duplicate_ratio
+        self._counter = itertools.count()
+        self._sent = 0
+
+    def row(self) -> Dict:
+        n = next(self._counter)
+        if self.duplicate_ratio and self._sent and (n * 7919 % 1000) / 1000 < self.duplicate_ratio:
+            n = n * 31 % self._sent
+        else:
+            self._sent = max(self._sent, n + 1)
+        return {
+            "model_name": f"Load {self.run_id} {n:07d}",
+            "brand": "Hot Wheels",
+            "launch_year": 1995 + n % 30,
+            "series": f"Series {n % 50}",
+            "collection_number": f"{n % 250 + 1}/250",
+            "base_color": ("Red", "Blue", "Black", "White")[n % 4],
+        }
+
+    def rows(self, count: int) -> List[Dict]:
+        return [self.row() for _ in range(count)]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    scenario: str,
+    concurrency: int,
+    batch_size: int,
+    total_requests: int,
+    factory: RowFactory,
+    db_calls: Callable[[], Awaitable[Optional[int]]],
+) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+    counter = itertools.count()
+
+    async def worker() -> None:
+        nonlocal errors
+        while next(counter) < total_requests:
+            if scenario == "single":
+                request = client.post("/miniatures", json=factory.row())
+            else:
+                request = client.post("/miniatures/batch", json=factory.rows(batch_size))
+            started = time.perf_counter()
+            try:
+                response = await request
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    calls_before = await db_calls()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    calls_after = await db_calls()
+
+    latencies.sort()
+    rows_per_request = 1 if scenario == "single" else batch_size
+    db_per_request = None
+    if calls_before is not None and calls_after is not None and latencies:
+        db_per_request = (calls_after - calls_before) / len(latencies)
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "batch_size": rows_per_request,
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "rows_per_second": len(latencies) * rows_per_request / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "db_calls_per_request": db_per_request,
+    }
+
+
+def print_header() -> None:
+    print(f"{'cenário':<8} {'conc':>5} {'lote':>5} {'req':>6} {'req/s':>9} {'linhas/s':>10} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erros':>6} {'db/req':>7}")
+
+
+def print_result(r: Dict) -> None:
+    db = f"{r['db_calls_per_request']:.2f}" if r["db_calls_per_request"] is not None else "-"
+    print(f"{r['scenario']:<8} {r['concurrency']:>5} {r['batch_size']:>5} {r['requests']:>6} "
+          f"{r['requests_per_second']:>9.1f} {r['rows_per_second']:>10.1f} {r['p50_ms']:>8.1f} "
+          f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['errors']:>6} {db:>7}")
+
+
+async def run_all(client: httpx.AsyncClient, args, db_calls) -> List[Dict]:
+    factory = RowFactory(str(int(time.time())), args.duplicate_ratio)
+    # Aquecimento: abre conexões e carrega caminhos de código fora da medição
+    await client.post("/miniatures/batch", json=factory.rows(5))
+
+    results = []
+    print_header()
+    for scenario in args.scenario:
+        sizes = [1] if scenario == "single" else args.batch_size
+        for batch_size in sizes:
+            for concurrency in args.concurrency:
+                result = await run_level(client, scenario, concurrency, batch_size, args.requests, factory, db_calls)
+                print_result(result)
+                results.append(result)
+    return results
+
+
+async def run_in_process(args) -> List[Dict]:
+    # A api_server exige as variáveis do Supabase na importação; o transporte
+    # ASGI garante que nenhuma requisição saia do processo.
+    os.environ.setdefault("SUPABASE_URL", "http://postgrest.stub")
+    os.environ.setdefault("SUPABASE_SERVICE_KEY", "stub")
+    os.environ["DB_MAX_CONNECTIONS"] = str(args.db_max_connections)
+    os.environ.setdefault("JOBS_DB_PATH", os.path.join(tempfile.gettempdir(), "load_test_api_jobs.sqlite3"))
+    import api_server
+    from catalog_db import CatalogDB
+
+    stub = PostgRESTStub(args.latency_ms, args.jitter_ms)
+    transport = httpx.ASGITransport(app=stub.app)
+
+    class StubCatalogDB(CatalogDB):
+        def __init__(self, *a, **kw):
+            super().__init__(*a, transport=transport, **kw)
+
+    api_server.CatalogDB = StubCatalogDB
+
+    async def db_calls() -> Optional[int]:
+        return stub.total_requests
+
+    async with api_server.lifespan(api_server.app):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=api_server.app),
+            base_url="http://api",
+            auth=(api_server.API_USERNAME, api_server.API_PASSWORD),
+            timeout=120,
+        ) as client:
+            results = await run_all(client, args, db_calls)
+    print(f"\nLinhas no stub: {len(stub.table.rows)} | idas ao banco: {dict(stub.requests)}")
+    return results
+
+
+async def run_external(args) -> List[Dict]:
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    auth = (os.getenv("API_USERNAME", "admin"), os.getenv("API_PASSWORD", "password"))
+    async with httpx.AsyncClient(base_url=args.api_url, auth=auth, limits=limits, timeout=120) as client, \
+            httpx.AsyncClient(base_url=args.stub_url or "http://invalid", timeout=10) as stub_client:
+
+        async def db_calls() -> Optional[int]:
+            if not args.stub_url:
+                return None
+            return (await stub_client.get("/_stats")).json()["requests"]
+
+        return await run_all(client, args, db_calls)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Teste de carga da api_server com PostgREST em memória")
+    ap.add_argument("--scenario", type=lambda v: [s for s in v.split(",") if s], default=list(SCENARIOS),
+                    help="single (POST /miniatures), batch (POST /miniatures/batch) ou ambos: single,batch")
+    ap.add_argument("--concurrency", type=parse_int_list, default=[1, 8, 32], help="Ex.: 1,8,32")
+    ap.add_argument("--batch-size", type=parse_int_list, default=[50, 200], help="Ex.: 10,100,500")
+    ap.add_argument("--requests", type=int, default=200, help="Requisições por combinação")
+    ap.add_argument("--duplicate-ratio", type=float, default=0.0, help="Fração de linhas já enviadas antes")
+    ap.add_argument("--latency-ms", type=float, default=10.0, help="Latência simulada do banco (em processo)")
+    ap.add_argument("--jitter-ms", type=float, default=2.0, help="Variação (±) da latência simulada")
+    ap.add_argument("--db-max-connections", type=int, default=20, help="DB_MAX_CONNECTIONS da api_server")
+    ap.add_argument("--api-url", help="Testa uma api_server já rodando em vez da do processo")
+    ap.add_argument("--stub-url", help="Com --api-url: postgrest_stub para contar idas ao banco (/_stats)")
+    ap.add_argument("--json", help="Grava os resultados em JSON")
+    args = ap.parse_args()
+
+    unknown = [s for s in args.scenario if s not in SCENARIOS]
+    if unknown:
+        ap.error(f"cenário desconhecido: {', '.join(unknown)}")
+
+    mode = f"api_server em {args.api_url}" if args.api_url else (
+        f"em processo, banco {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, pool {args.db_max_connections}")
+    print(f"[INFO] Teste de carga: {mode} | {args.requests} requisições por combinação\n")
+    results = asyncio.run(run_external(args) if args.api_url else run_in_process(args))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"Resultados salvos em {args.json}")
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
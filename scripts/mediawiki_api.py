@@ -0,0 +1,184 @@
+"""Cliente mínimo do MediaWiki API (api.php) do Fandom.
+
+Em vez de uma página de lista em HTML + um download completo por modelo:
+- descoberta com `list=categorymembers` / `list=allpages` (até 500 títulos por requisição);
+- conteúdo com `prop=revisions` (wikitext + revid) e `prop=pageimages`
+  para até 50 títulos por requisição;
+- `latest_revisions` (só `prop=info`) para saber o que mudou antes de baixar.
+
+Funciona com qualquer `requests.Session` (a do scraper, com os mesmos headers)
+e com o servidor local `mediawiki_stub_server.py` para testes.
+"""
+
+import time
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import requests
+
+MAX_TITLES_PER_REQUEST = 50  # limite do api.php para usuários sem apihighlimits
+MAX_LIST_LIMIT = 500
+
+
+class MediaWikiAPIError(RuntimeError):
+    pass
+
+
+class WikiPage(NamedTuple):
+    title: str
+    pageid: Optional[int]
+    revid: Optional[int]
+    wikitext: Optional[str]
+    image_url: Optional[str]
+
+
+def chunked(items: List[str], size: int) -> Iterator[List[str]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class MediaWikiAPI:
+    def __init__(
+        self,
+        api_url: str,
+        session: Optional[requests.Session] = None,
+        *,
+        batch_size: int = MAX_TITLES_PER_REQUEST,
+        retries: int = 3,
+        backoff: float = 1.5,
+        delay: float = 0.0,
+        timeout: float = 30.0,
+    ):
+        self.api_url = api_url
+        self.session = session or requests.Session()
+        self.batch_size = max(1, min(batch_size, MAX_TITLES_PER_REQUEST))
+        self.retries = retries
+        self.backoff = backoff
+        self.delay = delay  # pausa mínima entre requisições (educação com o servidor)
+        self.timeout = timeout
+        self.requests = 0
+        self._last_request = 0.0
+
+    # ---------- baixo nível ----------
+    def get(self, params: Dict[str, str]) -> Dict:
+        params = {"action": "query", "format": "json", "formatversion": "2", "maxlag": "5", **params}
+        last_err = None
+        for i in range(self.retries):
+            wait = self.delay - (time.monotonic() - self._last_request)
+            if wait > 0:
+                time.sleep(wait)
+            self._last_request = time.monotonic()
+            self.requests += 1
+            try:
+                resp = self.session.get(self.api_url, params=params, timeout=self.timeout)
+                if resp.status_code != 200:
+                    last_err = f"HTTP {resp.status_code}"
+                else:
+                    data = resp.json()
+                    error = data.get("error")
+                    if not error:
+                        return data
+                    if error.get("code") != "maxlag":
+                        raise MediaWikiAPIError(f"{error.get('code')}: {error.get('info')}")
+                    last_err = "maxlag"
+            except (requests.RequestException, ValueError) as e:
+                last_err = str(e)
+            time.sleep(self.backoff * (i + 1))
+        raise MediaWikiAPIError(f"api.php falhou: {last_err}")
+
+    def query(self, params: Dict[str, str]) -> Iterator[Dict]:
+        """Segue a continuação (`continue`) e gera cada resposta."""
+        cont: Dict[str, str] = {}
+        while True:
+            data = self.get({**params, **cont})
+            yield data
+            if "continue" not in data:
+                return
+            cont = data["continue"]
+
+    # ---------- descoberta ----------
+    def category_members(self, category: str, namespace: int = 0) -> Iterator[str]:
+        if not category.lower().startswith("category:"):
+            category = f"Category:{category}"
+        params = {
+            "list": "categorymembers",
+            "cmtitle": category,
+            "cmnamespace": str(namespace),
+            "cmtype": "page",
+            "cmlimit": str(MAX_LIST_LIMIT),
+        }
+        for data in self.query(params):
+            for member in data.get("query", {}).get("categorymembers", []):
+                yield member["title"]
+
+    def all_pages(self, prefix: Optional[str] = None, namespace: int = 0) -> Iterator[str]:
+        params = {
+            "list": "allpages",
+            "apnamespace": str(namespace),
+            "apfilterredir": "nonredirects",
+            "aplimit": str(MAX_LIST_LIMIT),
+        }
+        if prefix:
+            params["apprefix"] = prefix
+        for data in self.query(params):
+            for page in data.get("query", {}).get("allpages", []):
+                yield page["title"]
+
+    # ---------- conteúdo ----------
+    def _pages(self, titles: List[str], params: Dict[str, str]) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+        """Páginas (por título final) e o mapa título pedido -> título final."""
+        pages: Dict[str, Dict] = {}
+        resolved: Dict[str, str] = {}
+        for data in self.query({**params, "titles": "|".join(titles), "redirects": "1"}):
+            q = data.get("query", {})
+            for item in q.get("normalized", []) + q.get("redirects", []):
+                resolved[item["from"]] = item["to"]
+            for page in q.get("pages", []):
+                # respostas continuadas trazem a mesma página com outras props
+                pages.setdefault(page["title"], {}).update(page)
+
+        def final(title: str) -> str:
+            seen = set()
+            while title in resolved and title not in seen:
+                seen.add(title)
+                title = resolved[title]
+            return title
+
+        return pages, {t: final(t) for t in titles}
+
+    def latest_revisions(self, titles: Iterable[str]) -> Dict[str, Optional[int]]:
+        """revid atual de cada título pedido (None se a página não existe)."""
+        out: Dict[str, Optional[int]] = {}
+        for batch in chunked(list(titles), self.batch_size):
+            pages, resolved = self._pages(batch, {"prop": "info"})
+            for title in batch:
+                page = pages.get(resolved[title], {})
+                out[title] = None if page.get("missing") else page.get("lastrevid")
+        return out
+
+    def fetch_pages(self, titles: Iterable[str]) -> Iterator[Tuple[str, Optional[WikiPage]]]:
+        """Gera (título pedido, WikiPage | None) com até `batch_size` páginas por requisição."""
+        params = {
+            "prop": "revisions|pageimages",
+            "rvprop": "ids|content",
+            "rvslots": "main",
+            "piprop": "original",
+            "pilimit": str(MAX_TITLES_PER_REQUEST),
+        }
+        for batch in chunked(list(titles), self.batch_size):
+            pages, resolved = self._pages(batch, params)
+            for title in batch:
+                page = pages.get(resolved[title])
+                if not page or page.get("missing") or page.get("invalid"):
+                    yield title, None
+                    continue
+                revision = (page.get("revisions") or [{}])[0]
+                content = revision.get("slots", {}).get("main", {}).get("content")
+                if content is None:
+                    content = revision.get("content")  # formato antigo, sem slots
+                yield title, WikiPage(
+                    title=page["title"],
+                    pageid=page.get("pageid"),
+                    revid=revision.get("revid"),
+                    wikitext=content,
+                    image_url=(page.get("original") or {}).get("source"),
+                )
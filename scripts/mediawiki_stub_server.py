@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Servidor local que imita o api.php do Fandom, para testar o scraper sem rede.
+
+Uso:
+    python mediawiki_stub_server.py                       # fixtures em scripts/fixtures/mediawiki
+    python mediawiki_stub_server.py --synthetic 2000      # + 2000 páginas em Category:Synthetic
+    python scrape_hotwheels_updated.py --source api --api-url http://127.0.0.1:8766/api.php \
+        --category "2019 Hot Wheels" --dry-run
+
+Cada arquivo <Título>.wikitext da pasta é uma página ("_" = espaço). Suporta o
+que mediawiki_api.py usa: list=categorymembers, list=allpages, prop=info,
+prop=revisions (rvslots=main), prop=pageimages, redirects, normalização de
+títulos, continuação e o limite de 50 títulos por requisição.
+"""
+
+import argparse
+import json
+import os
+import re
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, quote, urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "mediawiki")
+MAX_TITLES = 50
+
+_RE_CATEGORY = re.compile(r"\[\[\s*Category\s*:\s*([^\]|]+)", re.I)
+_RE_REDIRECT = re.compile(r"^\s*#REDIRECT\s*\[\[([^\]|]+)", re.I)
+_RE_IMAGE = re.compile(r"^\s*\|\s*image\s*=\s*(.+?)\s*$", re.M)
+
+
+def normalize_title(title: str) -> str:
+    title = " ".join(title.replace("_", " ").split())
+    return title[:1].upper() + title[1:]
+
+
+def load_pages(directory: str) -> Dict[str, str]:
+    pages = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".wikitext"):
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                pages[normalize_title(name[: -len(".wikitext")])] = f.read()
+    return pages
+
+
+def synthetic_pages(count: int) -> Dict[str, str]:
+    pages = {}
+    for n in range(count):
+        rows = "\n".join(
+            f"|-\n| {i + 1}/{count} || {2000 + (n + i) % 25} || [[HW Series {i % 7}]] || Red || "
+            f"{'Treasure Hunt' if i % 11 == 0 else 'Lot ' + str(i)} || SYN{n:05d}-{i:02d}"
+            for i in range(10)
+        )
+        pages[f"Synthetic Model {n:05d}"] = (
+            "{{Casting\n|image = Synthetic.jpg\n}}\n"
+            '{| class="wikitable"\n|-\n'
+            "! Collection Number !! Year !! Series !! Color !! Details !! Base Code\n"
+            f"{rows}\n|}}\n[[Category:Synthetic]]\n"
+        )
+    return pages
+
+
+class StubWiki:
+    def __init__(self, pages: Dict[str, str], base_url: str):
+        self.pages = pages
+        self.base_url = base_url
+        self.titles = sorted(pages)
+        self.requests = 0
+
+    def revid(self, title: str) -> int:
+        return zlib.crc32(self.pages[title].encode("utf-8"))
+
+    def categories(self, title: str) -> List[str]:
+        return [normalize_title(c) for c in _RE_CATEGORY.findall(self.pages[title])]
+
+    def redirect_target(self, title: str) -> Optional[str]:
+        m = _RE_REDIRECT.match(self.pages[title])
+        return normalize_title(m.group(1)) if m else None
+
+    def image_url(self, title: str) -> Optional[str]:
+        m = _RE_IMAGE.search(self.pages[title])
+        return f"{self.base_url}/images/{quote(m.group(1).replace(' ', '_'))}" if m else None
+
+    # ---------- listas ----------
+    def _listing(self, key: str, prefix: str, titles: List[str], params: Dict[str, str]) -> Dict:
+        limit = min(int(params.get(f"{prefix}limit", "10")), 500)
+        start = int(params.get(f"{prefix}continue", "0") or 0)
+        chunk = titles[start:start + limit]
+        data = {"batchcomplete": True, "query": {key: [{"ns": 0, "title": t} for t in chunk]}}
+        if start + limit < len(titles):
+            data["continue"] = {f"{prefix}continue": str(start + limit), "continue": "-||"}
+        return data
+
+    def list_query(self, params: Dict[str, str]) -> Dict:
+        kind = params["list"]
+        if kind == "categorymembers":
+            category = normalize_title(params.get("cmtitle", "").split(":", 1)[-1])
+            titles = [t for t in self.titles if category in self.categories(t) and not self.redirect_target(t)]
+            return self._listing("categorymembers", "cm", titles, params)
+        if kind == "allpages":
+            prefix = normalize_title(params.get("apprefix", ""))
+            titles = [t for t in self.titles if t.startswith(prefix) and not self.redirect_target(t)]
+            return self._listing("allpages", "ap", titles, params)
+        return {"error": {"code": "badvalue", "info": f"Unrecognized value for parameter list: {kind}"}}
+
+    # ---------- páginas ----------
+    def prop_query(self, params: Dict[str, str]) -> Dict:
+        requested = [t for t in params.get("titles", "").split("|") if t]
+        if len(requested) > MAX_TITLES:
+            return {"error": {"code": "toomanyvalues",
+                              "info": f'Too many values supplied for parameter "titles". The limit is {MAX_TITLES}.'}}
+        props = set(params.get("prop", "").split("|"))
+        query: Dict = {"normalized": [], "redirects": [], "pages": []}
+        seen = set()
+        for raw in requested:
+            title = normalize_title(raw)
+            if title != raw:
+                query["normalized"].append({"from": raw, "to": title})
+            if params.get("redirects") and title in self.pages and self.redirect_target(title):
+                target = self.redirect_target(title)
+                query["redirects"].append({"from": title, "to": target})
+                title = target
+            if title in seen:
+                continue
+            seen.add(title)
+            if title not in self.pages:
+                query["pages"].append({"ns": 0, "title": title, "missing": True})
+                continue
+            page = {"pageid": self.titles.index(title) + 1, "ns": 0, "title": title}
+            if "info" in props:
+                page["lastrevid"] = self.revid(title)
+                page["length"] = len(self.pages[title])
+            if "revisions" in props:
+                page["revisions"] = [{
+                    "revid": self.revid(title),
+                    "parentid": 0,
+                    "slots": {"main": {"contentmodel": "wikitext", "contentformat": "text/x-wiki",
+                                       "content": self.pages[title]}},
+                }]
+            if "pageimages" in props and self.image_url(title):
+                page["original"] = {"source": self.image_url(title), "width": 268, "height": 178}
+            query["pages"].append(page)
+        for key in ("normalized", "redirects"):
+            if not query[key]:
+                del query[key]
+        return {"batchcomplete": True, "query": query}
+
+    def handle(self, params: Dict[str, str]) -> Dict:
+        self.requests += 1
+        if params.get("action") != "query":
+            return {"error": {"code": "badvalue", "info": "Only action=query is supported by the stub."}}
+        if "list" in params:
+            return self.list_query(params)
+        return self.prop_query(params)
+
+
+def make_handler(wiki: StubWiki, verbose: bool):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != "/api.php":
+                self.send_error(404)
+                return
+            params = {k: v[-1] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+            body = json.dumps(wiki.handle(params)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            if verbose:
+                print(f"[stub #{wiki.requests}] {self.path[:160]}")
+
+    return Handler
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="api.php local para testar o scraper (--source api)")
+    ap.add_argument("--dir", default=FIXTURES_DIR, help="Pasta com <Título>.wikitext")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8766)
+    ap.add_argument("--synthetic", type=int, default=0, help="Páginas sintéticas extras (Category:Synthetic)")
+    ap.add_argument("--verbose", action="store_true", help="Mostra cada requisição")
+    args = ap.parse_args()
+
+    pages = load_pages(args.dir)
+    pages.update(synthetic_pages(args.synthetic))
+    wiki = StubWiki(pages, f"http://{args.host}:{args.port}")
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(wiki, args.verbose))
+    print(f"[INFO] api.php local em http://{args.host}:{args.port}/api.php ({len(pages)} páginas)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"[INFO] Requisições atendidas: {wiki.requests}")
+
+
+if __name__ == "__main__":
+    main()
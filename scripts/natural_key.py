@@ -0,0 +1,62 @@
+"""Chave natural canônica de uma miniatura, compartilhada por scripts e API.
+
+    (model_name, brand, launch_year, series) -> md5 hexadecimal
+
+Cada texto é normalizado (espaços em branco colapsados, sem espaços nas pontas,
+minúsculas) e campos vazios viram NULL; os campos são unidos pelo caractere
+0x1F (unit separator). A coluna gerada `miniatures_master.natural_key` calcula
+exatamente o mesmo valor no banco (create_tables.sql e add_catalog_indexes.sql):
+
+    md5(coalesce(lower(btrim(regexp_replace(model_name, '[ \\t\\n\\r\\f\\v]+', ' ', 'g'), ' ')), '')
+        || chr(31) || ...)
+
+Com o índice único nessa coluna, "já existe?" e o upsert viram uma igualdade
+indexada (`natural_key = ...` / `on_conflict=natural_key`), com NULL em
+`series`/`launch_year` tratado como valor — ao contrário da restrição UNIQUE
+original, em que NULLs são sempre distintos — e sem diferença entre
+"CAMARO" (import_fast_wheels) e "Camaro" (scraper do Fandom).
+"""
+
+import hashlib
+import re
+from typing import Any, Dict, Optional, Tuple
+
+NATURAL_KEY_COLUMNS = ('model_name', 'brand', 'launch_year', 'series')
+
+# Coluna gerada e índice único no banco
+NATURAL_KEY_COLUMN = 'natural_key'
+
+_SEPARATOR = '\x1f'
+# Mesma classe de espaços usada no regexp_replace da coluna gerada
+_RE_SPACES = re.compile(r'[ \t\n\r\f\v]+')
+
+
+def canonical_text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    text = _RE_SPACES.sub(' ', str(value)).strip(' ').lower()
+    return text or None
+
+
+def canonical_year(value: Any) -> Optional[int]:
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def canonical_key(row: Dict[str, Any]) -> Tuple[Optional[str], Optional[str], Optional[int], Optional[str]]:
+    return (
+        canonical_text(row.get('model_name')),
+        canonical_text(row.get('brand')),
+        canonical_year(row.get('launch_year')),
+        canonical_text(row.get('series')),
+    )
+
+
+def natural_key_hash(row: Dict[str, Any]) -> str:
+    """Valor da coluna `natural_key` para a linha (igual ao calculado pelo banco)."""
+    parts = ['' if part is None else str(part) for part in canonical_key(row)]
+    return hashlib.md5(_SEPARATOR.join(parts).encode('utf-8')).hexdigest()
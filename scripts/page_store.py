@@ -0,0 +1,158 @@
+"""Armazenamento local das páginas HTML baixadas do Fandom.
+
+Cada página é guardada comprimida (gzip) e endereçada pelo SHA-256 do conteúdo;
+um índice SQLite liga a URL ao conteúdo atual junto com ETag/Last-Modified,
+para revalidar com GET condicional (304 = página não mudou) e para reprocessar
+todo o acervo offline (`--replay`).
+
+O índice também guarda o hash do último conteúdo cujas linhas chegaram ao banco
+(`mark_written`): uma página só conta como "sem alterações" se o conteúdo atual
+já foi gravado, e não apenas baixado.
+"""
+
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    kind TEXT NOT NULL DEFAULT 'model',
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    changed_at REAL NOT NULL,
+    written_sha256 TEXT
+)
+"""
+
+# Colunas acrescentadas depois da primeira versão do acervo
+ADDED_COLUMNS = {"written_sha256": "TEXT"}
+
+
+class PageStore:
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        # usado pelo event loop, pelas threads de gravação e pelo timer do buffer
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite3"), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(SCHEMA)
+        existing = {row["name"] for row in self._db.execute("PRAGMA table_info(pages)")}
+        for column, decl in ADDED_COLUMNS.items():
+            if column not in existing:
+                self._db.execute(f"ALTER TABLE pages ADD COLUMN {column} {decl}")
+        self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def _object_path(self, sha256: str) -> str:
+        return os.path.join(self.root, "objects", sha256[:2], f"{sha256}.html.gz")
+
+    def meta(self, url: str) -> Optional[sqlite3.Row]:
+        with self._lock:
+            return self._db.execute("SELECT * FROM pages WHERE url = ?", (url,)).fetchone()
+
+    def is_written(self, url: str) -> bool:
+        """True se as linhas do conteúdo guardado já foram gravadas no banco."""
+        row = self.meta(url)
+        return bool(row) and row["written_sha256"] == row["sha256"]
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Cabeçalhos If-None-Match / If-Modified-Since para a última versão guardada."""
+        row = self.meta(url)
+        if not row or not os.path.exists(self._object_path(row["sha256"])):
+            return {}
+        headers = {}
+        if row["etag"]:
+            headers["If-None-Match"] = row["etag"]
+        if row["last_modified"]:
+            headers["If-Modified-Since"] = row["last_modified"]
+        return headers
+
+    def read(self, url: str) -> Optional[str]:
+        row = self.meta(url)
+        if not row:
+            return None
+        try:
+            with gzip.open(self._object_path(row["sha256"]), "rt", encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(
+        self,
+        url: str,
+        html: str,
+        *,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        kind: str = "model",
+    ) -> bool:
+        """Guarda a página; retorna False se o conteúdo é idêntico ao já gravado no banco."""
+        data = html.encode("utf-8")
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self._object_path(sha256)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.tmp"
+            with gzip.open(tmp, "wb", compresslevel=6) as f:
+                f.write(data)
+            os.replace(tmp, path)
+
+        now = time.time()
+        previous = self.meta(url)
+        changed = previous is None or previous["written_sha256"] != sha256
+        with self._lock:
+            self._db.execute(
+                """
+                INSERT INTO pages (url, sha256, kind, etag, last_modified, fetched_at, changed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    sha256 = excluded.sha256,
+                    kind = excluded.kind,
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    fetched_at = excluded.fetched_at,
+                    changed_at = CASE WHEN pages.sha256 = excluded.sha256
+                                      THEN pages.changed_at ELSE excluded.changed_at END
+                """,
+                (url, sha256, kind, etag, last_modified, now, now),
+            )
+            self._db.commit()
+        return changed
+
+    def mark_fresh(self, url: str) -> None:
+        """Registra uma revalidação 304 (conteúdo guardado continua válido)."""
+        with self._lock:
+            self._db.execute("UPDATE pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+            self._db.commit()
+
+    def mark_written(self, url: str) -> None:
+        """As linhas do conteúdo guardado foram gravadas no banco."""
+        with self._lock:
+            self._db.execute("UPDATE pages SET written_sha256 = sha256 WHERE url = ?", (url,))
+            self._db.commit()
+
+    def urls(self, kind: Optional[str] = None) -> List[str]:
+        with self._lock:
+            if kind:
+                rows = self._db.execute("SELECT url FROM pages WHERE kind = ? ORDER BY url", (kind,)).fetchall()
+            else:
+                rows = self._db.execute("SELECT url FROM pages ORDER BY url").fetchall()
+        return [row["url"] for row in rows]
+
+    def iter_pages(self, kind: Optional[str] = "model") -> Iterator[Tuple[str, str]]:
+        """Gera (url, html) de todo o acervo guardado, sem acessar a rede."""
+        for url in self.urls(kind):
+            html = self.read(url)
+            if html is not None:
+                yield url, html
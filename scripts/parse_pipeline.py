@@ -0,0 +1,98 @@
+"""Estágio de parsing em processos separados, desacoplado do download.
+
+    páginas (crawler/acervo) -> fila limitada -> ProcessPoolExecutor -> (url, versões)
+
+O parsing com BeautifulSoup é CPU-bound; rodando em processos, o event loop
+fica livre para os sockets e a vazão cresce com o número de núcleos. A fila
+limitada entre os estágios dá backpressure: quando os parsers ficam para trás,
+o produtor para de puxar páginas (e o crawler para de baixar).
+
+Uma página cujo parsing falha sai com a exceção no lugar das versões, para que
+quem consome registre a falha em vez de tratá-la como página sem versões.
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+
+_DONE = object()
+
+
+def default_workers() -> int:
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def _warm_up() -> int:
+    return os.getpid()
+
+
+def _mp_context():
+    # Sem fork: quando o pool sobe já há threads no processo (timer do WRITE_BUFFER,
+    # threads do asyncio.to_thread) e um fork poderia herdar um lock preso
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+async def parse_in_processes(
+    pages: AsyncIterator[Tuple[str, str]],
+    parse: Callable[..., List[Dict]],
+    *,
+    workers: Optional[int] = None,
+    queue_size: Optional[int] = None,
+    parse_args: tuple = (),
+) -> AsyncIterator[Tuple[str, Union[List[Dict], Exception]]]:
+    """Gera (url, parse(html, *parse_args)) na ordem em que os parsers terminam.
+
+    Se o parsing de uma página levanta exceção, gera (url, exceção).
+    `parse` precisa ser uma função de módulo (serializável com pickle).
+    """
+    workers = workers or default_workers()
+    queue_size = queue_size or workers * 2
+    loop = asyncio.get_running_loop()
+    pages_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    results_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context()) as pool:
+        # Sobe os processos antes de começar a baixar
+        await asyncio.gather(*(loop.run_in_executor(pool, _warm_up) for _ in range(workers)))
+
+        async def produce():
+            try:
+                async for url, html in pages:
+                    await pages_queue.put((url, html))
+            finally:
+                for _ in range(workers):
+                    await pages_queue.put(_DONE)
+
+        async def parse_worker():
+            try:
+                while True:
+                    item = await pages_queue.get()
+                    if item is _DONE:
+                        return
+                    url, html = item
+                    try:
+                        versions = await loop.run_in_executor(pool, parse, html, *parse_args)
+                    except Exception as e:
+                        print(f"\n[ERRO] Falha no parsing de {url}: {e}\n")
+                        versions = e
+                    await results_queue.put((url, versions))
+            finally:
+                await results_queue.put(_DONE)
+
+        tasks = [asyncio.create_task(produce())]
+        tasks += [asyncio.create_task(parse_worker()) for _ in range(workers)]
+        try:
+            finished = 0
+            while finished < workers:
+                item = await results_queue.get()
+                if item is _DONE:
+                    finished += 1
+                    continue
+                yield item
+            await tasks[0]  # propaga erros do produtor
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Imitação em memória do PostgREST do Supabase para `miniatures_master`.
+
+Implementa o subconjunto que a api_server e os scripts usam, com as mesmas
+regras que importam para desempenho e correção:
+
+- GET com `select`, filtros `eq`/`in`/`is` (e `lt`/`lte`/`gt`/`gte` em `created_at`),
+  `or` do cursor keyset, `order` e `limit`;
+- POST de insert e upsert (`Prefer: resolution=ignore|merge-duplicates`,
+  `on_conflict`), com `natural_key` calculada como a coluna gerada e índice
+  único nela (conflito -> 409 / 23505);
+- lote com objetos de chaves diferentes é rejeitado (PGRST102), como no real,
+  a não ser com `columns=`: aí a chave ausente vira NULL, ou o DEFAULT da
+  coluna com `Prefer: missing=default`;
+- texto com `\\u0000` é rejeitado (22P05) e derruba o lote inteiro, como no Postgres;
+- latência configurável por requisição (`latency_ms` ± `jitter_ms`).
+
+Pode rodar dentro do processo (ASGI via `httpx.ASGITransport`, ver
+load_test_api.py) ou como servidor:
+
+    python postgrest_stub.py --port 54321 --latency-ms 15
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_SERVICE_KEY=stub python api_server.py
+
+GET /_stats devolve as requisições recebidas; POST /_reset zera contadores e dados.
+"""
+
+import argparse
+import asyncio
+import json
+import operator
+import random
+import re
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from natural_key import NATURAL_KEY_COLUMN, natural_key_hash
+
+TABLE = "miniatures_master"
+_COMPARE = {"lt": operator.lt, "lte": operator.le, "gt": operator.gt, "gte": operator.ge}
+_RE_KEYSET = re.compile(r'^\(created_at\.lt\."([^"]+)",and\(created_at\.eq\."([^"]+)",id\.lt\.([^)]+)\)\)$')
+
+
+def _split_values(raw: str) -> List[str]:
+    """Valores de `in.(a,"b,c")`, respeitando aspas."""
+    values, current, quoted = [], [], False
+    for ch in raw:
+        if ch == '"':
+            quoted = not quoted
+        elif ch == "," and not quoted:
+            values.append("".join(current))
+            current = []
+        else:
+            current.append(ch)
+    values.append("".join(current))
+    return values
+
+
+def _as_text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+class MiniaturesTable:
+    def __init__(self):
+        self.rows: List[Dict[str, Any]] = []  # em ordem de created_at crescente
+        self.by_key: Dict[str, Dict[str, Any]] = {}
+        self._clock = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    def _next_created_at(self) -> str:
+        self._clock += timedelta(microseconds=1)
+        return self._clock.isoformat()
+
+    def new_row(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        row = {
+            "id": str(uuid.uuid4()),
+            "is_treasure_hunt": False,
+            "is_super_treasure_hunt": False,
+            "visibility": "public",
+            **data,
+            "created_at": self._next_created_at(),
+        }
+        row["updated_at"] = row["created_at"]
+        row[NATURAL_KEY_COLUMN] = natural_key_hash(row)
+        return row
+
+    def append(self, row: Dict[str, Any]) -> None:
+        self.rows.append(row)
+        self.by_key[row[NATURAL_KEY_COLUMN]] = row
+
+
+class PostgRESTStub:
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, seed: int = 0):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.random = random.Random(seed)
+        self.table = MiniaturesTable()
+        self.requests: Counter = Counter()
+        self.app = Starlette(routes=[
+            Route("/rest/v1/{table}", self.handle, methods=["GET", "POST", "PATCH"]),
+            Route("/_stats", self.stats, methods=["GET"]),
+            Route("/_reset", self.reset, methods=["POST"]),
+        ])
+
+    @property
+    def total_requests(self) -> int:
+        return sum(self.requests.values())
+
+    async def stats(self, request: Request) -> Response:
+        return JSONResponse({"requests": self.total_requests, "by_kind": dict(self.requests),
+                             "rows": len(self.table.rows)})
+
+    async def reset(self, request: Request) -> Response:
+        self.requests.clear()
+        if request.query_params.get("data") != "keep":
+            self.table = MiniaturesTable()
+        return JSONResponse({"ok": True})
+
+    async def _sleep(self) -> None:
+        delay = self.latency + (self.random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def error(status: int, code: str, message: str) -> Response:
+        return JSONResponse({"code": code, "message": message, "details": None, "hint": None}, status_code=status)
+
+    async def handle(self, request: Request) -> Response:
+        if request.path_params["table"] != TABLE:
+            return self.error(404, "42P01", f'relation "public.{request.path_params["table"]}" does not exist')
+        await self._sleep()
+        if request.method == "GET":
+            self.requests["select"] += 1
+            return self.select(request)
+        if request.method == "PATCH":
+            self.requests["update"] += 1
+            return self.update(request, json.loads(await request.body() or b"{}"))
+        body = json.loads(await request.body() or b"[]")
+        prefer = request.headers.get("prefer", "")
+        kind = "upsert" if "resolution=" in prefer else "insert"
+        self.requests[kind] += 1
+        return self.insert(request, body if isinstance(body, list) else [body], prefer)
+
+    # ---------- leitura ----------
+    def _filters(self, request: Request):
+        checks = []
+        for column, raw in request.query_params.multi_items():
+            if column in ("select", "order", "limit", "offset", "on_conflict", "columns"):
+                continue
+            if column == "or":
+                m = _RE_KEYSET.match(raw)
+                if not m:
+                    raise ValueError(f"or não suportado pelo stub: {raw}")
+                created_at, row_id = m.group(1), m.group(3)
+                checks.append(lambda r, c=created_at, i=row_id: (r["created_at"], r["id"]) < (c, i))
+                continue
+            op, _, value = raw.partition(".")
+            if op == "eq":
+                checks.append(lambda r, c=column, v=value: _as_text(r.get(c)) == v)
+            elif op in _COMPARE and column == "created_at":
+                # created_at em ISO 8601 com o mesmo fuso: a ordem do texto é a do tempo
+                checks.append(lambda r, f=_COMPARE[op], v=value: f(r["created_at"], v))
+            elif op == "in":
+                wanted = set(_split_values(value.strip("()")))
+                checks.append(lambda r, c=column, w=wanted: _as_text(r.get(c)) in w)
+            elif op == "is" and value == "null":
+                checks.append(lambda r, c=column: r.get(c) is None)
+            else:
+                raise ValueError(f"filtro não suportado pelo stub: {column}={raw}")
+        return checks
+
+    def _candidates(self, request: Request) -> List[Dict[str, Any]]:
+        # natural_key=eq./in. usa o "índice único" em vez de percorrer a tabela
+        raw = request.query_params.get(NATURAL_KEY_COLUMN)
+        if raw and raw.startswith("eq."):
+            row = self.table.by_key.get(raw[3:])
+            return [row] if row else []
+        if raw and raw.startswith("in."):
+            keys = _split_values(raw[3:].strip("()"))
+            return [self.table.by_key[k] for k in keys if k in self.table.by_key]
+        return self.table.rows
+
+    def select(self, request: Request) -> Response:
+        try:
+            checks = self._filters(request)
+        except ValueError as e:
+            return self.error(400, "PGRST100", str(e))
+        order = request.query_params.get("order", "")
+        descending = order.startswith("created_at.desc")
+        limit = int(request.query_params.get("limit", "1000"))
+        offset = int(request.query_params.get("offset", "0"))
+        rows = self._candidates(request)
+        if order and rows is self.table.rows:
+            # A tabela já está em ordem de created_at (o "índice" de created_at, id)
+            rows = reversed(rows) if descending else rows
+        elif order:
+            rows = sorted(rows, key=lambda r: (r["created_at"], r["id"]), reverse=descending)
+
+        out, skipped = [], 0
+        for row in rows:
+            if all(check(row) for check in checks):
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                out.append(row)
+                if len(out) >= limit:
+                    break
+        columns = request.query_params.get("select", "*")
+        if columns != "*":
+            names = columns.split(",")
+            out = [{n: r.get(n) for n in names} for r in out]
+        return JSONResponse(out)
+
+    # ---------- escrita ----------
+    def insert(self, request: Request, rows: List[Dict[str, Any]], prefer: str) -> Response:
+        columns = request.query_params.get("columns")
+        if columns:
+            # Chaves fora de `columns` são ignoradas, como no PostgREST
+            names = columns.split(",")
+            default = "missing=default" in prefer
+            rows = [{c: r.get(c) for c in names if c in r or not default} for r in rows]
+        elif rows and any(set(r) != set(rows[0]) for r in rows):
+            return self.error(400, "PGRST102", "All object keys must match")
+        if any(NATURAL_KEY_COLUMN in r for r in rows):
+            return self.error(400, "428C9", f'cannot insert a non-DEFAULT value into column "{NATURAL_KEY_COLUMN}"')
+        for r in rows:
+            if not r.get("model_name") or not r.get("brand"):
+                return self.error(400, "23502", 'null value in column "model_name" or "brand" violates not-null constraint')
+
+        for r in rows:
+            if any(isinstance(v, str) and "\x00" in v for v in r.values()):
+                return self.error(400, "22P05", "unsupported Unicode escape sequence")
+
+        conflict = request.query_params.get("on_conflict")
+        if conflict not in (None, NATURAL_KEY_COLUMN, "id"):
+            return self.error(400, "42P10", "there is no unique or exclusion constraint matching the ON CONFLICT specification")
+        ignore = "resolution=ignore-duplicates" in prefer
+        merge = "resolution=merge-duplicates" in prefer
+
+        new_rows, returned, batch_keys = [], [], set()
+        for data in rows:
+            candidate = self.table.new_row(data)
+            key = candidate[NATURAL_KEY_COLUMN]
+            existing = self.table.by_key.get(key)
+            if existing is None and key in batch_keys:
+                if ignore:
+                    continue
+                return self.error(409, "21000", "ON CONFLICT DO UPDATE command cannot affect row a second time")
+            if existing is not None:
+                if ignore:
+                    continue
+                if merge:
+                    existing.update(data)
+                    returned.append(existing)
+                    continue
+                return self.error(409, "23505",
+                                  'duplicate key value violates unique constraint "idx_miniatures_master_natural_key"')
+            batch_keys.add(key)
+            new_rows.append(candidate)
+
+        # Tudo ou nada, como uma transação
+        for row in new_rows:
+            self.table.append(row)
+        returned.extend(new_rows)
+        if "return=minimal" in prefer:
+            return Response(status_code=201)
+        return JSONResponse(returned, status_code=201)
+
+    def update(self, request: Request, data: Dict[str, Any]) -> Response:
+        try:
+            checks = self._filters(request)
+        except ValueError as e:
+            return self.error(400, "PGRST100", str(e))
+        changed = []
+        for row in self._candidates(request):
+            if all(check(row) for check in checks):
+                row.update(data)
+                changed.append(row)
+        return JSONResponse(changed)
+
+
+def main() -> None:
+    import uvicorn
+
+    ap = argparse.ArgumentParser(description="PostgREST em memória (miniatures_master) para testes de carga")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=54321)
+    ap.add_argument("--latency-ms", type=float, default=10.0, help="Latência simulada por requisição")
+    ap.add_argument("--jitter-ms", type=float, default=2.0, help="Variação aleatória (±) da latência")
+    args = ap.parse_args()
+
+    stub = PostgRESTStub(args.latency_ms, args.jitter_ms)
+    print(f"[INFO] PostgREST local em http://{args.host}:{args.port}/rest/v1/{TABLE} "
+          f"(latência {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms)")
+    uvicorn.run(stub.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
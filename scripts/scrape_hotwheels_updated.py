@@ -11,16 +11,19 @@ print(f"[INFO] {SCRIPT_SIGNATURE}")
 # -*- coding: utf-8 -*-
 
 import argparse
+import asyncio
 import os
-import re
 import sys
 import time
-from typing import Dict, List, Optional, Tuple
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
 import requests
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv, find_dotenv
 
+import fandom_parser
+from fandom_parser import DEFAULT_PARSER_BACKEND, PARSER_BACKENDS, title_from_url, url_for_title
+from natural_key import NATURAL_KEY_COLUMN, natural_key_hash
+
 SCRIPT_SIGNATURE = "diecastbr-scraper v1.4"
 
 # ============== ENV ==============
@@ -34,8 +37,6 @@ else:
     load_dotenv(find_dotenv(usecwd=True), override=True)
 
 # ============== CONFIG ==============
-BASE_WIKI_URL = "https://hotwheels.fandom.com"
-
 ALLOWED_FIELDS = {
     "model_name",
     "brand",
@@ -69,6 +70,25 @@ HEADERS = {
 SESSION = requests.Session()
 SESSION.headers.update(HEADERS)
 
+# Acervo local de páginas (page_store.PageStore), ativado com --store
+PAGE_STORE = None
+
+# Backend de parsing (fandom_parser.PARSER_BACKENDS), escolhido com --parser
+PARSER_BACKEND = DEFAULT_PARSER_BACKEND
+
+# Buffer de upserts em lote (write_buffer.UpsertBuffer), ativo fora do --dry-run
+WRITE_BUFFER = None
+
+# Estado do crawl (crawl_state.CrawlState), ativado com --state/--resume
+CRAWL_STATE = None
+DEFAULT_STATE_FILE = ".crawl_state.sqlite3"
+
+# Cliente do api.php (mediawiki_api.MediaWikiAPI), ativo com --source api
+WIKI_API = None
+
+# Snapshot das linhas já gravadas (delta_sync.DeltaSnapshot), ativado com --delta
+DELTA = None
+
 def human_err(msg: str) -> None:
     print(f"\n[ERRO] {msg}\n", file=sys.stderr)
 
@@ -76,15 +96,39 @@ def info(msg: str) -> None:
     print(f"[INFO] {msg}")
 
 # ============== FETCH (com fallback cloudscraper) ==============
-def fetch_html(url: str, retries: int = 2, backoff: float = 1.5) -> Optional[str]:
+def fetch_html(url: str, retries: int = 2, backoff: float = 1.5, kind: str = "model") -> Optional[str]:
     """Tenta baixar HTML com requests; em 403 usa cloudscraper como fallback."""
+    html, _ = fetch_page(url, retries=retries, backoff=backoff, kind=kind)
+    return html
+
+def fetch_page(url: str, retries: int = 2, backoff: float = 1.5, kind: str = "model") -> Tuple[Optional[str], bool]:
+    """Como fetch_html, mas retorna (html, mudou).
+
+    Com PAGE_STORE ativo, revalida com GET condicional: um 304 devolve a cópia
+    guardada; páginas baixadas são gravadas no acervo. Em ambos os casos,
+    mudou=False só se as linhas desse conteúdo já foram gravadas no banco.
+    """
+    store = PAGE_STORE
+    conditional = store.conditional_headers(url) if store else {}
     last_err = None
     # tenta requests algumas vezes
     for i in range(retries):
         try:
-            resp = SESSION.get(url, timeout=30, allow_redirects=True)
+            resp = SESSION.get(url, timeout=30, allow_redirects=True, headers=conditional)
+            if resp.status_code == 304 and store:
+                store.mark_fresh(url)
+                return store.read(url), not store.is_written(url)
             if resp.status_code == 200 and resp.text:
-                return resp.text
+                changed = True
+                if store:
+                    changed = store.write(
+                        url,
+                        resp.text,
+                        etag=resp.headers.get("ETag"),
+                        last_modified=resp.headers.get("Last-Modified"),
+                        kind=kind,
+                    )
+                return resp.text, changed
             if resp.status_code == 403:
                 last_err = f"403 (tentativa {i+1})"
                 break  # 403 -> vai para fallback imediatamente
@@ -94,6 +138,16 @@ def fetch_html(url: str, retries: int = 2, backoff: float = 1.5) -> Optional[str
         time.sleep(backoff)
 
     # fallback: cloudscraper (precisa estar instalado)
+    html, last_err = fetch_with_cloudscraper(url)
+    if html:
+        changed = store.write(url, html, kind=kind) if store else True
+        return html, changed
+
+    human_err(f"Falha ao acessar {url}: {last_err}")
+    return None, False
+
+def fetch_with_cloudscraper(url: str) -> Tuple[Optional[str], Optional[str]]:
+    """Fallback para 403 do Cloudflare. Retorna (html, erro)."""
     try:
         import cloudscraper  # type: ignore
         scraper = cloudscraper.create_scraper(
@@ -102,117 +156,39 @@ def fetch_html(url: str, retries: int = 2, backoff: float = 1.5) -> Optional[str
         scraper.headers.update(HEADERS)
         resp = scraper.get(url, timeout=30)
         if resp.status_code == 200 and resp.text:
-            return resp.text
-        last_err = f"fallback cloudscraper HTTP {resp.status_code}"
+            return resp.text, None
+        return None, f"fallback cloudscraper HTTP {resp.status_code}"
     except Exception as e:
-        last_err = f"fallback cloudscraper falhou: {e}"
-
-    human_err(f"Falha ao acessar {url}: {last_err}")
-    return None
+        return None, f"fallback cloudscraper falhou: {e}"
 
 # ============== SCRAPER ==============
 def get_model_urls_from_list_page(list_page_url: str) -> List[str]:
-    urls: List[str] = []
-    html = fetch_html(list_page_url)
+    html = fetch_html(list_page_url, kind="list")
     if not html:
-        return urls
+        return []
+    return parse_list_page(html)
 
-    soup = BeautifulSoup(html, "html.parser")
-    table = soup.find("table", class_="wikitable")
-    if not table:
-        return urls
 
-    rows = table.find_all("tr")
-    for row in rows[1:]:
-        cols = row.find_all(["td", "th"])
-        if len(cols) > 2:
-            a = cols[2].find("a", href=True)
-            if a and a["href"].startswith("/wiki/"):
-                urls.append(f"{BASE_WIKI_URL}{a['href']}")
-    return urls
+def parse_list_page(html: str) -> List[str]:
+    return fandom_parser.parse_list_page(html, backend=PARSER_BACKEND)
 
 
-def scrape_hotwheels_model(url: str) -> List[Dict]:
-    html = fetch_html(url)
+def scrape_hotwheels_model(url: str, skip_unchanged: bool = False) -> List[Dict]:
+    html, changed = fetch_page(url)
     if not html:
+        if CRAWL_STATE:
+            CRAWL_STATE.mark_failed(url, "falha no download")
         return []
-
-    soup = BeautifulSoup(html, "html.parser")
-
-    # Nome do modelo
-    model_name = None
-    h1 = soup.find("h1", class_="page-header__title")
-    if h1:
-        model_name = h1.text.strip()
-
-    # Imagem principal
-    image_url = None
-    fig = soup.find("figure", class_="pi-image-thumbnail")
-    if fig and fig.find("img"):
-        image_url = fig.find("img").get("src", None)
-
-    table = soup.find("table", class_="wikitable")
-    if not table:
+    if CRAWL_STATE:
+        CRAWL_STATE.mark_fetched(url, html)
+    if skip_unchanged and not changed:
+        info(f"Sem alterações desde a última coleta: {url}")
         return []
+    return parse_model_page(html)
 
-    rows = table.find_all("tr")
-    if not rows:
-        return []
 
-    headers = [th.text.strip() for th in rows[0].find_all("th")]
-
-    header_to_column_map = {
-        "Collection Number": "collection_number",
-        "Year": "launch_year",
-        "Series": "series",
-        "Color": "base_color",
-        "Details": "variants",
-        "Base Code": "product_code",
-        # "Country": "country_of_manufacture",  # NÃO EXISTE NO SEU SCHEMA
-        "Collector Number": "collector_number",
-    }
-
-    out: List[Dict] = []
-    for row in rows[1:]:
-        cols = row.find_all(["td", "th"])
-        current = {
-            "model_name": model_name,
-            "brand": "Hot Wheels",
-            "image_url": image_url,
-            "is_treasure_hunt": False,
-            "is_super_treasure_hunt": False,
-        }
-
-        for i, header in enumerate(headers):
-            key = header_to_column_map.get(header)
-            if not key or i >= len(cols):
-                continue
-            value = cols[i].text.strip()
-            if key == "launch_year":
-                try:
-                    current[key] = int(value)
-                except Exception:
-                    current[key] = None
-            else:
-                current[key] = value or None
-
-        # Deduz collector_number de collection_number (x/y)
-        if current.get("collection_number") and not current.get("collector_number"):
-            m = re.search(r"(\d+)\s*/\s*\d+", str(current["collection_number"]))
-            if m:
-                current["collector_number"] = m.group(1)
-
-        # TH / STH
-        series_text = (current.get("series") or "").lower()
-        variants_text = (current.get("variants") or "").lower()
-        if "super treasure hunt" in series_text or "super treasure hunt" in variants_text:
-            current["is_super_treasure_hunt"] = True
-        elif "treasure hunt" in series_text or "treasure hunt" in variants_text:
-            current["is_treasure_hunt"] = True
-
-        out.append(current)
-
-    return out
+def parse_model_page(html: str) -> List[Dict]:
+    return fandom_parser.parse_model_page(html, backend=PARSER_BACKEND)
 
 # ============== SUPABASE ==============
 def create_supabase_client(url: str, key: str):
@@ -241,9 +217,18 @@ def resolve_supabase_credentials(arg_url: Optional[str], arg_key: Optional[str])
         )
     return url, key
 
+# Coluna gerada com a chave natural canônica (índice único; ver natural_key.py)
+CONFLICT_COLUMNS = NATURAL_KEY_COLUMN
+
+def clean_miniature(data: Dict) -> Dict:
+    return {k: v for k, v in data.items() if v is not None and k in ALLOWED_FIELDS}
+
+def miniature_key(data: Dict) -> str:
+    return natural_key_hash(data)
+
 def upsert_miniature(supabase, data: Dict, dry_run: bool = False) -> Optional[str]:
-    clean = {k: v for k, v in data.items() if v is not None and k in ALLOWED_FIELDS}
-    conflict_cols = "model_name,launch_year,series"
+    clean = clean_miniature(data)
+    conflict_cols = CONFLICT_COLUMNS
 
     if dry_run:
         info(f"[DRY-RUN] UPSERT -> {clean.get('model_name')}")
@@ -256,11 +241,7 @@ def upsert_miniature(supabase, data: Dict, dry_run: bool = False) -> Optional[st
         return None
     except Exception:
         # fallback manual
-        q = supabase.table("miniatures_master").select("id").eq("model_name", clean.get("model_name"))
-        if "launch_year" in clean:
-            q = q.eq("launch_year", clean["launch_year"])
-        if "series" in clean:
-            q = q.eq("series", clean["series"])
+        q = supabase.table("miniatures_master").select("id").eq(NATURAL_KEY_COLUMN, miniature_key(clean))
         existing = q.execute()
         if existing.data:
             return existing.data[0]["id"]
@@ -269,6 +250,242 @@ def upsert_miniature(supabase, data: Dict, dry_run: bool = False) -> Optional[st
             return ins.data[0].get("id")
         return None
 
+def upsert_miniatures_bulk(supabase, rows: List[Dict]) -> None:
+    """Um upsert para várias linhas (todas com as mesmas colunas)."""
+    supabase.table("miniatures_master").upsert(rows, on_conflict=CONFLICT_COLUMNS).execute()
+
+def create_write_buffer(supabase, batch_size: int, flush_ms: int):
+    from write_buffer import UpsertBuffer
+    return UpsertBuffer(
+        lambda rows: upsert_miniatures_bulk(supabase, rows),
+        lambda row: upsert_miniature(supabase, row) is not None,
+        miniature_key,
+        max_rows=batch_size,
+        max_delay_ms=flush_ms,
+        on_written=DELTA.record if DELTA else None,
+    )
+
+def process_versions(
+    supabase,
+    versions: List[Dict],
+    dry_run: bool = False,
+    url: Optional[str] = None,
+    store_url: Optional[str] = None,
+) -> int:
+    """Grava as versões de um modelo; retorna quantas deram certo.
+
+    Com WRITE_BUFFER ativo as linhas vão para o buffer e são contadas no flush
+    (WRITE_BUFFER.ok), não aqui. Com CRAWL_STATE e `url`, registra o progresso
+    da página (no modo buffer, ela só vira concluída depois do flush). Com
+    PAGE_STORE, marca a página do acervo (`store_url`, padrão `url`) como
+    gravada quando todas as linhas chegam ao banco. Com DELTA, linhas
+    idênticas à última gravação não são regravadas.
+    """
+    for v in versions:
+        print(f" - {v.get('brand')} — {v.get('model_name')} ({v.get('launch_year')}) | série: {v.get('series')}")
+
+    rows = [clean_miniature(v) for v in versions]
+    if DELTA is not None:
+        rows = DELTA.diff(rows).to_write
+
+    state = CRAWL_STATE if url and not dry_run else None
+    store_url = store_url or url
+    store = PAGE_STORE if store_url and not dry_run else None
+    if WRITE_BUFFER is not None and not dry_run and rows:
+        then = (lambda: state.mark_buffered(url)) if state else None
+
+        def settled(written: int, failed: int) -> None:
+            # só as linhas desta página decidem o resultado dela
+            if state:
+                state.settle_buffered(url, written, failed)
+            if store and not failed:
+                store.mark_written(store_url)
+
+        WRITE_BUFFER.add_many(rows, then=then, done=settled if state or store else None)
+        return 0
+
+    ok = 0
+    for row in rows:
+        mid = upsert_miniature(supabase, row, dry_run=dry_run)
+        if mid:
+            ok += 1
+            if DELTA is not None and not dry_run:
+                DELTA.record([row])
+    if state:
+        if ok == len(rows):
+            state.mark_written(url, ok)
+        else:
+            state.mark_failed(url, f"{len(rows) - ok} linha(s) não gravadas")
+    if store and ok == len(rows):
+        store.mark_written(store_url)
+    return ok
+
+# ============== PIPELINE (download -> parsing -> gravação) ==============
+async def crawled_pages(crawler, urls: List[str], args) -> AsyncIterator[Tuple[str, str]]:
+    """(url, html) das páginas baixadas que precisam ser processadas."""
+    async for url, html, changed in crawler.crawl(urls):
+        info(f"Raspado: {url}")
+        if not html:
+            if CRAWL_STATE:
+                CRAWL_STATE.mark_failed(url, "falha no download")
+            continue
+        if CRAWL_STATE:
+            CRAWL_STATE.mark_fetched(url, html)
+        if PAGE_STORE and not changed and not args.reprocess_unchanged:
+            info(f"Sem alterações desde a última coleta: {url}")
+            if CRAWL_STATE:
+                CRAWL_STATE.mark_written(url, 0)
+            continue
+        yield url, html
+
+async def stored_pages(store, urls: List[str]) -> AsyncIterator[Tuple[str, str]]:
+    """(url, html) lidos do acervo local, sem acessar a rede."""
+    for u in urls:
+        html = store.read(u)
+        if not html:
+            human_err(f"Página não está no acervo: {u}")
+            continue
+        info(f"Reprocessando: {u}")
+        yield u, html
+
+async def parsed_pages(pages: AsyncIterator[Tuple[str, str]], args) -> AsyncIterator[Tuple[str, List[Dict]]]:
+    """Parsing inline ou, com --parse-workers, num pool de processos com fila limitada."""
+    if args.parse_workers > 0:
+        from parse_pipeline import parse_in_processes
+        async for url, versions in parse_in_processes(
+            pages,
+            fandom_parser.parse_model_page,
+            workers=args.parse_workers,
+            queue_size=args.parse_queue or None,
+            parse_args=(PARSER_BACKEND,),
+        ):
+            yield url, versions
+    else:
+        async for url, html in pages:
+            yield url, parse_model_page(html)
+
+async def upsert_parsed(supabase, parsed: AsyncIterator[Tuple[str, List[Dict]]], dry_run: bool = False) -> Tuple[int, int]:
+    total_versions, ok = 0, 0
+    async for url, versions in parsed:
+        if isinstance(versions, Exception):
+            # parsing falhou (parse_pipeline): a página não foi gravada e volta no --resume
+            if CRAWL_STATE:
+                CRAWL_STATE.mark_failed(url, f"falha no parsing: {versions}")
+            continue
+        total_versions += len(versions)
+        # o cliente supabase é síncrono: grava em thread para os outros estágios seguirem
+        ok += await asyncio.to_thread(process_versions, supabase, versions, dry_run, url)
+    return total_versions, ok
+
+async def crawl_and_upsert(supabase, urls: List[str], args) -> Tuple[int, int]:
+    """Baixa as páginas em paralelo (limite por host) e grava conforme chegam."""
+    from hotwheels_crawler import AsyncCrawler
+
+    crawler = AsyncCrawler(
+        HEADERS,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        burst=args.burst,
+        fallback=fetch_with_cloudscraper,
+        store=PAGE_STORE,
+    )
+    async with crawler:
+        pages = crawled_pages(crawler, urls, args)
+        return await upsert_parsed(supabase, parsed_pages(pages, args), dry_run=args.dry_run)
+
+# ============== REPLAY (offline) ==============
+def replay_urls(store, args) -> List[str]:
+    """URLs a reprocessar a partir do acervo, sem acessar a rede."""
+    if args.url:
+        return [args.url]
+    if args.list_url:
+        html = store.read(args.list_url)
+        if not html:
+            human_err(f"Página de lista não está no acervo: {args.list_url}")
+            return []
+        return parse_list_page(html)
+    return store.urls("model")
+
+def replay_and_upsert(supabase, store, urls: List[str], dry_run: bool = False) -> Tuple[int, int]:
+    total_versions, ok = 0, 0
+    for u in urls:
+        html = store.read(u)
+        if not html:
+            human_err(f"Página não está no acervo: {u}")
+            continue
+        info(f"Reprocessando: {u}")
+        versions = parse_model_page(html)
+        total_versions += len(versions)
+        ok += process_versions(supabase, versions, dry_run=dry_run, url=u)
+    return total_versions, ok
+
+# ============== MEDIAWIKI API (api.php) ==============
+def create_wiki_api(args):
+    from mediawiki_api import MediaWikiAPI
+    return MediaWikiAPI(args.api_url, SESSION, delay=1.0 / args.rate if args.rate > 0 else 0.0)
+
+def discovery_key(args) -> str:
+    """Identifica a origem da lista de URLs (chave da lista no --state)."""
+    if args.list_url:
+        return args.list_url
+    if args.category:
+        return f"{args.api_url}?list=categorymembers&cmtitle=Category:{args.category}"
+    return f"{args.api_url}?list=allpages&apprefix={args.prefix or ''}"
+
+def discover_urls(args) -> List[str]:
+    if args.list_url:
+        return get_model_urls_from_list_page(args.list_url)
+    try:
+        if args.category:
+            titles = WIKI_API.category_members(args.category)
+        else:
+            titles = WIKI_API.all_pages(prefix=args.prefix)
+        return [url_for_title(t) for t in titles]
+    except Exception as e:
+        human_err(f"Falha na descoberta pelo api.php: {e}")
+        return []
+
+def raw_url(url: str) -> str:
+    """Chave do wikitext no acervo (a mesma URL que o MediaWiki usa para o wikitext cru)."""
+    return f"{url}?action=raw"
+
+def api_scrape_and_upsert(supabase, api, urls: List[str], args) -> Tuple[int, int]:
+    """Baixa o wikitext de até 50 páginas por requisição e grava as versões."""
+    by_title = {title_from_url(u): u for u in urls}
+    titles = list(by_title)
+
+    # Com --store, pergunta só os revids (prop=info) e baixa o conteúdo do que mudou
+    if PAGE_STORE and not args.reprocess_unchanged:
+        changed = []
+        for title, revid in api.latest_revisions(titles).items():
+            meta = PAGE_STORE.meta(raw_url(by_title[title]))
+            if (revid is not None and meta and meta["etag"] == f"rev:{revid}"
+                    and PAGE_STORE.is_written(raw_url(by_title[title]))):
+                info(f"Sem alterações desde a última coleta: {by_title[title]}")
+                if CRAWL_STATE:
+                    CRAWL_STATE.mark_written(by_title[title], 0)
+                continue
+            changed.append(title)
+        titles = changed
+
+    total_versions, ok = 0, 0
+    for title, page in api.fetch_pages(titles):
+        url = by_title[title]
+        info(f"Raspado (api.php): {url}")
+        if page is None or page.wikitext is None:
+            human_err(f"Página não encontrada no api.php: {title}")
+            if CRAWL_STATE:
+                CRAWL_STATE.mark_failed(url, "página não encontrada no api.php")
+            continue
+        if PAGE_STORE:
+            PAGE_STORE.write(raw_url(url), page.wikitext, etag=f"rev:{page.revid}", kind="wikitext")
+        if CRAWL_STATE:
+            CRAWL_STATE.mark_fetched(url, page.wikitext)
+        versions = fandom_parser.parse_model_wikitext(page.title, page.wikitext, page.image_url)
+        total_versions += len(versions)
+        ok += process_versions(supabase, versions, dry_run=args.dry_run, url=url, store_url=raw_url(url))
+    return total_versions, ok
+
 # ============== CLI/MAIN ==============
 def main():
     print(f"[INFO] {SCRIPT_SIGNATURE}")
@@ -276,16 +493,75 @@ def main():
     ap = argparse.ArgumentParser(description="Scraper Hot Wheels (Fandom) -> Supabase miniatures_master")
     ap.add_argument("--url", help="URL de uma página específica de modelo")
     ap.add_argument("--list-url", help="URL de uma página com tabela (wikitable) de múltiplos modelos")
+    ap.add_argument("--source", choices=("html", "api"), default="html",
+                    help="html = uma página HTML por modelo; api = api.php, até 50 páginas por requisição")
+    ap.add_argument("--api-url", default=f"{fandom_parser.BASE_WIKI_URL}/api.php", help="Endpoint do MediaWiki API (--source api)")
+    ap.add_argument("--category", help="Descobre os modelos de uma categoria pelo api.php (ex.: '2020 Hot Wheels')")
+    ap.add_argument("--all-pages", action="store_true", help="Descobre todas as páginas de conteúdo pelo api.php")
+    ap.add_argument("--prefix", help="Com --all-pages, só títulos com esse prefixo")
     ap.add_argument("--limit", type=int, default=0, help="Limite de modelos ao processar de uma lista")
     ap.add_argument("--dry-run", action="store_true", help="Não grava no banco (simulação)")
+    ap.add_argument("--concurrency", type=int, default=1,
+                    help="Downloads simultâneos (>1 ativa o crawler assíncrono)")
+    ap.add_argument("--rate", type=float, default=2.0,
+                    help="Orçamento de requisições por segundo por host (modo --concurrency)")
+    ap.add_argument("--burst", type=float, default=2.0,
+                    help="Rajada máxima do token bucket por host (modo --concurrency)")
+    ap.add_argument("--parse-workers", type=int, default=0,
+                    help="Processos de parsing (0 = parsing inline no mesmo processo)")
+    ap.add_argument("--parse-queue", type=int, default=0,
+                    help="Páginas aguardando parsing antes de pausar os downloads (padrão: 2x workers)")
+    ap.add_argument("--store", help="Diretório do acervo local de páginas (revalidação com GET condicional)")
+    ap.add_argument("--replay", action="store_true",
+                    help="Reprocessa as páginas do --store sem acessar a rede")
+    ap.add_argument("--reprocess-unchanged", action="store_true",
+                    help="Com --store, reprocessa também páginas que não mudaram (304)")
+    ap.add_argument("--parser", choices=PARSER_BACKENDS, default=DEFAULT_PARSER_BACKEND,
+                    help="Backend de parsing do HTML (lxml é mais rápido, mesma saída)")
+    ap.add_argument("--batch-size", type=int, default=200,
+                    help="Linhas por upsert em lote (1 = um upsert por linha)")
+    ap.add_argument("--flush-ms", type=int, default=2000,
+                    help="Tempo máximo (ms) que uma linha espera no buffer antes do upsert")
+    ap.add_argument("--state", help=f"Arquivo SQLite com o progresso do crawl (padrão com --resume: {DEFAULT_STATE_FILE})")
+    ap.add_argument("--resume", action="store_true",
+                    help="Retoma o crawl: reaproveita a lista descoberta e pula as páginas já gravadas")
+    ap.add_argument("--delta", help="Snapshot SQLite das linhas gravadas: só grava linhas novas ou alteradas")
+    ap.add_argument("--full-sync", action="store_true",
+                    help="Com --delta, regrava todas as linhas e atualiza o snapshot")
     ap.add_argument("--supabase-url", help="Override SUPABASE_URL")
     ap.add_argument("--supabase-key", help="Override SUPABASE_*_KEY")
     args = ap.parse_args()
 
-    if not args.url and not args.list_url:
-        human_err("Use --url ou --list-url.")
+    if args.replay and not args.store:
+        human_err("--replay exige --store.")
+        sys.exit(2)
+    if (args.category or args.all_pages) and args.source != "api":
+        human_err("--category/--all-pages exigem --source api.")
+        sys.exit(2)
+    if not args.url and not args.list_url and not args.category and not args.all_pages and not args.replay:
+        human_err("Use --url, --list-url, --category ou --all-pages.")
+        sys.exit(2)
+    if args.resume and args.replay:
+        human_err("--resume não se aplica a --replay.")
         sys.exit(2)
 
+    global PAGE_STORE, PARSER_BACKEND, WRITE_BUFFER, CRAWL_STATE, WIKI_API, DELTA
+    PARSER_BACKEND = args.parser
+    if args.source == "api":
+        WIKI_API = create_wiki_api(args)
+    if args.store and args.dry_run and not args.replay:
+        info("--dry-run: acervo de páginas não é usado nem gravado.")
+    elif args.store:
+        # no --replay com --dry-run o acervo só é lido (process_versions não marca gravação)
+        from page_store import PageStore
+        PAGE_STORE = PageStore(args.store)
+    if (args.state or args.resume) and not args.replay:
+        if args.dry_run:
+            info("--dry-run: progresso do crawl não é registrado.")
+        else:
+            from crawl_state import CrawlState
+            CRAWL_STATE = CrawlState(args.state or DEFAULT_STATE_FILE)
+
     try:
         supabase_url, supabase_key = resolve_supabase_credentials(args.supabase_url, args.supabase_key)
         supabase = create_supabase_client(supabase_url, supabase_key)
@@ -293,30 +569,86 @@ def main():
         human_err(f"Supabase: {e}")
         sys.exit(1)
 
-    if args.url:
+    if args.replay:
+        all_urls = replay_urls(PAGE_STORE, args)
+        if args.limit and args.limit > 0:
+            all_urls = all_urls[: args.limit]
+        info(f"{len(all_urls)} páginas no acervo para reprocessar.")
+    elif args.url:
         all_urls = [args.url]
     else:
-        info(f"Coletando URLs de: {args.list_url}")
-        all_urls = get_model_urls_from_list_page(args.list_url)
+        list_key = discovery_key(args)
+        all_urls = None
+        if CRAWL_STATE and args.resume:
+            all_urls = CRAWL_STATE.list_urls(list_key)
+            if all_urls is not None:
+                info(f"Lista retomada do estado ({CRAWL_STATE.path}): {list_key}")
+        if all_urls is None:
+            info(f"Coletando URLs de: {list_key}")
+            all_urls = discover_urls(args)
+            if CRAWL_STATE and all_urls:
+                CRAWL_STATE.add_urls(all_urls, list_url=list_key)
         if args.limit and args.limit > 0:
             all_urls = all_urls[: args.limit]
         info(f"{len(all_urls)} URLs encontradas.")
 
-    total_versions, ok = 0, 0
-    for u in all_urls:
-        info(f"Raspando: {u}")
-        versions = scrape_hotwheels_model(u)
-        total_versions += len(versions)
-        for v in versions:
-            print(f" - {v.get('brand')} — {v.get('model_name')} ({v.get('launch_year')}) | série: {v.get('series')}")
-            mid = upsert_miniature(supabase, v, dry_run=args.dry_run)
-            if mid:
-                ok += 1
-        time.sleep(1.0)
+    if CRAWL_STATE and args.resume:
+        frontier = CRAWL_STATE.frontier(all_urls)
+        info(f"Retomando: {len(all_urls) - len(frontier)} já concluídas, {len(frontier)} a processar.")
+        all_urls = frontier
+        # páginas fora do frontier não foram gravadas: reprocessa mesmo se o acervo disser 304
+        args.reprocess_unchanged = True
+    elif CRAWL_STATE and args.url:
+        CRAWL_STATE.add_urls(all_urls)
+
+    if args.delta:
+        from delta_sync import DeltaSnapshot
+        DELTA = DeltaSnapshot(args.delta, rewrite_all=args.full_sync)
+
+    if not args.dry_run and args.batch_size > 1:
+        WRITE_BUFFER = create_write_buffer(supabase, args.batch_size, args.flush_ms)
+
+    try:
+        total_versions, ok = run_scrape(supabase, all_urls, args)
+    finally:
+        if WRITE_BUFFER is not None:
+            WRITE_BUFFER.close()
+    if WRITE_BUFFER is not None:
+        ok += WRITE_BUFFER.ok
 
     print("\n--- Resumo ---")
     print(f"Modelos/versões processados: {total_versions}")
     print(f"{'Simulações' if args.dry_run else 'Inserções/Upserts'} OK: {ok}/{total_versions}")
+    if WRITE_BUFFER is not None:
+        print(f"Upserts em lote: {WRITE_BUFFER.batches} | linhas com falha: {WRITE_BUFFER.failed}")
+    if DELTA is not None:
+        print(f"Delta ({DELTA.path}): {DELTA.summary()}")
+    if WIKI_API is not None:
+        print(f"Requisições ao api.php: {WIKI_API.requests}")
+    if CRAWL_STATE:
+        counts = CRAWL_STATE.counts(all_urls)
+        print("Estado do crawl: " + " | ".join(f"{k}: {v}" for k, v in counts.items() if v))
+
+def run_scrape(supabase, all_urls: List[str], args) -> Tuple[int, int]:
+    """Escolhe o modo (replay, pipeline assíncrono ou serial); retorna (versões, ok)."""
+    total_versions, ok = 0, 0
+    if args.replay and args.parse_workers > 0:
+        pages = stored_pages(PAGE_STORE, all_urls)
+        total_versions, ok = asyncio.run(upsert_parsed(supabase, parsed_pages(pages, args), dry_run=args.dry_run))
+    elif args.replay:
+        total_versions, ok = replay_and_upsert(supabase, PAGE_STORE, all_urls, dry_run=args.dry_run)
+    elif args.source == "api":
+        total_versions, ok = api_scrape_and_upsert(supabase, WIKI_API, all_urls, args)
+    elif args.concurrency > 1 or args.parse_workers > 0:
+        total_versions, ok = asyncio.run(crawl_and_upsert(supabase, all_urls, args))
+    else:
+        for u in all_urls:
+            info(f"Raspando: {u}")
+            versions = scrape_hotwheels_model(u, skip_unchanged=bool(PAGE_STORE) and not args.reprocess_unchanged)
+            total_versions += len(versions)
+            ok += process_versions(supabase, versions, dry_run=args.dry_run, url=u)
+            time.sleep(1.0)
+    return total_versions, ok
 
 if __name__ == "__main__":
     try:
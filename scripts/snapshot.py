@@ -0,0 +1,326 @@
+"""Snapshot colunar do catálogo: exporta o Supabase para um arquivo local e restaura.
+
+    python snapshot.py export catalogo.dcsnap [--with-user-miniatures]
+    python snapshot.py info catalogo.dcsnap
+    python snapshot.py load catalogo.dcsnap [--skip-existing] [--dry-run]
+
+O export lê as tabelas em páginas keyset (created_at, id) — sem OFFSET e sem
+carregar tudo em memória — e grava grupos de linhas em formato colunar dentro
+de um único arquivo gzip:
+
+    MAGIC | bloco | bloco | ... | bloco "end"
+    bloco = tamanho do cabeçalho (uint32) + cabeçalho JSON + colunas
+
+Cada coluna de um grupo é uma lista JSON, exceto `brand` e `series`, gravadas
+com dicionário (valores distintos no cabeçalho + índices uint16/uint32). Valores
+repetidos ficam lado a lado, o que o gzip comprime muito melhor que linhas.
+
+Para análises offline, índices e fixtures de benchmark, `iter_rows` e
+`iter_columns` leem o arquivo sem precisar do banco.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from catalog_db import encode_cursor, keyset_after
+
+MAGIC = b'DCSNAP\x01\n'
+DEFAULT_TABLES = ('miniatures_master',)
+# Ordem de restauração: user_miniatures referencia miniatures_master
+TABLE_ORDER = ('miniatures_master', 'user_miniatures')
+DICTIONARY_COLUMNS = ('brand', 'series')
+# Colunas calculadas pelo banco: exportadas para consulta, nunca regravadas
+GENERATED_COLUMNS = ('natural_key',)
+PAGE_SIZE = 1000
+ROW_GROUP_SIZE = 10_000
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+# ---------- escrita ----------
+def _encode_dictionary(values: List[Any]) -> Tuple[Dict[str, Any], bytes]:
+    dictionary: Dict[Any, int] = {}
+    codes = [dictionary.setdefault(v, len(dictionary)) for v in values]
+    width = 'H' if len(dictionary) <= 0xFFFF else 'I'
+    data = array(width, codes)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    payload = data.tobytes()
+    return {'encoding': 'dict', 'dictionary': list(dictionary), 'width': width, 'size': len(payload)}, payload
+
+
+def _encode_plain(values: List[Any]) -> Tuple[Dict[str, Any], bytes]:
+    payload = json.dumps(values, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+    return {'encoding': 'json', 'size': len(payload)}, payload
+
+
+def _write_block(f: BinaryIO, header: Dict[str, Any], payloads: List[bytes] = ()) -> None:
+    raw = json.dumps(header, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+    f.write(struct.pack('<I', len(raw)))
+    f.write(raw)
+    for payload in payloads:
+        f.write(payload)
+
+
+class SnapshotWriter:
+    """Grava grupos de linhas de uma ou mais tabelas em um arquivo .dcsnap."""
+
+    def __init__(self, path: str, source: str = ''):
+        self.path = path
+        self.source = source
+        self.counts: Dict[str, int] = {}
+        self._tmp = f'{path}.tmp'
+        self._f = gzip.open(self._tmp, 'wb', compresslevel=6)
+        self._f.write(MAGIC)
+
+    def write_rows(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        columns: Dict[str, None] = {}
+        for row in rows:
+            columns.update(dict.fromkeys(row))
+        specs, payloads = [], []
+        for column in columns:
+            values = [row.get(column) for row in rows]
+            encode = _encode_dictionary if column in DICTIONARY_COLUMNS else _encode_plain
+            spec, payload = encode(values)
+            specs.append({'name': column, **spec})
+            payloads.append(payload)
+        _write_block(self._f, {'type': 'rows', 'table': table, 'count': len(rows), 'columns': specs}, payloads)
+        self.counts[table] = self.counts.get(table, 0) + len(rows)
+
+    def close(self) -> None:
+        _write_block(self._f, {
+            'type': 'end',
+            'tables': self.counts,
+            'source': self.source,
+            'exported_at': datetime.now(timezone.utc).isoformat(),
+        })
+        self._f.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self) -> None:
+        self._f.close()
+        if os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+
+# ---------- leitura ----------
+def _read_exact(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) != size:
+        raise SnapshotError('snapshot truncado')
+    return data
+
+
+def _blocks(path: str) -> Iterator[Tuple[Dict[str, Any], BinaryIO]]:
+    with gzip.open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise SnapshotError(f'{path} não é um snapshot do catálogo')
+        while True:
+            raw = f.read(4)
+            if len(raw) != 4:
+                raise SnapshotError('snapshot sem bloco final (export interrompido?)')
+            (size,) = struct.unpack('<I', raw)
+            header = json.loads(_read_exact(f, size))
+            yield header, f
+            if header['type'] == 'end':
+                return
+
+
+def _decode_column(spec: Dict[str, Any], payload: bytes) -> List[Any]:
+    if spec['encoding'] == 'dict':
+        codes = array(spec['width'])
+        codes.frombytes(payload)
+        if sys.byteorder != 'little':
+            codes.byteswap()
+        dictionary = spec['dictionary']
+        return [dictionary[c] for c in codes]
+    return json.loads(payload)
+
+
+def iter_columns(path: str, tables: Optional[List[str]] = None) -> Iterator[Tuple[str, Dict[str, List[Any]]]]:
+    """Gera (tabela, {coluna: valores}) para cada grupo de linhas do snapshot."""
+    for header, f in _blocks(path):
+        if header['type'] != 'rows':
+            continue
+        wanted = tables is None or header['table'] in tables
+        columns = {}
+        for spec in header['columns']:
+            payload = _read_exact(f, spec['size'])
+            if wanted:
+                columns[spec['name']] = _decode_column(spec, payload)
+        if wanted:
+            yield header['table'], columns
+
+
+def iter_rows(path: str, tables: Optional[List[str]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Gera (tabela, linha) com as linhas na ordem em que foram exportadas."""
+    for table, columns in iter_columns(path, tables):
+        names = list(columns)
+        for values in zip(*(columns[n] for n in names)):
+            yield table, dict(zip(names, values))
+
+
+def snapshot_info(path: str) -> Dict[str, Any]:
+    """Metadados do bloco final (contagem por tabela, origem e data do export)."""
+    for header, f in _blocks(path):
+        if header['type'] == 'rows':
+            for spec in header['columns']:
+                _read_exact(f, spec['size'])
+        elif header['type'] == 'end':
+            return header
+    raise SnapshotError('snapshot sem bloco final')
+
+
+# ---------- Supabase ----------
+def create_supabase():
+    from dotenv import load_dotenv
+    from supabase import create_client
+
+    load_dotenv()
+    url = os.getenv('SUPABASE_URL')
+    # A chave de serviço ignora RLS (necessária para user_miniatures)
+    key = os.getenv('SUPABASE_SERVICE_KEY') or os.getenv('SUPABASE_KEY')
+    if not url or not key:
+        print('Erro: Variáveis de ambiente do Supabase não encontradas')
+        sys.exit(1)
+    if not os.getenv('SUPABASE_SERVICE_KEY'):
+        print('Aviso: SUPABASE_SERVICE_KEY não definida; usando a chave anônima (sujeita às políticas RLS)')
+    return create_client(url, key)
+
+
+def export_table(supabase, writer: SnapshotWriter, table: str, page_size: int = PAGE_SIZE,
+                 row_group_size: int = ROW_GROUP_SIZE) -> int:
+    group: List[Dict[str, Any]] = []
+    cursor = None
+    total = 0
+    while True:
+        result = keyset_after(supabase.table(table).select('*'), cursor).limit(page_size).execute()
+        rows = result.data or []
+        group.extend(rows)
+        total += len(rows)
+        if len(group) >= row_group_size:
+            writer.write_rows(table, group)
+            group = []
+        if len(rows) < page_size:
+            break
+        cursor = encode_cursor(rows[-1])
+    writer.write_rows(table, group)
+    return total
+
+
+def export_snapshot(supabase, path: str, tables=DEFAULT_TABLES, page_size: int = PAGE_SIZE,
+                    row_group_size: int = ROW_GROUP_SIZE) -> Dict[str, int]:
+    source = str(getattr(supabase, 'supabase_url', '') or '')
+    writer = SnapshotWriter(path, source=source)
+    try:
+        for table in tables:
+            started = time.perf_counter()
+            total = export_table(supabase, writer, table, page_size, row_group_size)
+            print(f'[INFO] {table}: {total} linhas em {time.perf_counter() - started:.1f}s')
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+    return writer.counts
+
+
+def load_snapshot(supabase, path: str, tables: Optional[List[str]] = None, batch_size: int = 500,
+                  skip_existing: bool = False, dry_run: bool = False) -> Dict[str, Tuple[int, int]]:
+    """Restaura as tabelas com upserts em lote por `id`; retorna {tabela: (ok, falhas)}."""
+    from write_buffer import UpsertBuffer
+
+    available = list(snapshot_info(path)['tables'])
+    selected = [t for t in TABLE_ORDER if t in available and (tables is None or t in tables)]
+    selected += [t for t in available if t not in selected and (tables is None or t in tables)]
+
+    results: Dict[str, Tuple[int, int]] = {}
+    for table in selected:
+        def write_batch(rows, table=table):
+            supabase.table(table).upsert(rows, on_conflict='id', ignore_duplicates=skip_existing).execute()
+
+        def write_one(row, table=table):
+            try:
+                write_batch([row])
+                return True
+            except Exception as e:
+                print(f"❌ {table} {row.get('id')}: {e}")
+                return False
+
+        started = time.perf_counter()
+        if dry_run:
+            count = sum(len(next(iter(cols.values()), [])) for _, cols in iter_columns(path, [table]))
+            print(f'[DRY-RUN] {table}: {count} linhas seriam restauradas')
+            results[table] = (count, 0)
+            continue
+        with UpsertBuffer(write_batch, write_one, lambda row: row['id'],
+                          max_rows=batch_size, max_delay_ms=0) as buffer:
+            for _, columns in iter_columns(path, [table]):
+                for column in GENERATED_COLUMNS:
+                    columns.pop(column, None)
+                names = list(columns)
+                buffer.add_many([dict(zip(names, values)) for values in zip(*(columns[n] for n in names))])
+        results[table] = (buffer.ok, buffer.failed)
+        print(f'[INFO] {table}: {buffer.ok} linhas restauradas, {buffer.failed} com falha '
+              f'({buffer.batches} lotes, {time.perf_counter() - started:.1f}s)')
+    return results
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description='Snapshot colunar do catálogo (export/load)')
+    sub = ap.add_subparsers(dest='command', required=True)
+
+    exp = sub.add_parser('export', help='Exporta o banco para um arquivo .dcsnap')
+    exp.add_argument('path')
+    exp.add_argument('--with-user-miniatures', action='store_true', help='Inclui user_miniatures')
+    exp.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    exp.add_argument('--row-group-size', type=int, default=ROW_GROUP_SIZE)
+
+    info = sub.add_parser('info', help='Mostra o conteúdo de um snapshot')
+    info.add_argument('path')
+
+    load = sub.add_parser('load', help='Restaura um snapshot no banco')
+    load.add_argument('path')
+    load.add_argument('--table', action='append', help='Restaura só esta tabela (pode repetir)')
+    load.add_argument('--batch-size', type=int, default=500)
+    load.add_argument('--skip-existing', action='store_true', help='Não sobrescreve linhas com o mesmo id')
+    load.add_argument('--dry-run', action='store_true')
+
+    args = ap.parse_args(argv)
+
+    if args.command == 'info':
+        meta = snapshot_info(args.path)
+        print(f"Snapshot: {args.path} ({os.path.getsize(args.path) / 1024:.1f} KiB)")
+        print(f"Origem: {meta.get('source') or '-'} | exportado em {meta.get('exported_at')}")
+        for table, count in meta['tables'].items():
+            print(f'- {table}: {count} linhas')
+        return
+
+    supabase = create_supabase()
+    if args.command == 'export':
+        tables = DEFAULT_TABLES + (('user_miniatures',) if args.with_user_miniatures else ())
+        started = time.perf_counter()
+        counts = export_snapshot(supabase, args.path, tables, args.page_size, args.row_group_size)
+        print(f'Snapshot salvo em {args.path}: {sum(counts.values())} linhas, '
+              f'{os.path.getsize(args.path) / 1024:.1f} KiB em {time.perf_counter() - started:.1f}s')
+    else:
+        results = load_snapshot(supabase, args.path, args.table, args.batch_size,
+                                args.skip_existing, args.dry_run)
+        failed = sum(f for _, f in results.values())
+        if failed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
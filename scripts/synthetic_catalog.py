@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Catálogo sintético e determinístico de miniaturas, para testes de escala.
+
+Mesma semente -> mesmas linhas, em qualquer máquina. A distribuição imita a do
+catálogo real:
+
+- marcas com peso desigual (Hot Wheels domina) e séries em cauda longa (Zipf);
+- cada molde (casting) sai em várias versões: anos, séries e cores diferentes;
+- parte das linhas sem série (NULL), ~2% Treasure Hunt e ~0,5% Super TH;
+- `duplicate_ratio` das linhas repete a chave natural de uma linha recente
+  (mesma miniatura vista de novo, às vezes com outra cor), como quando o
+  scraper e as importações trazem o mesmo item.
+
+Uso:
+    python synthetic_catalog.py --rows 100000 --out catalog_100k.ndjson.gz
+    python synthetic_catalog.py --rows 1000000 --seed 7 --stats
+"""
+
+import argparse
+import gzip
+import itertools
+import json
+import random
+import sys
+from collections import Counter, deque
+from typing import Dict, Iterator, List, Optional
+
+from natural_key import natural_key_hash
+
+BRANDS = (
+    ("Hot Wheels", 55),
+    ("Matchbox", 20),
+    ("Majorette", 8),
+    ("Maisto", 7),
+    ("Greenlight", 5),
+    ("Johnny Lightning", 3),
+    ("Tomica", 2),
+)
+
+SERIES = (
+    "Mainline", "HW Flames", "HW Exotics", "HW Dream Garage", "Muscle Mania", "Nightburnerz",
+    "HW Race Day", "Factory Fresh", "HW Speed Graphics", "Rod Squad", "HW J-Imports", "Retro Racers",
+    "Batman", "Car Culture", "Boulevard", "Fast & Furious", "HW Art Cars", "Then and Now",
+    "Tooned", "Experimotors", "HW Hot Trucks", "Baja Blazers", "Track Stars", "HW Green Speed",
+    "Mud Studs", "HW Turbo", "Street Beasts", "HW Metro", "Legends Tour", "Moving Parts",
+    "Super Chromes", "Zamac", "Convoy", "Pop Culture", "Premium", "Team Transport",
+)
+
+MAKES = (
+    "Nissan", "Toyota", "Honda", "Mazda", "Ford", "Chevrolet", "Dodge", "Porsche", "Ferrari",
+    "Lamborghini", "BMW", "Mercedes-Benz", "Volkswagen", "Audi", "Subaru", "Mitsubishi",
+    "Jeep", "Plymouth", "Pontiac", "Buick", "Cadillac", "Lotus", "McLaren", "Aston Martin",
+)
+
+BODIES = (
+    "Skyline GT-R", "Supra", "Civic Type R", "RX-7", "Mustang", "Camaro", "Charger", "911 GT3",
+    "F40", "Countach", "M3", "300 SL", "Kombi", "Quattro", "Impreza WRX", "Lancer Evolution",
+    "Wrangler", "Barracuda", "GTO", "Riviera", "Eldorado", "Esprit", "720S", "DB5",
+    "Bel Air", "Fairlane", "Corvette", "Beetle", "Golf GTI", "Land Cruiser", "Hilux", "Bronco",
+)
+
+COLORS = (
+    "Red", "Blue", "Black", "White", "Yellow", "Green", "Orange", "Silver", "Gold", "Purple",
+    "Pink", "Gray", "Spectraflame Red", "Spectraflame Blue", "Zamac", "Teal",
+)
+
+FIRST_YEAR = 1968
+LAST_YEAR = 2025
+
+
+def _zipf_cum_weights(count: int, exponent: float = 1.1) -> List[float]:
+    return list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def casting_name(index: int) -> str:
+    """Nome único por índice: marca x carroceria, depois gerações (Mk 2, Mk 3...)."""
+    make = MAKES[index % len(MAKES)]
+    body = BODIES[(index // len(MAKES)) % len(BODIES)]
+    generation = index // (len(MAKES) * len(BODIES))
+    return f"{make} {body}" + (f" Mk {generation + 1}" if generation else "")
+
+
+def generate_catalog(
+    rows: int,
+    seed: int = 42,
+    duplicate_ratio: float = 0.03,
+    null_series_ratio: float = 0.08,
+    max_versions: int = 12,
+) -> Iterator[Dict]:
+    """Gera `rows` miniaturas no formato de miniatures_master (sem id/created_at)."""
+    rng = random.Random(seed)
+    brand_names = [b for b, _ in BRANDS]
+    brand_weights = list(itertools.accumulate(w for _, w in BRANDS))
+    series_weights = _zipf_cum_weights(len(SERIES))
+    recent: deque = deque(maxlen=5000)
+    castings = itertools.count()
+    produced = 0
+
+    while produced < rows:
+        casting = next(castings)
+        model_name = casting_name(casting)
+        brand = rng.choices(brand_names, cum_weights=brand_weights)[0]
+        first_year = rng.randint(FIRST_YEAR, LAST_YEAR)
+        # Geométrica: a maioria dos moldes tem poucas versões, alguns têm muitas
+        versions = 1
+        while versions < max_versions and rng.random() < 0.7:
+            versions += 1
+
+        for version in range(versions):
+            if produced >= rows:
+                break
+            if recent and rng.random() < duplicate_ratio:
+                row = dict(rng.choice(recent))
+                if rng.random() < 0.5:
+                    row["base_color"] = rng.choice(COLORS)
+            else:
+                year = min(LAST_YEAR, first_year + version // 2)
+                series = None
+                if rng.random() >= null_series_ratio:
+                    series = f"{rng.choices(SERIES, cum_weights=series_weights)[0]} {year}"
+                number = rng.randint(1, 250)
+                th = rng.random()
+                row = {
+                    "model_name": model_name,
+                    "brand": brand,
+                    "launch_year": year,
+                    "series": series,
+                    "base_color": rng.choice(COLORS),
+                    "collection_number": f"{number}/250",
+                    "product_code": f"{chr(65 + casting % 26)}{chr(65 + number % 26)}{(casting * 31 + version) % 1000:03d}",
+                    "is_treasure_hunt": th < 0.025,
+                    "is_super_treasure_hunt": th < 0.005,
+                }
+                recent.append(row)
+            produced += 1
+            yield row
+
+
+def to_fast_wheels_car(row: Dict) -> Dict:
+    """Mesma miniatura no formato da Fast Wheels API (entrada de import_fast_wheels.normalize_car)."""
+    return {
+        "name": row["model_name"],
+        "manufacturer": row["brand"],
+        "color": row.get("base_color") or "",
+        "year": row["launch_year"],
+        "series": row.get("series") or "",
+        "number": row.get("collection_number") or "",
+        "upc": row.get("product_code") or "",
+    }
+
+
+def catalog_stats(rows: Iterator[Dict]) -> Dict:
+    total, null_series, th = 0, 0, 0
+    keys = set()
+    brands: Counter = Counter()
+    series: Counter = Counter()
+    for row in rows:
+        total += 1
+        keys.add(natural_key_hash(row))
+        brands[row["brand"]] += 1
+        if row["series"] is None:
+            null_series += 1
+        else:
+            series[row["series"].rsplit(" ", 1)[0]] += 1
+        th += row["is_treasure_hunt"]
+    return {
+        "rows": total,
+        "unique_keys": len(keys),
+        "null_series": null_series,
+        "treasure_hunts": th,
+        "brands": dict(brands.most_common()),
+        "top_series": dict(series.most_common(5)),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Gera um catálogo sintético determinístico (NDJSON)")
+    ap.add_argument("--rows", type=int, default=10000)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--duplicate-ratio", type=float, default=0.03, help="Fração de linhas com chave repetida")
+    ap.add_argument("--null-series-ratio", type=float, default=0.08, help="Fração de linhas sem série")
+    ap.add_argument("--out", help="Arquivo NDJSON (.gz comprime); sem ele, só as estatísticas")
+    ap.add_argument("--stats", action="store_true", help="Mostra a distribuição gerada")
+    args = ap.parse_args(argv)
+
+    def rows():
+        return generate_catalog(args.rows, args.seed, args.duplicate_ratio, args.null_series_ratio)
+
+    if args.out:
+        opener = gzip.open if args.out.endswith(".gz") else open
+        with opener(args.out, "wt", encoding="utf-8") as f:
+            for row in rows():
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        print(f"[INFO] {args.rows} linhas gravadas em {args.out}")
+    if args.stats or not args.out:
+        stats = catalog_stats(rows())
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
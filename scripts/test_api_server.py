@@ -0,0 +1,357 @@
+"""Testes da api_server contra o PostgREST em memória (postgrest_stub.py).
+
+Rodam sem Supabase e sem rede:
+
+    python -m pytest test_api_server.py -q
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import tempfile
+
+import httpx
+
+os.environ.setdefault("SUPABASE_URL", "http://postgrest.stub")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "stub")
+os.environ["JOBS_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "jobs.sqlite3")
+os.environ["LOOKUP_SEED_FILE"] = ""
+
+import api_server  # noqa: E402
+from catalog_db import CatalogDB  # noqa: E402
+from postgrest_stub import PostgRESTStub  # noqa: E402
+
+
+@contextlib.asynccontextmanager
+async def api_client(stub: PostgRESTStub):
+    """api_server no mesmo processo, com o CatalogDB apontado para o stub."""
+    transport = httpx.ASGITransport(app=stub.app)
+
+    class StubCatalogDB(CatalogDB):
+        def __init__(self, *a, **kw):
+            super().__init__(*a, transport=transport, **kw)
+
+    original = api_server.CatalogDB
+    api_server.CatalogDB = StubCatalogDB
+    try:
+        async with api_server.lifespan(api_server.app):
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=api_server.app),
+                base_url="http://api",
+                auth=(api_server.API_USERNAME, api_server.API_PASSWORD),
+            ) as client:
+                yield client
+    finally:
+        api_server.CatalogDB = original
+
+
+def miniature(n: int, **extra) -> dict:
+    return {"model_name": f"Teste {n:03d}", "brand": "Hot Wheels", "launch_year": 2024,
+            "series": "HW Test", **extra}
+
+
+def test_batch_with_poisoned_row_fails_only_that_row():
+    stub = PostgRESTStub()
+    rows = [miniature(n) for n in range(10)]
+    rows[4]["base_color"] = "Red\u0000"  # o Postgres rejeita \u0000 em text
+    # Mesmas colunas em todas as linhas: um único upsert para o bloco
+    for row in rows:
+        row.setdefault("base_color", "Blue")
+
+    async def run():
+        async with api_client(stub) as client:
+            response = await client.post("/miniatures/batch", json=rows)
+            assert response.status_code == 200
+            return response.json()
+
+    result = asyncio.run(run())
+    assert result["successful"] == 9
+    assert result["failed"] == 1
+    assert result["details"][4]["success"] is False
+    assert result["details"][4]["message"].startswith("Erro:")
+    assert all(d["success"] for i, d in enumerate(result["details"]) if i != 4)
+    assert len(stub.table.rows) == 9
+
+
+def test_batch_with_mixed_columns_is_one_upsert_per_chunk():
+    stub = PostgRESTStub()
+    rows = [miniature(n) for n in range(30)]
+    for n, row in enumerate(rows):
+        if n % 3 == 0:
+            row["base_color"] = "Red"
+        if n % 5 == 0:
+            row["visibility"] = "private"
+        if n % 7 == 0:
+            row.pop("series")
+
+    async def run():
+        async with api_client(stub) as client:
+            stub.requests.clear()
+            response = await client.post("/miniatures/batch", json=rows)
+            return response.json()
+
+    result = asyncio.run(run())
+    assert result["successful"] == 30
+    assert stub.requests["upsert"] == 1
+    by_name = {row["model_name"]: row for row in stub.table.rows}
+    # Campo omitido fica com o DEFAULT do banco, não NULL
+    assert by_name["Teste 001"]["visibility"] == "public"
+    assert by_name["Teste 005"]["visibility"] == "private"
+    assert by_name["Teste 003"]["base_color"] == "Red"
+    assert by_name["Teste 007"].get("series") is None
+
+
+def test_concurrent_posts_with_one_invalid_only_fail_that_post():
+    # Latência no banco: as requisições chegam enquanto o primeiro commit está em voo e se agrupam
+    stub = PostgRESTStub(latency_ms=20)
+    rows = [miniature(n, base_color="Blue") for n in range(8)]
+    rows[5]["base_color"] = "Blue\u0000"
+    # Outro conjunto de colunas no mesmo grupo (um upsert só, com columns= e missing=default)
+    rows[0].pop("base_color")
+
+    async def run():
+        async with api_client(stub) as client:
+            await client.post("/miniatures", json=miniature(100))  # abre o primeiro commit
+            first = asyncio.create_task(client.post("/miniatures", json=miniature(101)))
+            await asyncio.sleep(0.005)
+            responses = await asyncio.gather(*(client.post("/miniatures", json=row) for row in rows))
+            await first
+            return responses, api_server.app.state.insert_committer
+
+    responses, committer = asyncio.run(run())
+    assert committer.groups < committer.items  # houve agrupamento
+    assert responses[5].status_code == 500
+    for n, response in enumerate(responses):
+        if n == 5:
+            continue
+        assert response.status_code == 200
+        assert response.json()["success"] is True, (n, response.json())
+    assert len(stub.table.rows) == 2 + 7
+
+
+def test_lookup_index_build_retries_after_failure():
+    from catalog_lookup import CatalogLookupIndex
+
+    class FlakyIndex(CatalogLookupIndex):
+        attempts = 0
+
+        async def load_from_db(self, db, page_size=1000):
+            FlakyIndex.attempts += 1
+            if FlakyIndex.attempts < 3:
+                raise ConnectionError("banco fora do ar")
+            self.add({"id": "1", "model_name": "Bone Shaker", "product_code": "GTB71"})
+            return 1
+
+    original = api_server.LOOKUP_RETRY_SECONDS
+    api_server.LOOKUP_RETRY_SECONDS = 0.01
+    try:
+        lookup = FlakyIndex()
+        asyncio.run(api_server.build_lookup_index(None, lookup))
+    finally:
+        api_server.LOOKUP_RETRY_SECONDS = original
+    assert FlakyIndex.attempts == 3
+    assert lookup.ready
+    assert lookup.lookup("GTB71")["matches"]
+
+
+def test_replayed_job_chunk_reports_its_own_inserts_as_inserted():
+    stub = PostgRESTStub()
+    rows = [miniature(n) for n in range(4)]
+    chunk = [(n, api_server.miniature_key(row), row) for n, row in enumerate(rows)]
+
+    async def run():
+        async with api_client(stub) as client:
+            await client.post("/miniatures/batch", json=rows[:2])  # o bloco interrompido gravou 0 e 1
+            state = api_server.app.state
+            return await api_server.process_batch_chunk(state.db, state.lookup, chunk, {0, 1, 2, 3})
+
+    details = asyncio.run(run())
+    assert all(d["success"] for d in details.values()), details
+    ids = {row["model_name"]: row["id"] for row in stub.table.rows}
+    assert details[0]["id"] == ids["Teste 000"]
+    assert len(stub.table.rows) == 4
+
+
+def test_job_status_does_not_expose_the_owner():
+    stub = PostgRESTStub()
+
+    async def run():
+        async with api_client(stub) as client:
+            response = await client.post("/jobs/miniatures", json=[miniature(n) for n in range(3)])
+            job_url = response.json()["status_url"]
+            while True:
+                job = (await client.get(job_url)).json()
+                if job["status"] == "done":
+                    return job
+                await asyncio.sleep(0.01)
+
+    job = asyncio.run(run())
+    assert "owner" not in job
+    assert job["successful"] == 3
+
+
+@contextlib.contextmanager
+def patched(**values):
+    """Troca constantes do api_server durante o teste."""
+    original = {name: getattr(api_server, name) for name in values}
+    for name, value in values.items():
+        setattr(api_server, name, value)
+    try:
+        yield
+    finally:
+        for name, value in original.items():
+            setattr(api_server, name, value)
+
+
+def ndjson_body(text: str, piece: int = 7):
+    """Corpo enviado aos pedaços, cortando linhas no meio."""
+    data = text.encode("utf-8")
+
+    async def chunks():
+        for start in range(0, len(data), piece):
+            yield data[start:start + piece]
+
+    return chunks()
+
+
+def test_stream_reports_each_line_by_number():
+    stub = PostgRESTStub()
+    lines = [
+        '{"model_name": "Alfa", "brand": "Hot Wheels", "launch_year": 2024}',   # 1
+        '{"model_name": "Quebrada"',                                            # 2 JSON inválido
+        '',                                                                     # 3 vazia: pulada
+        '[1, 2]',                                                               # 4 não é objeto
+        '{"model_name": "' + "x" * 300 + '", "brand": "Hot Wheels"}',           # 5 grande demais
+        '{"model_name": "Beta", "brand": "Hot Wheels", "launch_year": 2024}',   # 6
+        '{"model_name": " ALFA ", "brand": "hot wheels", "launch_year": 2024}',  # 7 repetida no bloco
+        '{"model_name": "Gama", "brand": "Hot Wheels", "launch_year": 2024}',   # 8 fecha o bloco
+        '{"model_name": "Alfa", "brand": "Hot Wheels", "launch_year": 2024}',   # 9 repetida entre blocos
+        '{"brand": "Hot Wheels"}',                                              # 10 sem model_name
+        '{"model_name": "Delta", "brand": "Hot Wheels", "launch_year": 2024}',  # 11 sem \n no fim
+    ]
+
+    async def run():
+        async with api_client(stub) as client:
+            response = await client.post(
+                "/miniatures/stream",
+                content=ndjson_body("\n".join(lines)),
+                headers={"Content-Type": "application/x-ndjson"},
+            )
+            assert response.status_code == 200
+            return [json.loads(line) for line in response.text.splitlines()]
+
+    with patched(BATCH_CHUNK_SIZE=3, STREAM_MAX_LINE_BYTES=200):
+        out = asyncio.run(run())
+    done = out.pop()
+    by_line = {item["line"]: item for item in out}
+    assert sorted(by_line) == [1, 2, 4, 5, 6, 7, 8, 9, 10, 11]
+    assert [n for n, item in sorted(by_line.items()) if item["success"]] == [1, 6, 8, 11]
+    assert by_line[2]["message"].startswith("JSON inválido")
+    assert by_line[4]["message"] == "Esperado um objeto JSON por linha"
+    assert by_line[5]["message"] == "Linha maior que 200 bytes"
+    assert by_line[7]["message"] == "Duplicada dentro do lote"
+    assert by_line[9]["message"] == "Já existe no banco de dados"
+    assert by_line[10]["message"].startswith("Dados inválidos: model_name")
+    assert done == {"done": True, "total": 10, "successful": 4, "failed": 6}
+    assert sorted(row["model_name"] for row in stub.table.rows) == ["Alfa", "Beta", "Delta", "Gama"]
+
+
+def test_stream_rejects_other_content_types():
+    async def run():
+        async with api_client(PostgRESTStub()) as client:
+            return await client.post("/miniatures/stream", content=b"{}", headers={"Content-Type": "application/json"})
+
+    assert asyncio.run(run()).status_code == 415
+
+
+def test_batch_duplicates_within_the_batch_and_against_the_database():
+    stub = PostgRESTStub()
+
+    async def run():
+        async with api_client(stub) as client:
+            await client.post("/miniatures/batch", json=[miniature(1)])
+            response = await client.post(
+                "/miniatures/batch",
+                json=[miniature(1), miniature(2), {**miniature(2), "model_name": "teste  002"}],
+            )
+            return response.json()
+
+    result = asyncio.run(run())
+    assert [d["message"] for d in result["details"]] == [
+        "Já existe no banco de dados", "Inserida com sucesso", "Duplicada dentro do lote",
+    ]
+    assert (result["successful"], result["failed"]) == (1, 2)
+
+
+def test_list_cursor_round_trip_with_filters():
+    stub = PostgRESTStub()
+    rows = [miniature(n, launch_year=2023 + n % 2, brand="Hot Wheels" if n % 3 else "Matchbox")
+            for n in range(15)]
+
+    async def run():
+        async with api_client(stub) as client:
+            await client.post("/miniatures/batch", json=rows)
+            pages, cursor = [], None
+            while True:
+                params = {"brand": "Hot Wheels", "launch_year": 2024, "limit": 2, "fields": "model_name"}
+                if cursor:
+                    params["cursor"] = cursor
+                page = (await client.get("/miniatures", params=params)).json()
+                pages.append(page["data"])
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    return pages
+
+    pages = asyncio.run(run())
+    names = [row["model_name"] for page in pages for row in page]
+    expected = sorted(row["model_name"] for row in rows
+                      if row["brand"] == "Hot Wheels" and row["launch_year"] == 2024)
+    assert sorted(names) == expected
+    assert len(names) == len(set(names))
+    assert all(len(page) <= 2 for page in pages)
+    # (created_at, id) decrescente, sem repetir nem pular entre páginas
+    keys = [(row["created_at"], row["id"]) for page in pages for row in page]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_list_rejects_bad_cursor_and_unknown_fields():
+    async def run():
+        async with api_client(PostgRESTStub()) as client:
+            bad_cursor = await client.get("/miniatures", params={"cursor": "nao-e-um-cursor"})
+            bad_fields = await client.get("/miniatures", params={"fields": "model_name,senha"})
+            return bad_cursor, bad_fields
+
+    bad_cursor, bad_fields = asyncio.run(run())
+    assert bad_cursor.status_code == 400
+    assert bad_fields.status_code == 400
+    assert "senha" in bad_fields.json()["detail"]
+
+
+def test_lookup_batch_is_503_until_the_index_is_ready():
+    stub = PostgRESTStub()
+    release = asyncio.Event()
+    original = api_server.build_lookup_index
+
+    async def slow_build(db, lookup):
+        await release.wait()
+        await original(db, lookup)
+
+    async def run():
+        async with api_client(stub) as client:
+            await client.post("/miniatures/batch", json=[miniature(1, collection_number="12/250")])
+            body = {"codes": ["12/250"], "kind": "collection_number"}
+            before = await client.post("/lookup/batch", json=body)
+            release.set()
+            while not api_server.app.state.lookup.ready:
+                await asyncio.sleep(0.01)
+            after = await client.post("/lookup/batch", json=body)
+            bad_kind = await client.post("/lookup/batch", json={"codes": ["1"], "kind": "isbn"})
+            return before, after, bad_kind
+
+    with patched(build_lookup_index=slow_build):
+        before, after, bad_kind = asyncio.run(run())
+    assert before.status_code == 503
+    assert after.status_code == 200
+    assert after.json()["found"] == 1
+    assert bad_kind.status_code == 400
@@ -0,0 +1,53 @@
+"""Testes do catalog_db (consultas montadas e paginação keyset contra o postgrest_stub).
+
+    python -m pytest test_catalog_db.py -q
+"""
+
+import asyncio
+from urllib.parse import parse_qsl
+
+import httpx
+from postgrest import AsyncPostgrestClient
+
+from catalog_db import CatalogDB, encode_cursor, keyset_after
+from postgrest_stub import PostgRESTStub
+
+CREATED_AT = "2026-01-01T00:00:00.000500+00:00"
+ROW_ID = "7b0b7f9e-0000-4000-8000-000000000000"
+
+
+def query_params(query) -> list:
+    return parse_qsl(str(query.params))
+
+
+def test_keyset_cursor_has_range_bound():
+    table = AsyncPostgrestClient("http://postgrest.stub/rest/v1").table("miniatures_master")
+    cursor = encode_cursor({"created_at": CREATED_AT, "id": ROW_ID})
+    params = query_params(keyset_after(table.select("id"), cursor))
+    # Sem o limite fora do `or` o Postgres não usa o índice (created_at, id) como Index Cond
+    assert ("created_at", f"lte.{CREATED_AT}") in params
+    assert ("or", f'(created_at.lt."{CREATED_AT}",and(created_at.eq."{CREATED_AT}",id.lt.{ROW_ID}))') in params
+    assert ("order", "created_at.desc,id.desc") in params
+
+
+def test_keyset_first_page_has_no_bound():
+    table = AsyncPostgrestClient("http://postgrest.stub/rest/v1").table("miniatures_master")
+    params = dict(query_params(keyset_after(table.select("id"), None)))
+    assert "created_at" not in params
+    assert "or" not in params
+
+
+def test_iter_pages_reads_every_row_once():
+    stub = PostgRESTStub()
+    for n in range(25):
+        stub.table.append(stub.table.new_row({"model_name": f"Teste {n}", "brand": "Hot Wheels"}))
+
+    async def run():
+        db = CatalogDB("http://postgrest.stub", "stub", transport=httpx.ASGITransport(app=stub.app))
+        async with db:
+            return [page async for page in db.iter_pages("miniatures_master", "id", page_size=10)]
+
+    pages = asyncio.run(run())
+    assert [len(page) for page in pages] == [10, 10, 5]
+    ids = [row["id"] for page in pages for row in page]
+    assert ids == [row["id"] for row in reversed(stub.table.rows)]
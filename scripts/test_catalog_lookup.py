@@ -0,0 +1,42 @@
+"""Testes do catalog_lookup (índice em memória de /lookup/batch).
+
+    python -m pytest test_catalog_lookup.py -q
+"""
+
+from catalog_lookup import CatalogLookupIndex
+
+ROWS = [
+    {"id": "1", "model_name": "Bone Shaker", "product_code": "GTB71", "collection_number": "71/250"},
+    {"id": "2", "model_name": "Twin Mill", "product_code": "FYC34", "collection_number": "5/250"},
+    {"id": "3", "model_name": "Deora II", "collection_number": "071"},
+    {"id": "4", "model_name": "Seed", "upc": "0 27084 12345 3"},
+]
+
+
+def index() -> CatalogLookupIndex:
+    lookup = CatalogLookupIndex()
+    lookup.add_many(ROWS)
+    return lookup
+
+
+def ids(result) -> set:
+    return {match["id"] for match in result["matches"]}
+
+
+def test_unknown_base_code_is_not_read_as_collection_number():
+    result = index().lookup("GTB99")
+    assert result["matches"] == []
+    result = index().lookup("XYZ71")
+    assert (result["kind"], result["matches"]) == (None, [])
+
+
+def test_lookup_by_shape():
+    lookup = index()
+    assert (lookup.lookup("gtb71 - 0910")["kind"], ids(lookup.lookup("gtb71 - 0910"))) == ("product_code", {"1"})
+    assert (lookup.lookup("#71")["kind"], ids(lookup.lookup("#71"))) == ("collection_number", {"3"})
+    assert ids(lookup.lookup("5/250")) == {"2"}
+    assert (lookup.lookup("027084123453")["kind"], ids(lookup.lookup("027084123453"))) == ("upc", {"4"})
+
+
+def test_explicit_kind_skips_shape_check():
+    assert ids(index().lookup("GTB71", "collection_number")) == {"3"}
@@ -0,0 +1,67 @@
+"""Testes do crawl_state.CrawlState: retomada e acerto das páginas no buffer.
+
+    python -m pytest test_crawl_state.py -q
+"""
+
+import os
+import tempfile
+
+from crawl_state import CrawlState
+
+LIST = "https://hotwheels.fandom.com/wiki/List_of_2024_Hot_Wheels"
+URLS = [f"https://hotwheels.fandom.com/wiki/Teste_{n}" for n in range(5)]
+
+
+def temp_state() -> CrawlState:
+    return CrawlState(os.path.join(tempfile.mkdtemp(), "state.sqlite3"))
+
+
+def status(state: CrawlState, url: str) -> tuple:
+    with state._lock:
+        row = state._db.execute("SELECT status, rows_written, error FROM urls WHERE url = ?", (url,)).fetchone()
+    return tuple(row)
+
+
+def test_resume_keeps_list_order_and_skips_done_urls():
+    path = os.path.join(tempfile.mkdtemp(), "state.sqlite3")
+    state = CrawlState(path)
+    assert state.list_urls(LIST) is None
+    state.add_urls(URLS, list_url=LIST)
+    state.mark_fetched(URLS[0], "<html>0</html>")
+    state.mark_written(URLS[0], 3)
+    state.mark_fetched(URLS[1], "<html>1</html>")  # interrompida antes de gravar
+    state.mark_failed(URLS[2], "falha no download")
+    state.mark_written(URLS[2], 0)  # não apaga a falha
+    state.close()
+
+    resumed = CrawlState(path)
+    assert resumed.list_urls(LIST) == URLS
+    assert resumed.frontier(URLS) == URLS[1:]
+    assert status(resumed, URLS[0]) == ("done", 3, None)
+    assert status(resumed, URLS[2])[0] == "failed"
+    assert resumed.counts(URLS) == {"pending": 2, "fetched": 1, "buffered": 0, "done": 1, "failed": 1}
+
+
+def test_settle_buffered_only_fails_urls_with_failed_rows():
+    state = temp_state()
+    state.add_urls(URLS[:3])
+    for url in URLS[:3]:
+        state.mark_fetched(url, url)
+        state.mark_buffered(url)
+    assert status(state, URLS[0]) == ("buffered", 0, None)
+
+    state.settle_buffered(URLS[0], 4, 0)
+    state.settle_buffered(URLS[1], 2, 1)
+    assert status(state, URLS[0]) == ("done", 4, None)
+    assert status(state, URLS[1]) == ("failed", 2, "1 linha(s) falharam no upsert em lote")
+    assert status(state, URLS[2]) == ("buffered", 0, None)
+    assert state.frontier(URLS[:3]) == URLS[1:3]
+
+
+def test_failed_download_is_not_overwritten_by_the_buffer():
+    state = temp_state()
+    state.add_urls(URLS[:1])
+    state.mark_failed(URLS[0], "falha no download")
+    state.mark_buffered(URLS[0])
+    state.settle_buffered(URLS[0], 0, 0)
+    assert status(state, URLS[0]) == ("failed", 0, "falha no download")
@@ -0,0 +1,46 @@
+"""Testes do delta_sync: classificação das linhas contra o snapshot.
+
+    python -m pytest test_delta_sync.py -q
+"""
+
+import os
+import tempfile
+
+from delta_sync import DeltaSnapshot
+
+
+def row(n: int, color: str = "Blue") -> dict:
+    return {"model_name": f"Teste {n}", "brand": "Hot Wheels", "launch_year": 2024, "base_color": color}
+
+
+def temp_snapshot(**kwargs) -> DeltaSnapshot:
+    return DeltaSnapshot(os.path.join(tempfile.mkdtemp(), "delta.sqlite3"), **kwargs)
+
+
+def test_diff_classifies_against_recorded_rows():
+    delta = temp_snapshot()
+    delta.record([row(1), row(2)])
+
+    plan = delta.diff([row(1), row(2, "Red"), row(3)])
+    assert plan.unchanged == [row(1)]
+    assert plan.changed == [row(2, "Red")]
+    assert plan.new == [row(3)]
+    assert plan.to_write == [row(3), row(2, "Red")]
+    assert delta.summary() == "novas: 1 | alteradas: 1 | sem alteração: 1"
+
+
+def test_diff_merges_repeated_keys_like_the_upsert():
+    delta = temp_snapshot()
+    # "Teste 1 " e "teste 1" têm a mesma natural_key: a última sobrescreve os campos
+    plan = delta.diff([row(1), {**row(1, "Red"), "model_name": "teste 1 "}])
+    assert len(plan.new) == 1
+    assert plan.new[0]["base_color"] == "Red"
+
+
+def test_rewrite_all_writes_unchanged_rows_too():
+    path = os.path.join(tempfile.mkdtemp(), "delta.sqlite3")
+    DeltaSnapshot(path).record([row(1), row(2)])
+
+    plan = DeltaSnapshot(path, rewrite_all=True).diff([row(1), row(2, "Red"), row(3)])
+    assert plan.unchanged == [row(1)]
+    assert sorted(r["model_name"] for r in plan.to_write) == ["Teste 1", "Teste 2", "Teste 3"]
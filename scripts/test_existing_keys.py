@@ -0,0 +1,88 @@
+"""Testes do existing_keys.ExistingKeyCache nos formatos "set" e "bloom".
+
+A carga do banco roda contra o PostgREST em memória (postgrest_stub.py), pelo
+TestClient do Starlette:
+
+    python -m pytest test_existing_keys.py -q
+"""
+
+import os
+import tempfile
+
+import pytest
+from postgrest import SyncPostgrestClient
+from starlette.testclient import TestClient
+
+from existing_keys import BloomFilter, ExistingKeyCache, key_hash
+from natural_key import natural_key_hash
+from postgrest_stub import PostgRESTStub
+
+BASE_URL = "http://postgrest.stub/rest/v1"
+
+
+def stub_client(stub: PostgRESTStub) -> SyncPostgrestClient:
+    client = SyncPostgrestClient(BASE_URL)
+    client.session = TestClient(stub.app, base_url=BASE_URL, headers=dict(client.session.headers))
+    return client
+
+
+def row(n: int) -> dict:
+    return {"model_name": f"Teste {n}", "brand": "Hot Wheels", "launch_year": 2024}
+
+
+@pytest.mark.parametrize("kind", ["set", "bloom"])
+def test_exists_after_add(kind):
+    cache = ExistingKeyCache(None, kind=kind)
+    cache.add(row(1))
+    assert cache.exists(row(1), confirm=lambda r: True)
+    assert not cache.exists(row(2), confirm=lambda r: True)
+    # mesma natural_key com outra caixa e espaços
+    assert cache.exists({**row(1), "model_name": " teste  1 "}, confirm=lambda r: True)
+    assert cache.count == 1
+
+
+def test_bloom_positive_is_confirmed_and_set_is_not():
+    confirmed = []
+
+    def confirm(r):
+        confirmed.append(r["model_name"])
+        return False  # falso positivo do filtro: não está no banco
+
+    bloom = ExistingKeyCache(None, kind="bloom")
+    bloom.add(row(1))
+    assert not bloom.exists(row(1), confirm=confirm)
+    assert not bloom.exists(row(2), confirm=confirm)  # "não existe" é definitivo
+    assert confirmed == ["Teste 1"]
+
+    exact = ExistingKeyCache(None, kind="set")
+    exact.add(row(1))
+    assert exact.exists(row(1), confirm=confirm)
+    assert confirmed == ["Teste 1"]
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, error_rate=0.01)
+    hashes = [key_hash(natural_key_hash(row(n))) for n in range(1000)]
+    for h in hashes:
+        bloom.add(h)
+    assert all(h in bloom for h in hashes)
+    false_positives = sum(key_hash(natural_key_hash(row(n))) in bloom for n in range(1000, 11000))
+    assert false_positives < 300  # ~1% esperado
+
+
+@pytest.mark.parametrize("kind", ["set", "bloom"])
+def test_refresh_and_snapshot(kind):
+    stub = PostgRESTStub()
+    client = stub_client(stub)
+    client.table("miniatures_master").insert([row(n) for n in range(5)]).execute()
+    path = os.path.join(tempfile.mkdtemp(), "keys.json.gz")
+
+    cache = ExistingKeyCache.open(client, snapshot_path=path, kind=kind)
+    assert cache.count == 5
+    cache.save()
+
+    client.table("miniatures_master").insert([row(5)]).execute()
+    reopened = ExistingKeyCache.open(client, snapshot_path=path, kind=kind)
+    assert reopened.count == 6
+    assert reopened.exists(row(0)) and reopened.exists(row(5))
+    assert not reopened.exists(row(6))
@@ -0,0 +1,52 @@
+"""Testes do group_commit.GroupCommitter.
+
+    python -m pytest test_group_commit.py -q
+"""
+
+import asyncio
+
+import pytest
+
+from group_commit import GroupCommitter
+
+
+def test_failed_group_is_retried_item_by_item():
+    calls = []
+
+    async def commit(items):
+        calls.append(list(items))
+        await asyncio.sleep(0.01)
+        if "ruim" in items:
+            raise ValueError("linha rejeitada")
+        return [item.upper() for item in items]
+
+    async def run():
+        committer = GroupCommitter(commit, max_delay_ms=5)
+        first = asyncio.create_task(committer.submit("a"))
+        await asyncio.sleep(0)
+        results = await asyncio.gather(
+            *(committer.submit(item) for item in ("b", "ruim", "c")), return_exceptions=True
+        )
+        await committer.close()
+        return await first, results
+
+    first, results = asyncio.run(run())
+    assert first == "A"
+    assert results[0] == "B" and results[2] == "C"
+    assert isinstance(results[1], ValueError)
+    assert calls[1] == ["b", "ruim", "c"]  # o grupo falhou e foi regravado um a um
+    assert calls[2:] == [["b"], ["ruim"], ["c"]]
+
+
+def test_exception_result_fails_only_its_item():
+    async def commit(items):
+        return [ValueError(item) if item == "ruim" else item for item in items]
+
+    async def run():
+        committer = GroupCommitter(commit)
+        ok = await committer.submit("ok")
+        with pytest.raises(ValueError):
+            await committer.submit("ruim")
+        return ok
+
+    assert asyncio.run(run()) == "ok"
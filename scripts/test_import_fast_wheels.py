@@ -0,0 +1,90 @@
+"""Testes do FastWheelsLoader contra o PostgREST em memória (postgrest_stub.py).
+
+O cliente síncrono do postgrest fala com o stub pelo TestClient do Starlette,
+sem rede:
+
+    python -m pytest test_import_fast_wheels.py -q
+"""
+
+import os
+import tempfile
+
+from postgrest import SyncPostgrestClient
+from starlette.testclient import TestClient
+
+from delta_sync import DeltaSnapshot
+from existing_keys import ExistingKeyCache
+from import_fast_wheels import FastWheelsLoader
+from postgrest_stub import PostgRESTStub
+
+BASE_URL = "http://postgrest.stub/rest/v1"
+
+
+def stub_client(stub: PostgRESTStub) -> SyncPostgrestClient:
+    client = SyncPostgrestClient(BASE_URL)
+    client.session = TestClient(stub.app, base_url=BASE_URL, headers=dict(client.session.headers))
+    return client
+
+
+def miniatura(n: int, color: str) -> dict:
+    return {"model_name": f"Teste {n}", "brand": "Fast Wheels", "year": 2018,
+            "series": "FW Test", "collection_number": f"{n}/10", "base_color": color}
+
+
+def load(client, delta, minis) -> FastWheelsLoader:
+    key_cache = ExistingKeyCache(client)
+    key_cache.refresh(full=True)
+    loader = FastWheelsLoader(client, key_cache, delta)
+    for mini in minis:
+        loader.add(mini)
+    loader.close()
+    return loader
+
+
+def colors(stub: PostgRESTStub) -> dict:
+    return {row["model_name"]: row["base_color"] for row in stub.table.rows}
+
+
+def temp_path() -> str:
+    return os.path.join(tempfile.mkdtemp(), "delta.sqlite3")
+
+
+def test_first_delta_run_updates_rows_already_in_the_database():
+    stub = PostgRESTStub()
+    client = stub_client(stub)
+    load(client, None, [miniatura(n, "Red") for n in range(3)])
+
+    # Snapshot vazio: não dá para saber se o banco está igual, então atualiza
+    loader = load(client, DeltaSnapshot(temp_path()), [miniatura(n, "Blue") for n in range(3)])
+    assert (loader.existing, loader.updates) == (3, 3)
+    assert colors(stub) == {f"Teste {n}": "Blue" for n in range(3)}
+
+
+def test_delta_skips_unchanged_and_full_sync_rewrites_them():
+    stub = PostgRESTStub()
+    client = stub_client(stub)
+    path = temp_path()
+    minis = [miniatura(n, "Blue") for n in range(3)]
+    load(client, DeltaSnapshot(path), minis)
+    # Alguém mudou o banco por fora; o snapshot não sabe
+    stub.table.rows[0]["base_color"] = "Green"
+
+    loader = load(client, DeltaSnapshot(path), minis)
+    assert loader.updates == 0
+    assert colors(stub)["Teste 0"] == "Green"
+
+    loader = load(client, DeltaSnapshot(path, rewrite_all=True), minis)
+    assert loader.updates == 3
+    assert colors(stub) == {f"Teste {n}": "Blue" for n in range(3)}
+
+
+def test_delta_updates_only_changed_rows():
+    stub = PostgRESTStub()
+    client = stub_client(stub)
+    path = temp_path()
+    load(client, DeltaSnapshot(path), [miniatura(n, "Blue") for n in range(3)])
+
+    minis = [miniatura(0, "Blue"), miniatura(1, "Red"), miniatura(2, "Blue"), miniatura(3, "Blue")]
+    loader = load(client, DeltaSnapshot(path), minis)
+    assert (loader.existing, loader.updates, loader.inserts) == (1, 1, 1)
+    assert colors(stub) == {"Teste 0": "Blue", "Teste 1": "Red", "Teste 2": "Blue", "Teste 3": "Blue"}
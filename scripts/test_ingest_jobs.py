@@ -0,0 +1,153 @@
+"""Testes do ingest_jobs: fila SQLite compartilhada por vários processos.
+
+Cada JobStore abre a própria conexão e tem o próprio `owner`, como um worker do
+uvicorn; dois JobStores no mesmo arquivo fazem o papel de dois processos.
+
+    python -m pytest test_ingest_jobs.py -q
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+import time
+
+from ingest_jobs import JobRunner, JobStore
+
+
+def items(count: int):
+    return [(i, f"k{i}", {"model_name": f"Teste {i}"}) for i in range(count)]
+
+
+def ok(chunk):
+    return {position: {"success": True, "message": "ok"} for position, _, _ in chunk}
+
+
+def temp_db() -> str:
+    return os.path.join(tempfile.mkdtemp(), "jobs.sqlite3")
+
+
+def test_concurrent_claims_never_share_a_job():
+    path = temp_db()
+    stores = [JobStore(path) for _ in range(8)]
+    job_ids = {stores[0].create(items(3)) for _ in range(3)}
+    claimed = []
+    barrier = threading.Barrier(len(stores))
+
+    def claim(store):
+        barrier.wait()
+        claimed.append(store.claim_next())
+
+    threads = [threading.Thread(target=claim, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    won = [job_id for job_id in claimed if job_id is not None]
+    assert sorted(won) == sorted(job_ids)
+
+
+def test_new_process_does_not_take_a_live_job():
+    path = temp_db()
+    first, second = JobStore(path), JobStore(path)
+    job_id = first.create(items(3))
+    assert first.claim_next() == job_id
+    # Um processo que sobe depois não devolve para a fila nem pega o job em andamento
+    runner = JobRunner(second, lambda chunk, replayed: asyncio.sleep(0, ok(chunk)), poll_seconds=0.05)
+
+    async def run():
+        runner.start()
+        await asyncio.sleep(0.2)
+        await runner.stop()
+
+    asyncio.run(run())
+    job = second.get(job_id)
+    assert job["status"] == "running"
+    assert job["owner"] == first.owner
+    assert job["processed"] == 0
+
+
+def test_expired_lease_moves_job_without_double_counting():
+    path = temp_db()
+    dead, alive = JobStore(path, lease_seconds=0.05), JobStore(path)
+    job_id = dead.create(items(4))
+    assert dead.claim_next() == job_id
+    assert dead.record_results(job_id, ok(items(4)[:2]))
+    time.sleep(0.1)
+
+    assert alive.claim_next() == job_id
+    # O dono antigo volta do "travamento": não grava mais nada do job
+    assert not dead.record_results(job_id, ok(items(4)[2:]))
+    assert not dead.finish(job_id)
+
+    asyncio.run(JobRunner(alive, lambda chunk, replayed: asyncio.sleep(0, ok(chunk)), chunk_size=1).run_job(job_id))
+    job = alive.get(job_id)
+    assert (job["status"], job["processed"], job["successful"], job["failed"]) == ("done", 4, 4, 0)
+
+
+def test_stop_releases_running_jobs():
+    path = temp_db()
+    store = JobStore(path)
+    job_id = store.create(items(10))
+
+    async def slow(chunk, replayed):
+        await asyncio.sleep(10)
+        return ok(chunk)
+
+    async def run():
+        runner = JobRunner(store, slow, workers=1, chunk_size=2)
+        runner.start()
+        while store.get(job_id)["status"] != "running":
+            await asyncio.sleep(0.01)
+        await runner.stop()
+
+    asyncio.run(run())
+    job = JobStore(path).get(job_id)
+    assert (job["status"], job["owner"]) == ("queued", None)
+
+
+def test_run_job_processes_every_item_in_order():
+    store = JobStore(temp_db())
+    job_id = store.create(items(25), {25: {"success": False, "message": "Duplicada dentro do lote"}})
+    seen = []
+
+    async def record(chunk, replayed):
+        seen.extend(position for position, _, _ in chunk)
+        return ok(chunk)
+
+    assert store.claim_next() == job_id
+    asyncio.run(JobRunner(store, record, chunk_size=4).run_job(job_id))
+    assert seen == list(range(25))
+    job = store.get(job_id)
+    assert (job["status"], job["processed"], job["successful"], job["failed"]) == ("done", 26, 25, 1)
+
+
+def test_interrupted_chunk_is_replayed_with_its_positions():
+    path = temp_db()
+    dead, alive = JobStore(path, lease_seconds=0.05), JobStore(path)
+    job_id = dead.create(items(6))
+    written = set()
+
+    async def crash_after_writing(chunk, replayed):
+        written.update(position for position, _, _ in chunk)
+        await asyncio.sleep(10)  # o processo "morre" antes de registrar o resultado
+
+    async def run():
+        assert dead.claim_next() == job_id
+        task = asyncio.create_task(JobRunner(dead, crash_after_writing, chunk_size=4).run_job(job_id))
+        while len(written) < 4:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(run())
+    time.sleep(0.1)
+    seen = []
+
+    async def record(chunk, replayed):
+        seen.append(({position for position, _, _ in chunk}, replayed))
+        return ok(chunk)
+
+    assert alive.claim_next() == job_id
+    asyncio.run(JobRunner(alive, record, chunk_size=4).run_job(job_id))
+    # Só o bloco interrompido vem marcado; o seguinte nunca foi tentado
+    assert seen == [({0, 1, 2, 3}, {0, 1, 2, 3}), ({4, 5}, set())]
@@ -0,0 +1,39 @@
+"""natural_key_hash precisa bater com a coluna gerada `natural_key` do banco.
+
+Os valores esperados são o md5 que a expressão de add_catalog_indexes.sql
+produz no Postgres para cada linha, ex.:
+
+    SELECT md5('bone shaker' || chr(31) || 'hot wheels' || chr(31) || '2024'
+               || chr(31) || 'hw dream garage');
+
+    python -m pytest test_natural_key.py -q
+"""
+
+import pytest
+
+from natural_key import natural_key_hash
+
+CASES = [
+    # (model_name, brand, launch_year, series) -> md5 calculado pelo banco
+    (("Bone Shaker", "Hot Wheels", 2024, "HW Dream Garage"), "5c1007d4a3679163c163b8b9b0dc0b1b"),
+    # caixa mista, espaços repetidos, tab e quebra de linha; series NULL vira ''
+    (("  CAMARO\t Z28 \n", "HOT  wheels", 2019, None), "25a21364081c88c75e0acbf170620e0d"),
+    # acentos: lower() do banco (UTF-8) e md5 sobre os bytes UTF-8
+    (("Fusca Édition Spéciale", "Hot Wheels", 2020, "COLEÇÃO Brasil"), "324ccd243d2fb76ae92ed961b65d8f56"),
+    # ano NULL e series vazia: coalesce(..., '')
+    (("Sem Série", "Hot Wheels", None, ""), "159e6cc89351e741534975406324145e"),
+    # espaço não separável (U+00A0) fora de [ \t\n\r\f\v]: nem colapsado nem aparado
+    (("Mustang\u00a0GT", "Hot Wheels", 2021, "\u00a0HW Muscle Mania "), "04e47e7872c2ad590165447ad78a3f50"),
+]
+
+
+@pytest.mark.parametrize("columns, expected", CASES)
+def test_natural_key_hash_matches_generated_column(columns, expected):
+    row = dict(zip(("model_name", "brand", "launch_year", "series"), columns))
+    assert natural_key_hash(row) == expected
+
+
+def test_year_as_text_and_missing_columns():
+    assert natural_key_hash({"model_name": "Bone Shaker", "brand": "Hot Wheels", "launch_year": "2024",
+                             "series": "HW Dream Garage"}) == CASES[0][1]
+    assert natural_key_hash({"model_name": "Sem Série", "brand": "Hot Wheels"}) == CASES[3][1]
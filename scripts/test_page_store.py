@@ -0,0 +1,115 @@
+"""Testes do page_store.PageStore e da revalidação 304 do AsyncCrawler.
+
+O crawler baixa de um servidor HTTP local (thread) que responde 304 ao
+If-None-Match com o ETag atual:
+
+    python -m pytest test_page_store.py -q
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from hotwheels_crawler import AsyncCrawler
+from page_store import PageStore
+
+
+def temp_store() -> PageStore:
+    return PageStore(tempfile.mkdtemp())
+
+
+@contextlib.contextmanager
+def page_server(pages: dict):
+    """Serve `pages` (caminho -> html) com ETag; conta as respostas 200 e 304."""
+    hits = {200: 0, 304: 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            html = pages[self.path]
+            etag = f'"{hashlib.md5(html.encode("utf-8")).hexdigest()[:12]}"'
+            if self.headers.get("If-None-Match") == etag:
+                hits[304] += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+            hits[200] += 1
+            body = html.encode("utf-8")
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}", hits
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def fetch(store: PageStore, url: str):
+    async def run():
+        async with AsyncCrawler({}, store=store, rate=100, burst=100, backoff=0) as crawler:
+            return await crawler.fetch(url)
+
+    return asyncio.run(run())
+
+
+def test_write_is_unchanged_only_after_mark_written():
+    store = temp_store()
+    assert store.write("u", "<html>1</html>", etag='"a"')
+    # Baixada de novo sem ter chegado ao banco: ainda precisa ser processada
+    assert store.write("u", "<html>1</html>", etag='"a"')
+    store.mark_written("u")
+    assert store.is_written("u")
+    assert not store.write("u", "<html>1</html>", etag='"a"')
+    assert store.write("u", "<html>2</html>", etag='"b"')
+    assert not store.is_written("u")
+    assert store.read("u") == "<html>2</html>"
+    assert store.conditional_headers("u") == {"If-None-Match": '"b"'}
+
+
+def test_iter_pages_by_kind():
+    store = temp_store()
+    store.write("m", "modelo")
+    store.write("l", "lista", kind="list")
+    assert list(store.iter_pages()) == [("m", "modelo")]
+    assert store.urls() == ["l", "m"]
+
+
+def test_crawler_304_returns_stored_copy_and_unchanged_once_written():
+    store = temp_store()
+    with page_server({"/wiki/Bone_Shaker": "<html>Bone Shaker</html>"}) as (base, hits):
+        url = f"{base}/wiki/Bone_Shaker"
+        assert fetch(store, url) == ("<html>Bone Shaker</html>", True)
+        # 304, mas a gravação no banco não foi confirmada: continua "mudou"
+        assert fetch(store, url) == ("<html>Bone Shaker</html>", True)
+        store.mark_written(url)
+        assert fetch(store, url) == ("<html>Bone Shaker</html>", False)
+    assert hits == {200: 1, 304: 2}
+
+
+def test_store_migrates_index_without_written_column():
+    root = tempfile.mkdtemp()
+    db = sqlite3.connect(os.path.join(root, "index.sqlite3"))
+    db.execute(
+        "CREATE TABLE pages (url TEXT PRIMARY KEY, sha256 TEXT NOT NULL, kind TEXT NOT NULL DEFAULT 'model', "
+        "etag TEXT, last_modified TEXT, fetched_at REAL NOT NULL, changed_at REAL NOT NULL)"
+    )
+    db.commit()
+    db.close()
+    store = PageStore(root)
+    assert store.write("u", "html")
+    assert not store.is_written("u")
@@ -0,0 +1,99 @@
+"""Testes do write_buffer.UpsertBuffer: flush por tamanho, por tempo e regravação uma a uma.
+
+    python -m pytest test_write_buffer.py -q
+"""
+
+import threading
+import time
+
+from write_buffer import UpsertBuffer
+
+
+def row(n: int, **extra) -> dict:
+    return {"model_name": f"Teste {n}", **extra}
+
+
+class FakeTable:
+    """Grava em memória; lotes com uma linha de `bad` falham inteiros, como no PostgREST."""
+
+    def __init__(self, bad=()):
+        self.bad = set(bad)
+        self.rows = {}
+        self.batches = []
+        self.singles = []
+
+    def write_batch(self, rows):
+        self.batches.append([r["model_name"] for r in rows])
+        if any(r["model_name"] in self.bad for r in rows):
+            raise ValueError("lote rejeitado")
+        self.rows.update((r["model_name"], r) for r in rows)
+
+    def write_one(self, r):
+        self.singles.append(r["model_name"])
+        if r["model_name"] in self.bad:
+            return False
+        self.rows[r["model_name"]] = r
+        return True
+
+
+def buffer(table: FakeTable, **kwargs) -> UpsertBuffer:
+    return UpsertBuffer(table.write_batch, table.write_one, lambda r: r["model_name"], **kwargs)
+
+
+def test_flushes_when_max_rows_is_reached():
+    table = FakeTable()
+    buf = buffer(table, max_rows=3, max_delay_ms=0)
+    buf.add_many([row(0), row(1)])
+    assert table.batches == []
+    buf.add(row(2))
+    assert table.batches == [["Teste 0", "Teste 1", "Teste 2"]]
+    buf.add(row(3))
+    buf.close()
+    assert table.batches[-1] == ["Teste 3"]
+    assert (buf.ok, buf.failed, buf.batches) == (4, 0, 2)
+
+
+def test_same_key_is_merged_before_the_flush():
+    table = FakeTable()
+    buf = buffer(table, max_rows=10, max_delay_ms=0)
+    buf.add(row(0, base_color="Red"))
+    buf.add(row(0, series="HW Test"))
+    buf.close()
+    assert table.rows["Teste 0"] == row(0, base_color="Red", series="HW Test")
+    assert buf.ok == 1
+
+
+def test_timer_flushes_rows_that_wait_too_long():
+    table = FakeTable()
+    flushed = threading.Event()
+    buf = buffer(table, max_rows=100, max_delay_ms=50, on_flush=lambda ok, failed: flushed.set())
+    started = time.monotonic()
+    buf.add(row(0))
+    assert flushed.wait(2)
+    assert time.monotonic() - started >= 0.05
+    assert table.batches == [["Teste 0"]]
+    buf.close()
+
+
+def test_failed_batch_is_retried_row_by_row():
+    table = FakeTable(bad={"Teste 2"})
+    written = []
+    done = []
+    buf = buffer(table, max_rows=100, max_delay_ms=0, on_written=written.extend)
+    buf.add_many([row(0), row(1)], done=lambda ok, failed: done.append(("a", ok, failed)))
+    buf.add_many([row(2), row(3)], done=lambda ok, failed: done.append(("b", ok, failed)))
+    buf.close()
+    assert table.singles == ["Teste 0", "Teste 1", "Teste 2", "Teste 3"]
+    assert sorted(table.rows) == ["Teste 0", "Teste 1", "Teste 3"]
+    assert (buf.ok, buf.failed) == (3, 1)
+    assert sorted(r["model_name"] for r in written) == ["Teste 0", "Teste 1", "Teste 3"]
+    # Só quem tinha a linha ruim recebe a falha
+    assert done == [("a", 2, 0), ("b", 1, 1)]
+
+
+def test_rows_with_different_columns_go_in_separate_batches():
+    table = FakeTable()
+    buf = buffer(table, max_rows=100, max_delay_ms=0)
+    buf.add_many([row(0), row(1, base_color="Red"), row(2)])
+    buf.close()
+    assert sorted(table.batches) == [["Teste 0", "Teste 2"], ["Teste 1"]]
@@ -0,0 +1,174 @@
+"""Buffer de escrita para upserts em lote no Supabase.
+
+As linhas chegam uma a uma (streaming do scraper/importadores) e são gravadas
+em lote a cada `max_rows` linhas ou `max_delay_ms` milissegundos, o que vier
+primeiro. Se um lote falhar, cada linha dele é regravada individualmente, para
+que uma linha ruim não derrube as demais.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+Row = Dict[str, object]
+
+
+class UpsertBuffer:
+    """Acumula linhas e grava com `write_batch`; em falha, cai para `write_one`.
+
+    - `write_batch(rows)` grava uma lista de linhas com as mesmas colunas
+      (exigência do PostgREST para inserts em lote) e levanta exceção em erro;
+    - `write_one(row)` grava uma única linha e retorna True/False;
+    - `key(row)` identifica a linha pela chave natural: duas linhas com a mesma
+      chave no buffer viram uma só (a mais recente sobrescreve os campos da
+      anterior, como aconteceria com dois upserts seguidos);
+    - `on_flush(ok, failed)`, opcional, é chamado ao fim de cada flush: tudo o
+      que foi adicionado antes dele já foi gravado (ou falhou);
+    - `on_written(rows)`, opcional, recebe as linhas gravadas com sucesso.
+    """
+
+    def __init__(
+        self,
+        write_batch: Callable[[List[Row]], None],
+        write_one: Callable[[Row], bool],
+        key: Callable[[Row], Hashable],
+        *,
+        max_rows: int = 200,
+        max_delay_ms: int = 2000,
+        on_flush: Optional[Callable[[int, int], None]] = None,
+        on_written: Optional[Callable[[List[Row]], None]] = None,
+    ):
+        self.write_batch = write_batch
+        self.write_one = write_one
+        self.key = key
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000.0
+        self.on_flush = on_flush
+        self.on_written = on_written
+        self.ok = 0
+        self.failed = 0
+        self.batches = 0
+        self._rows: Dict[Hashable, Row] = {}
+        # (chaves, done) de cada add_many com `done`, aguardando o flush
+        self._waiting: List[Tuple[List[Hashable], Callable[[int, int], None]]] = []
+        self._failed_keys: Set[Hashable] = set()
+        self._first_at: Optional[float] = None
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._timer: Optional[threading.Thread] = None
+        if self.max_delay > 0:
+            self._timer = threading.Thread(target=self._flush_periodically, daemon=True)
+            self._timer.start()
+
+    def add(self, row: Row) -> None:
+        self.add_many([row])
+
+    def add_many(
+        self,
+        rows: List[Row],
+        then: Optional[Callable[[], None]] = None,
+        done: Optional[Callable[[int, int], None]] = None,
+    ) -> None:
+        """Adiciona as linhas de uma vez; `then()` roda antes de qualquer flush que as inclua.
+
+        `done(ok, failed)`, opcional, é chamado pelo flush que grava essas
+        linhas, com quantas delas foram gravadas e quantas falharam.
+        """
+        with self._lock:
+            keys = []
+            for row in rows:
+                k = self.key(row)
+                keys.append(k)
+                if k in self._rows:
+                    self._rows[k] = {**self._rows[k], **row}
+                else:
+                    self._rows[k] = dict(row)
+            if rows and self._first_at is None:
+                self._first_at = time.monotonic()
+            if done is not None:
+                self._waiting.append((list(dict.fromkeys(keys)), done))
+            if then is not None:
+                then()
+            if len(self._rows) >= self.max_rows:
+                self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            rows = list(self._rows.values())
+            waiting = self._waiting
+            self._rows = {}
+            self._waiting = []
+            self._first_at = None
+            ok_before, failed_before = self.ok, self.failed
+
+            # Mesmas colunas por requisição: agrupa pelo conjunto de campos preenchidos
+            groups: Dict[tuple, List[Row]] = {}
+            for row in rows:
+                groups.setdefault(tuple(sorted(row)), []).append(row)
+
+            pending = list(groups.values())
+            try:
+                while pending:
+                    self._write_group(pending[0])
+                    pending.pop(0)
+            except BaseException:
+                # Interrompido (Ctrl+C) no meio do flush: devolve ao buffer o que não foi gravado
+                unwritten = set()
+                for group in pending:
+                    for row in group:
+                        k = self.key(row)
+                        unwritten.add(k)
+                        self._rows.setdefault(k, row)
+                # quem tem linhas ainda no buffer espera o próximo flush (as falhas já vistas ficam)
+                self._waiting = [w for w in waiting if not unwritten.isdisjoint(w[0])] + self._waiting
+                raise
+
+            failed_keys, self._failed_keys = self._failed_keys, set()
+            for keys, done in waiting:
+                failed = sum(1 for k in keys if k in failed_keys)
+                done(len(keys) - failed, failed)
+            if self.on_flush is not None:
+                self.on_flush(self.ok - ok_before, self.failed - failed_before)
+
+    def _write_group(self, group: List[Row]) -> None:
+        self.batches += 1
+        try:
+            self.write_batch(group)
+            self.ok += len(group)
+            written_rows = group
+        except Exception as e:
+            print(f"\n[ERRO] Lote de {len(group)} linhas falhou ({e}); regravando uma a uma\n")
+            written_rows = []
+            for row in group:
+                try:
+                    written = self.write_one(row)
+                except Exception:
+                    written = False
+                if written:
+                    self.ok += 1
+                    written_rows.append(row)
+                else:
+                    self.failed += 1
+                    self._failed_keys.add(self.key(row))
+        if self.on_written is not None and written_rows:
+            self.on_written(written_rows)
+
+    def _flush_periodically(self) -> None:
+        interval = max(self.max_delay / 4, 0.01)
+        while not self._stop.wait(interval):
+            with self._lock:
+                if self._first_at is not None and time.monotonic() - self._first_at >= self.max_delay:
+                    self.flush()
+
+    def close(self) -> None:
+        """Grava o que restou e encerra o timer."""
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.join()
+        self.flush()
+
+    def __enter__(self) -> 'UpsertBuffer':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()